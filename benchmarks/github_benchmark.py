@@ -0,0 +1,467 @@
+"""
+Replays signed PullRequestReview deliveries through the native Lambda handler against a local
+fake GitHub API, and reports latency percentiles, GitHub calls per event and throughput.
+
+The fake API serves commit statuses, configuration file contents, organization teams with Link
+pagination, team and organization membership and repository permissions, and accepts status
+writes. Each endpoint's latency, the number of teams and the number of statuses are
+configurable, so the same workload can be replayed before and after a change.
+
+Usage, from the root of the repository:
+    python -m benchmarks.github_benchmark [--events 200] [--concurrency 4] [--teams 50]
+        [--statuses 20] [--failed 3] [--latency 0.01] [--endpoint-latency statuses=0.05]
+"""
+
+from __future__ import print_function
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from requests.adapters import HTTPAdapter
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+
+GITHUB_API_URL = "https://api.github.com"
+SECRET = "benchmark-secret"
+CONFIG_FILENAME = "approval-checker-config.yml"
+ORGANIZATION = "bench-org"
+
+# Share of reviewers authorized by each route, the rest are not authorized at all
+REVIEWERS = [("whitelisted", 0.2), ("team-member", 0.5), ("admin", 0.2), ("outsider", 0.1)]
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    An HTTP server handling each connection in its own thread.
+    """
+    daemon_threads = True
+
+
+def respond(request, status_code, payload, headers):
+    """
+    Writes a JSON response with the rate limit headers of the GitHub API.
+    """
+    content = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    request.send_response(status_code)
+    request.send_header('Content-Type', 'application/json')
+    request.send_header('Content-Length', str(len(content)))
+    request.send_header('X-RateLimit-Limit', '5000')
+    request.send_header('X-RateLimit-Remaining', '4999')
+    request.send_header('X-RateLimit-Reset', str(int(time.time()) + 3600))
+    request.send_header('X-RateLimit-Resource', 'core')
+    for header, value in headers.items():
+        request.send_header(header, value)
+    request.end_headers()
+    request.wfile.write(content)
+
+
+class FakeGitHub(object):
+    """
+    A local HTTP server answering the GitHub REST endpoints the approval checker calls.
+    """
+
+    def __init__(self, teams=50, statuses=20, failed=3, latency=0.0, endpoint_latency=None):
+        """
+        @params teams: The number of teams in the organization.
+        @params statuses: The number of statuses on every commit.
+        @params failed: How many of a commit's statuses are failed.
+        @params latency: Seconds every endpoint takes to answer.
+        @params endpoint_latency: A dict of endpoint names mapped to the seconds they take instead.
+        """
+        self.teams = ['team-{}'.format(index) for index in range(teams)]
+        self.statuses = statuses
+        self.failed = failed
+        self.latency = latency
+        self.endpoint_latency = endpoint_latency or {}
+        self.calls = Counter()
+        self.written = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self.routes = [
+            ('GET', re.compile(r'^/repos/([^/]+/[^/]+)/contents/(.+)$'), 'contents', self.get_contents),
+            ('GET', re.compile(r'^/repos/([^/]+/[^/]+)/commits/([^/]+)/status$'), 'statuses',
+             self.get_statuses),
+            ('POST', re.compile(r'^/repos/([^/]+/[^/]+)/statuses/([^/]+)$'), 'post_status', self.post_status),
+            ('GET', re.compile(r'^/repos/([^/]+/[^/]+)/collaborators/([^/]+)/permission$'), 'permission',
+             self.get_permission),
+            ('GET', re.compile(r'^/orgs/([^/]+)/teams$'), 'teams', self.get_teams),
+            ('GET', re.compile(r'^/orgs/([^/]+)/teams/([^/]+)/memberships/([^/]+)$'), 'team_membership',
+             self.get_team_membership),
+            ('GET', re.compile(r'^/orgs/([^/]+)/teams/([^/]+)$'), 'team', self.get_team),
+            ('GET', re.compile(r'^/orgs/([^/]+)/members/([^/]+)$'), 'org_membership', self.get_org_membership)
+        ]
+
+    def start(self):
+        """
+        Starts serving on a free local port.
+        @return base_url: The URL the fake API is served at.
+        """
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            Dispatches each request to the FakeGitHub route matching it.
+            """
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately, which Nagle's algorithm would delay
+            disable_nagle_algorithm = True
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """
+                Serves a GET request.
+                """
+                fake.dispatch(self, 'GET')
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                """
+                Serves a POST request.
+                """
+                fake.dispatch(self, 'POST')
+
+            def log_message(self, *_args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self.base_url
+
+    def stop(self):
+        """
+        Stops serving.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def base_url(self):
+        """
+        @return base_url: The URL the fake API is served at.
+        """
+        return 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+
+    def dispatch(self, request, method):
+        """
+        Answers a request with the route matching its method and path, after the route's latency.
+        """
+        url = urlparse(request.path)
+        body = request.rfile.read(int(request.headers.get('Content-Length') or 0))
+        for route_method, pattern, name, route in self.routes:
+            match = pattern.match(url.path)
+            if route_method == method and match:
+                with self._lock:
+                    self.calls[name] += 1
+                time.sleep(self.endpoint_latency.get(name, self.latency))
+                query = dict((key, values[0]) for key, values in parse_qs(url.query).items())
+                status_code, payload, headers = route(query, body, *match.groups())
+                break
+        else:
+            status_code, payload, headers = 404, {'message': 'Not Found'}, {}
+        respond(request, status_code, payload, headers)
+
+    def paginate(self, path, query, items):
+        """
+        Slices a list into the page asked for, with the Link header of a GitHub list endpoint.
+        @return: The page of items and the response headers.
+        """
+        per_page = min(int(query.get('per_page', 30)), 100)
+        page = int(query.get('page', 1))
+        headers = {}
+        if page * per_page < len(items):
+            headers['Link'] = '<{}{}?per_page={}&page={}>; rel="next"'.format(
+                self.base_url, path, per_page, page + 1
+            )
+        return items[(page - 1) * per_page:page * per_page], headers
+
+    def get_contents(self, _query, _body, repository, _filepath):
+        """
+        Serves a configuration file listing the last three teams, a user and admins.
+        """
+        config = 'teams:\n{}\nusers:\n  - whitelisted-user\nadmins: true\n'.format(
+            '\n'.join('  - ' + team for team in self.teams[-3:])
+        )
+        content = base64.standard_b64encode(config.encode('utf-8')).decode('utf-8')
+        return 200, {'content': content, 'encoding': 'base64'}, {'ETag': '"{}"'.format(repository)}
+
+    def get_statuses(self, query, _body, repository, ref):
+        """
+        Serves the statuses of a commit, whose first `failed` fail until they are written.
+        """
+        statuses = []
+        for index in range(self.statuses):
+            failed = index < self.failed and (repository, ref, index) not in self.written
+            statuses.append({
+                'state': 'failure' if failed else 'success',
+                'context': 'ci/check-{}'.format(index),
+                'target_url': 'https://ci.example.com/{}/{}'.format(ref, index),
+                'description': 'Check {} {}'.format(index, 'failed' if failed else 'passed')
+            })
+        page, headers = self.paginate(
+            '/repos/{}/commits/{}/status'.format(repository, ref), query, statuses
+        )
+        return 200, {'state': 'failure' if self.failed else 'success', 'statuses': page}, headers
+
+    def post_status(self, _query, body, repository, ref):
+        """
+        Records a status written to a commit.
+        """
+        status = json.loads(body.decode('utf-8'))
+        index = int(status['context'].rsplit('-', 1)[1])
+        with self._lock:
+            self.written[(repository, ref, index)] = status
+        return 201, status, {}
+
+    def get_permission(self, _query, _body, _repository, user):
+        """
+        Serves the repository permission of a user, admin for users named admin*.
+        """
+        return 200, {'permission': 'admin' if user.startswith('admin') else 'write'}, {}
+
+    def get_teams(self, query, _body, organization):
+        """
+        Serves a page of the organization's teams.
+        """
+        teams = [{'id': index, 'slug': slug} for index, slug in enumerate(self.teams)]
+        page, headers = self.paginate('/orgs/{}/teams'.format(organization), query, teams)
+        return 200, page, headers
+
+    def get_team(self, _query, _body, _organization, slug):
+        """
+        Serves a team by its slug.
+        """
+        if slug not in self.teams:
+            return 404, {'message': 'Not Found'}, {}
+        return 200, {'id': self.teams.index(slug), 'slug': slug}, {}
+
+    def get_team_membership(self, _query, _body, _organization, slug, user):
+        """
+        Serves a team membership, active for users named team-member* on the last team only.
+        """
+        if not user.startswith('team-member') or slug != self.teams[-1]:
+            return 404, {'message': 'Not Found'}, {}
+        return 200, {'role': 'member', 'state': 'active'}, {}
+
+    def get_org_membership(self, _query, _body, _organization, _user):
+        """
+        Serves an organization membership check, which no user passes.
+        """
+        return 404, None, {}
+
+
+class RedirectAdapter(HTTPAdapter):
+    """
+    Sends requests for the GitHub API to the fake API instead.
+    """
+
+    def __init__(self, base_url, **kwargs):
+        self.base_url = base_url
+        super(RedirectAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        request.url = self.base_url + request.url[len(GITHUB_API_URL):]
+        return super(RedirectAdapter, self).send(request, **kwargs)
+
+
+def review_delivery(index, reviewer, repositories):
+    """
+    Builds an API Gateway proxy event carrying a signed PullRequestReview delivery.
+    """
+    repository = 'repo-{}'.format(index % repositories)
+    sha = hashlib.sha1('commit-{}'.format(index).encode('utf-8')).hexdigest()
+    body = json.dumps({
+        'action': 'submitted',
+        'review': {
+            'id': index,
+            'state': 'approved',
+            'commit_id': sha,
+            'body': 'LGTM',
+            'user': {'login': reviewer, 'type': 'User'}
+        },
+        'pull_request': {
+            'number': index,
+            'state': 'open',
+            'head': {'sha': sha, 'ref': 'feature-{}'.format(index)},
+            'base': {'ref': 'master'}
+        },
+        'repository': {
+            'name': repository,
+            'full_name': '{}/{}'.format(ORGANIZATION, repository),
+            'owner': {'login': ORGANIZATION, 'type': 'Organization'}
+        },
+        'sender': {'login': reviewer}
+    })
+    signature = hmac.new(SECRET.encode('utf-8'), body.encode('utf-8'), hashlib.sha256).hexdigest()
+    return {
+        'path': '/hooks/pullRequestReview',
+        'httpMethod': 'POST',
+        'headers': {
+            'Content-Type': 'application/json',
+            'X-GitHub-Event': 'pull_request_review',
+            'X-GitHub-Delivery': 'delivery-{}'.format(index),
+            'X-Hub-Signature-256': 'sha256=' + signature
+        },
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+
+def generate_deliveries(count, repositories, seed=42):
+    """
+    Generates a reproducible sequence of deliveries from a mix of reviewers.
+    """
+    rng = random.Random(seed)
+    deliveries = []
+    for index in range(count):
+        roll = rng.random()
+        for kind, share in REVIEWERS:
+            roll -= share
+            if roll <= 0:
+                break
+        reviewer = 'whitelisted-user' if kind == 'whitelisted' else '{}-{}'.format(kind, index)
+        deliveries.append(review_delivery(index, reviewer, repositories))
+    return deliveries
+
+
+def percentile(values, fraction):
+    """
+    @return value: The nearest-rank percentile of a sorted list.
+    """
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+def replay(deliveries, concurrency):
+    """
+    Sends deliveries through the Lambda handler from a number of threads.
+    @return: The latency of each delivery in seconds, the status codes returned and the wall time.
+    """
+    from github_approval_checker import lambda_handler
+    latencies = []
+    status_codes = Counter()
+    lock = threading.Lock()
+    pending = list(reversed(deliveries))
+
+    def work():
+        """
+        Sends deliveries until none are left.
+        """
+        while True:
+            with lock:
+                if not pending:
+                    return
+                event = pending.pop()
+            started = time.time()
+            response = lambda_handler.handler(event, None)
+            elapsed = time.time() - started
+            with lock:
+                latencies.append(elapsed)
+                status_codes[response['statusCode']] += 1
+
+    started = time.time()
+    threads = [threading.Thread(target=work) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), status_codes, time.time() - started
+
+
+def parse_endpoint_latency(values):
+    """
+    @return endpoint_latency: A dict of the name=seconds pairs given on the command line.
+    """
+    endpoint_latency = {}
+    for value in values or []:
+        name, seconds = value.split('=', 1)
+        endpoint_latency[name] = float(seconds)
+    return endpoint_latency
+
+
+def main(argv):
+    """
+    Runs the benchmark and prints its report.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--repositories', type=int, default=10)
+    parser.add_argument('--teams', type=int, default=50)
+    parser.add_argument('--statuses', type=int, default=20)
+    parser.add_argument('--failed', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds every endpoint takes')
+    parser.add_argument('--endpoint-latency', action='append', metavar='NAME=SECONDS',
+                        help='latency of one endpoint, for example statuses=0.05')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    fake = FakeGitHub(args.teams, args.statuses, args.failed, args.latency,
+                      parse_endpoint_latency(args.endpoint_latency))
+    base_url = fake.start()
+    os.environ.update({
+        'webhook_secret': SECRET,
+        'github_username': 'benchmark-user',
+        'github_api_key': 'benchmark-key',
+        'config_filename': CONFIG_FILENAME,
+        'github_data_provider': 'rest',
+        'processing_mode': 'sync',
+        'idempotency_backend': 'memory'
+    })
+
+    from github_approval_checker.api import settings
+    logging.disable(logging.INFO)
+    api_handler = settings.get_api_handler()
+    api_handler.session.mount(GITHUB_API_URL, RedirectAdapter(base_url, pool_maxsize=args.concurrency * 4))
+
+    try:
+        latencies, status_codes, wall_time = replay(
+            generate_deliveries(args.events, args.repositories), args.concurrency
+        )
+    finally:
+        fake.stop()
+
+    report = {
+        'events': args.events,
+        'concurrency': args.concurrency,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'throughput_per_second': args.events / wall_time,
+        'calls_per_event': float(sum(fake.calls.values())) / args.events,
+        'calls_by_endpoint': dict(fake.calls),
+        'status_codes': dict(status_codes)
+    }
+    if args.json:
+        print(json.dumps(report, indent=2, sort_keys=True))
+        return
+    print('events:            {} ({} concurrent)'.format(report['events'], report['concurrency']))
+    print('latency p50:       {:.1f} ms'.format(report['p50_ms']))
+    print('latency p95:       {:.1f} ms'.format(report['p95_ms']))
+    print('latency p99:       {:.1f} ms'.format(report['p99_ms']))
+    print('throughput:        {:.1f} events/s'.format(report['throughput_per_second']))
+    print('calls/event:       {:.2f}'.format(report['calls_per_event']))
+    for name, calls in sorted(fake.calls.items()):
+        print('  {:<16} {:.2f}'.format(name + ':', float(calls) / args.events))
+    print('responses:         {}'.format(', '.join(
+        '{} x{}'.format(code, count) for code, count in sorted(status_codes.items())
+    )))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
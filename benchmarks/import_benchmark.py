@@ -0,0 +1,71 @@
+"""
+Compares the cold-start import cost of the native Lambda handler with the connexion app served
+through serverless-wsgi, broken down by the largest third-party packages each one loads.
+
+Each entry point is imported in a fresh interpreter with `-X importtime`, so Python 3.7+ is
+required. Usage, from the root of the repository:
+    python -m benchmarks.import_benchmark [runs]
+"""
+
+from __future__ import print_function
+
+import subprocess
+import sys
+
+ENTRY_POINTS = [
+    ("lambda_handler", "github_approval_checker.lambda_handler"),
+    ("connexion app", "github_approval_checker.app")
+]
+
+# Third-party packages whose cumulative import cost is broken out
+PACKAGES = ["connexion", "flask", "flask_cors", "werkzeug", "jsonschema", "yaml", "requests"]
+
+
+def measure(module):
+    """
+    Imports a module in a fresh interpreter.
+    @return: The total microseconds spent importing, and a dict of the cumulative microseconds
+    of each top-level package in PACKAGES that was imported.
+    """
+    output = subprocess.check_output(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        stderr=subprocess.STDOUT
+    ).decode("utf-8")
+    total = 0
+    packages = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = [field.strip() for field in line[len("import time:"):].split("|")]
+        if not fields[0].isdigit():
+            continue
+        self_us, cumulative_us, name = int(fields[0]), int(fields[1]), fields[2]
+        total += self_us
+        stripped = name.strip()
+        if stripped in PACKAGES and stripped not in packages:
+            packages[stripped] = cumulative_us
+    return total, packages
+
+
+def main(runs):
+    """
+    Runs the comparison and prints the best run of each entry point.
+    """
+    results = []
+    for label, module in ENTRY_POINTS:
+        best = min((measure(module) for _ in range(runs)), key=lambda run: run[0])
+        results.append((label, best))
+
+    print("Best of {} cold imports, in milliseconds".format(runs))
+    print("{:<26}".format("") + "".join("{:>16}".format(label) for label, _ in results))
+    print("{:<26}".format("total") + "".join("{:>16.1f}".format(total / 1000.0) for _, (total, _) in results))
+    for package in PACKAGES:
+        row = [
+            "{:>16}".format("{:.1f}".format(packages[package] / 1000.0) if package in packages else "-")
+            for _, (_, packages) in results
+        ]
+        print("{:<26}".format("  " + package) + "".join(row))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,126 @@
+"""
+Compares the number of GitHub API calls made per authorization decision by the original fixed
+evaluation order (orgs, teams, users, admins) and by the compiled, cost-ordered policy.
+
+Usage, from the root of the repository:
+    python -m benchmarks.policy_benchmark [decisions]
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import time
+from github_approval_checker.utils.policy import AuthorizationPolicy, CheckStats
+
+REPO_CONFIG = {
+    "orgs": ["partner-org", "contractor-org"],
+    "teams": ["infra", "security", "core"],
+    "users": ["release-bot", "alice", "bob", "carol", "dave"],
+    "admins": True
+}
+
+# Share of reviewers granted by each route, the rest are not authorized at all
+REVIEWERS = [("whitelisted", 0.3), ("core-team", 0.45), ("admin", 0.15), ("outsider", 0.1)]
+
+WHITELISTED = ["alice", "bob", "carol", "dave"]
+
+# Simulated latency of each API call, in seconds
+LATENCY = 0.0005
+
+
+class FakeHandler(object):
+    """
+    Stands in for GithubHandler and counts the API calls made.
+    """
+
+    def __init__(self, reviewer_kinds):
+        self.calls = 0
+        self.reviewer_kinds = reviewer_kinds
+
+    def _call(self):
+        self.calls += 1
+        time.sleep(LATENCY)
+
+    def is_user_in_org(self, _org, _username):
+        """
+        No reviewer belongs to an allowed organization.
+        """
+        self._call()
+        return False
+
+    def is_user_on_org_team(self, _owner, team, username):
+        """
+        Core team reviewers belong to the core team only.
+        """
+        self._call()
+        return team == "core" and self.reviewer_kinds[username] == "core-team"
+
+    def get_user_permission(self, _repository_name, username):
+        """
+        Admin reviewers have the admin permission, the others write.
+        """
+        self._call()
+        return "admin" if self.reviewer_kinds[username] == "admin" else "write"
+
+
+def fixed_order(handler, username, owner, repo, repo_config):
+    """
+    The evaluation order used before policies were compiled.
+    """
+    for org in repo_config.get("orgs", []):
+        if handler.is_user_in_org(org, username):
+            return True
+    for team in repo_config.get("teams", []):
+        if handler.is_user_on_org_team(owner, team, username):
+            return True
+    if username in repo_config.get("users", []):
+        return True
+    if repo_config.get("admins", False):
+        return handler.get_user_permission("{}/{}".format(owner, repo), username) == "admin"
+    return False
+
+
+def generate_reviewers(count, seed=42):
+    """
+    Generates a reproducible sequence of (username, kind) reviewers.
+    """
+    rng = random.Random(seed)
+    reviewers = []
+    for i in range(count):
+        roll = rng.random()
+        for kind, share in REVIEWERS:
+            roll -= share
+            if roll <= 0:
+                break
+        username = rng.choice(WHITELISTED) if kind == "whitelisted" else "{}-{}".format(kind, i)
+        reviewers.append((username, kind))
+    return reviewers
+
+
+def main(decisions):
+    """
+    Runs both strategies over the same reviewers and prints the API calls each made.
+    """
+    reviewers = generate_reviewers(decisions)
+    kinds = dict(reviewers)
+
+    fixed = FakeHandler(kinds)
+    for username, _ in reviewers:
+        fixed_order(fixed, username, "owner", "repo", REPO_CONFIG)
+
+    compiled = FakeHandler(kinds)
+    auth_policy = AuthorizationPolicy(REPO_CONFIG, CheckStats())
+    for username, _ in reviewers:
+        auth_policy.is_authorized(compiled, username, "owner", "repo")
+
+    fixed_per_decision = float(fixed.calls) / decisions
+    compiled_per_decision = float(compiled.calls) / decisions
+    print("decisions:                   {}".format(decisions))
+    print("fixed order calls/decision:  {:.2f}".format(fixed_per_decision))
+    print("compiled calls/decision:     {:.2f}".format(compiled_per_decision))
+    print("calls saved/decision:        {:.2f}".format(fixed_per_decision - compiled_per_decision))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,110 @@
+"""
+Asyncio version of review_processor.process_review, for use with AsyncGithubHandler.
+
+Requires Python 3.6+.
+"""
+
+import asyncio
+import logging
+from github_approval_checker.api.review_processor import (
+    ReviewEvent,
+    triage_response,
+    finish_review
+)
+from github_approval_checker.utils import api_metrics, tracing, util
+from github_approval_checker.utils.api_metrics import ApiMetrics
+from github_approval_checker.utils.exceptions import ConfigError, APIError
+from github_approval_checker.utils.rate_limit import PRIORITY_OPTIONAL
+from github_approval_checker.utils.status_reconciler import reconcile
+
+logger = logging.getLogger(__name__)
+
+
+async def process_review_async(api_handler, data, config_filename, prefetch_authorization=False):
+    """
+    Overwrites the failed statuses on a reviewed commit if the review is an approval from an
+    authorized reviewer, following the same steps as review_processor.process_review.
+    @params api_handler: The AsyncGithubHandler to call the GitHub API with.
+    @params data: The PullRequestReview event payload.
+    @params config_filename: The filename of the configuration file in each repository.
+    @params prefetch_authorization: Whether to authorize the reviewer while the statuses are still
+    being fetched.
+    @return: A response tuple of body and HTTP status code.
+    """
+    dropped = triage_response(data)
+    if dropped is not None:
+        return dropped
+
+    event = ReviewEvent.from_payload(data)
+    with api_metrics.recording(ApiMetrics()) as recorder:
+        response = await _process_event(api_handler, recorder, event, config_filename, prefetch_authorization)
+    api_metrics.log_summary(recorder, event, response)
+    return response
+
+
+async def _process_event(api_handler, recorder, event, config_filename, prefetch_authorization):
+    """
+    Processes an approved ReviewEvent, see process_review_async.
+    @params recorder: The ApiMetrics recording the GitHub calls made for the event.
+    """
+
+    config_task = asyncio.ensure_future(api_handler.get_config(event.repo_full_name, config_filename))
+    statuses_task = asyncio.ensure_future(api_handler.get_statuses(event.repo_full_name, event.commit_id))
+    authorized_task = None
+
+    try:
+        try:
+            with tracing.span('get_config'):
+                repo_config = await config_task
+        except APIError as err:
+            logger.error("Configuration file error: %s", err)
+            return err.response
+
+        try:
+            with tracing.span('validate_config'):
+                util.validate_config(repo_config)
+        except ConfigError as err:
+            logger.error("Configuration validation error: %s", err)
+            return err.response
+
+        if prefetch_authorization and api_handler.rate_limit.allows(PRIORITY_OPTIONAL):
+            authorized_task = asyncio.ensure_future(
+                api_handler.is_authorized(event.reviewer, event.organization, event.repo, repo_config)
+            )
+
+        try:
+            with tracing.span('get_statuses'):
+                plan = reconcile(await statuses_task)
+            to_overwrite = plan.writes
+
+            authorized = False
+            if to_overwrite:
+                with tracing.span('authorize', reviewers=1):
+                    if authorized_task is not None:
+                        authorized = await authorized_task
+                    else:
+                        authorized = await api_handler.is_authorized(
+                            event.reviewer, event.organization, event.repo, repo_config
+                        )
+        except APIError as err:
+            logger.error("Unable to check the review: %s", err)
+            return err.response
+
+        results = {}
+        if authorized:
+            logger.info(
+                "%s is authorized to overwrite failed status in repository %s", event.reviewer, event.repo
+            )
+            with tracing.span('post_statuses', statuses=len(to_overwrite)):
+                results = await api_handler.post_statuses(
+                    event.repo_full_name, event.commit_id, to_overwrite, event.reviewer
+                )
+    finally:
+        # Do not leave a prefetch running once its result can no longer be used
+        for task in (config_task, statuses_task, authorized_task):
+            if task is not None and not task.done():
+                task.cancel()
+
+    return finish_review(
+        event, results, recorder.totals()['calls'], api_handler.rate_limit, len(plan.skipped)
+    )
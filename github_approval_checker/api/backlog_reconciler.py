@@ -0,0 +1,307 @@
+"""
+Catches up on open pull requests that were approved while their reviews could not be processed,
+such as during an outage or while the webhook was misconfigured, by applying the same
+configuration, authorization and status overwrites as a review delivery.
+
+Run `python -m github_approval_checker.api.backlog_reconciler --org ORG --repo OWNER/REPO` with
+the environment of the webhook. Finished pull requests are recorded in a SQLite checkpoint, so
+that an interrupted run, or one stopped to leave rate limit budget to live reviews, resumes
+where it stopped when it is run again.
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+import requests
+from github_approval_checker.api import review_processor, settings
+from github_approval_checker.utils.concurrency import WorkerPool
+from github_approval_checker.utils.exceptions import APIError, RateLimitError
+from github_approval_checker.utils.rate_limit import (
+    DEFAULT_OPTIONAL_RESERVE,
+    PRIORITY_OPTIONAL,
+    PRIORITY_WRITE
+)
+
+DEFAULT_WORKERS = 4
+DEFAULT_CHECKPOINT_PATH = '/tmp/github_approval_checker_backlog.db'
+
+# Requests left in the rate limit budget at which a run stops, kept for live reviews
+DEFAULT_RESERVE = DEFAULT_OPTIONAL_RESERVE
+
+# Review states that replace a reviewer's earlier verdict, unlike comments
+VERDICT_STATES = frozenset(['APPROVED', 'CHANGES_REQUESTED', 'DISMISSED'])
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS reconciled_pulls (
+    repository TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    head_sha TEXT NOT NULL,
+    status_code INTEGER,
+    finished_at REAL NOT NULL,
+    PRIMARY KEY (repository, number, head_sha)
+)
+'''
+
+logger = logging.getLogger(__name__)
+
+
+def approved_reviewers(reviews, head_sha):
+    """
+    @params reviews: The reviews of a pull request, in the order they were submitted.
+    @params head_sha: The head commit of the pull request.
+    @return reviewers: The reviewers whose latest verdict approves the head commit, in the order
+    of their verdicts.
+    """
+    verdicts = OrderedDict()
+    for review in reviews:
+        user = review.get('user')
+        if user and review.get('state') in VERDICT_STATES:
+            verdicts.pop(user['login'], None)
+            verdicts[user['login']] = review
+    return [
+        reviewer for reviewer, review in verdicts.items()
+        if review['state'] == 'APPROVED' and review.get('commit_id') == head_sha
+    ]
+
+
+class Checkpoint(object):
+    """
+    The pull requests a reconciliation has finished, in a SQLite database file. A pull request
+    pushed to since it was finished has a new head commit, and is reconciled again.
+    """
+
+    def __init__(self, path, clock=time.time):
+        """
+        @params path: The path of the SQLite database file, or ':memory:'.
+        @params clock: A callable returning the current time in seconds.
+        """
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._connection.execute(_SCHEMA)
+
+    def done(self, repository_name, number, head_sha):
+        """
+        @return boolean: Whether the pull request was finished at this head commit.
+        """
+        with self._lock:
+            return self._connection.execute(
+                'SELECT 1 FROM reconciled_pulls WHERE repository = ? AND number = ? AND head_sha = ?',
+                (repository_name, number, head_sha)
+            ).fetchone() is not None
+
+    def record(self, repository_name, number, head_sha, status_code=None):
+        """
+        Records a pull request as finished at a head commit.
+        @params status_code: The status code processing its approvals returned, or None if it had
+        no approval to process.
+        """
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO reconciled_pulls '
+                '(repository, number, head_sha, status_code, finished_at) VALUES (?, ?, ?, ?, ?)',
+                (repository_name, number, head_sha, status_code, self.clock())
+            )
+
+
+class BacklogReconciler(object):
+    """
+    Processes the approvals of the open pull requests of repositories, a bounded number of pull
+    requests at a time, stopping once the rate limit budget falls to its reserve.
+    """
+
+    def __init__(self, api_handler, config_filename, checkpoint, workers=DEFAULT_WORKERS,
+                 reserve=DEFAULT_RESERVE):
+        """
+        @params api_handler: The GithubHandler to call the GitHub API with.
+        @params config_filename: The filename of the configuration file in each repository.
+        @params checkpoint: The Checkpoint of the pull requests already finished.
+        @params workers: The number of pull requests reconciled at once.
+        @params reserve: Requests left in the rate limit budget at which the run stops.
+        """
+        self.api_handler = api_handler
+        self.config_filename = config_filename
+        self.checkpoint = checkpoint
+        self.reserve = reserve
+        self.counts = {
+            'repositories': 0, 'unconfigured': 0, 'pulls': 0, 'checkpointed': 0, 'unapproved': 0,
+            'reconciled': 0, 'failed': 0, 'deferred': 0
+        }
+        self._pool = WorkerPool(workers)
+        self._lock = threading.Lock()
+
+    def repositories(self, organizations=(), repository_names=()):
+        """
+        @params organizations: The organizations whose repositories to reconcile.
+        @params repository_names: Further repositories to reconcile, in the format 'owner/repo'.
+        @return repository_names: The full names of the repositories, without archived ones.
+        """
+        names = list(repository_names)
+        for organization in organizations:
+            try:
+                names.extend(
+                    repository['full_name']
+                    for repository in self.api_handler.get_org_repositories(organization, PRIORITY_OPTIONAL)
+                    if not repository.get('archived') and not repository.get('disabled')
+                )
+            except (APIError, requests.exceptions.RequestException) as err:
+                logger.error('Unable to list the repositories of %s: %s', organization, err)
+                self._count('failed')
+        return list(OrderedDict.fromkeys(names))
+
+    def run(self, repository_names):
+        """
+        Reconciles repositories in turn until they are done or the budget falls to its reserve.
+        @params repository_names: The list of full names of the repositories, as 'owner/repo'.
+        @return counts: A dict of the repositories and pull requests seen, and of how the pull
+        requests were finished, failed or deferred to the next run. Repositories left unstarted are
+        counted as deferred.
+        """
+        for index, repository_name in enumerate(repository_names):
+            if self.exhausted():
+                logger.info('Rate limit budget down to its reserve of %s, stopping', self.reserve)
+                with self._lock:
+                    self.counts['deferred'] += len(repository_names) - index
+                break
+            self.reconcile_repository(repository_name)
+        return dict(self.counts)
+
+    def exhausted(self):
+        """
+        @return boolean: Whether the rate limit budget is down to the reserve.
+        """
+        remaining = self.api_handler.rate_limit.remaining()
+        return not self.api_handler.rate_limit.allows(PRIORITY_WRITE) or (
+            remaining is not None and remaining <= self.reserve
+        )
+
+    def reconcile_repository(self, repository_name):
+        """
+        Reconciles the open pull requests of a repository that the checkpoint has not finished.
+        Repositories without a configuration file are skipped before their pull requests are listed.
+        """
+        self._count('repositories')
+        try:
+            self.api_handler.get_config(repository_name, self.config_filename)
+        except RateLimitError as err:
+            logger.info('Reconciling %s deferred: %s', repository_name, err)
+            self._count('deferred')
+            return
+        except APIError:
+            logger.info('%s has no %s, skipping it', repository_name, self.config_filename)
+            self._count('unconfigured')
+            return
+        except requests.exceptions.RequestException as err:
+            logger.error('Unable to fetch the %s of %s: %s', self.config_filename, repository_name, err)
+            self._count('failed')
+            return
+
+        try:
+            pulls = []
+            for pull in self.api_handler.get_open_pulls(repository_name, PRIORITY_OPTIONAL):
+                self._count('pulls')
+                if self.checkpoint.done(repository_name, pull['number'], pull['head']['sha']):
+                    self._count('checkpointed')
+                else:
+                    pulls.append(pull)
+        except RateLimitError as err:
+            logger.info('Reconciling %s deferred: %s', repository_name, err)
+            self._count('deferred')
+            return
+        except (APIError, requests.exceptions.RequestException) as err:
+            logger.error('Unable to list the pull requests of %s: %s', repository_name, err)
+            self._count('failed')
+            return
+        self._pool.map(lambda pull: self.reconcile_pull(repository_name, pull), pulls)
+
+    def reconcile_pull(self, repository_name, pull):
+        """
+        Processes the approvals of a pull request's head commit like a delivery of its reviews,
+        and records it in the checkpoint unless it failed or was deferred.
+        @params repository_name: The full name of the repository in the format 'owner/repo'.
+        @params pull: The pull request, as listed by GithubHandler.get_open_pulls.
+        """
+        if self.exhausted():
+            self._count('deferred')
+            return
+        number, head_sha = pull['number'], pull['head']['sha']
+        try:
+            reviewers = approved_reviewers(
+                self.api_handler.get_pull_reviews(repository_name, number, PRIORITY_OPTIONAL), head_sha
+            )
+            if not reviewers:
+                self.checkpoint.record(repository_name, number, head_sha)
+                self._count('unapproved')
+                return
+            organization, repo = repository_name.split('/', 1)
+            events = [
+                review_processor.ReviewEvent(
+                    repo, organization, repository_name, reviewer, 'approved', head_sha
+                ) for reviewer in reviewers
+            ]
+            response = review_processor.process_reviews(self.api_handler, events, self.config_filename)
+        except RateLimitError as err:
+            logger.info('Reconciling %s#%s deferred: %s', repository_name, number, err)
+            self._count('deferred')
+            return
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Unable to reconcile %s#%s', repository_name, number)
+            self._count('failed')
+            return
+
+        body, status_code = response
+        if status_code == 503:
+            self._count('deferred')
+        elif status_code >= 500 or 'failed_contexts' in body:
+            logger.error('Reconciling %s#%s failed: %s', repository_name, number, body)
+            self._count('failed')
+        else:
+            self.checkpoint.record(repository_name, number, head_sha, status_code)
+            self._count('reconciled')
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+
+def main(argv):
+    """
+    Reconciles the repositories named on the command line with the environment's settings.
+    @return exit_code: 0 if every pull request was finished, 1 if some are left to a rerun.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--org', action='append', default=[],
+                        help='an organization to reconcile every repository of')
+    parser.add_argument('--repo', action='append', default=[],
+                        help='a repository to reconcile, as OWNER/REPO')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH,
+                        help='the SQLite file of finished pull requests, delete it to start over')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='pull requests reconciled at once')
+    parser.add_argument('--reserve', type=int, default=DEFAULT_RESERVE,
+                        help='rate limit requests left to live reviews, the run stops at this budget')
+    args = parser.parse_args(argv)
+    if not args.org and not args.repo:
+        parser.error('at least one --org or --repo is required')
+
+    from github_approval_checker.utils import logging_config
+    logging_config.configure_logging(False, False)
+    reconciler = BacklogReconciler(
+        settings.get_api_handler(),
+        os.getenv('config_filename'),
+        Checkpoint(args.checkpoint),
+        workers=args.workers,
+        reserve=args.reserve
+    )
+    counts = reconciler.run(reconciler.repositories(args.org, args.repo))
+    logger.info('Backlog reconciliation finished: %s', counts)
+    return 1 if counts['failed'] or counts['deferred'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -3,13 +3,10 @@ Represents all endpoints exposed for the API. Each is prefixed by its
 appropriate HTTP verb.
 """
 
-import os
 import logging
 import connexion
-from github_approval_checker.utils import util
+from github_approval_checker.api import settings, webhook
 from github_approval_checker.utils import logging_config
-from github_approval_checker.utils.github_handler import GithubHandler
-from github_approval_checker.utils.exceptions import ConfigError, APIError, SignatureError
 
 logging_config.configure_logging(False, False)
 logger = logging.getLogger(__name__)
@@ -17,71 +14,89 @@ logger = logging.getLogger(__name__)
 
 def post_pull_request_review(data):
     """
-    Receive a webhook event of type PullRequestReview
+    Receive a webhook event of type PullRequestReview. Its signature has already been verified
+    by the SignatureMiddleware in front of the app. Redelivered events are answered from the
+    idempotency store, and in the 'queue' processing mode, events that pass triage are queued
+    and answered with a 202 before any GitHub call is made.
     @params data: Request json passed in from GitHub
     @return: Returns 200 to indicate that status was posted successfully
     or returns an Error message.
     """
+    return webhook.receive_review(
+        data,
+        connexion.request.headers.get('X-GitHub-Delivery'),
+        settings.get_api_handler
+    )
 
-    try:
-        signature = util.parse_signature(connexion.request.headers.get('X-Hub-Signature', ''))
-
-        util.verify_signature(
-            connexion.request.data,
-            signature,
-            os.getenv('webhook_secret')
-        )
-    except SignatureError as err:
-        logger.error(err.message)
-        return err.response
-
-    api_handler = GithubHandler(os.getenv('github_username'), os.getenv('github_api_key'))
-
-    repo = data['repository']['name']
-    organization = data['repository']['owner']['login']
-    repo_full_name = data['repository']['full_name']
-
-    reviewer = data['review']['user']['login']
-    review_state = data['review']['state']
-    review_ref = data['review']['commit_id']
-
-    try:
-        repo_config = api_handler.get_config(repo_full_name, os.getenv('config_filename'))
-    except APIError as err:
-        logger.error("Configuration file error: " + err.message)
-        return err.response
-
-    try:
-        util.validate_config(repo_config)
-    except ConfigError as err:
-        logger.error("Configuration validation error: " + err.message)
-        return err.response
-
-    # Check that the review was 'approved' and not changes reqeusted or something else
-    if review_state != 'approved':
-        logger.info('Review was not approved. Nothing overwritten.')
-        return ({'status': 'OK', 'message': 'Review state is not approved'}, 200)
-
-    # Get the current status messages on the PR
-    status_messages = api_handler.get_statuses(repo_full_name, review_ref)
-
-    for status in status_messages:
-        if (status['state'] in ['error', 'failure'] and
-                api_handler.is_authorized(reviewer, organization, repo, repo_config)):
-            logger.info(
-                "%s is authorized to overwrite failed status in repository %s", reviewer, repo
-            )
-            res_status_code = api_handler.post_status(
-                repo_full_name,
-                review_ref,
-                status['context'],
-                status['target_url'],
-                reviewer,
-                status['description']
-            )
-            if res_status_code == 201:
-                logger.info('Successfully posted a status')
-            else:
-                logger.error('Failed to post a status to Github for an approved reivew.')
-
-    return util.STATUS_OK
+
+def post_push(data):
+    """
+    Receive a webhook event of type push, forgetting the cached configurations it changed.
+    @params data: Request json passed in from GitHub
+    @return: Returns 200 with the number of cached entries forgotten.
+    """
+    return webhook.receive_invalidation('push', data, settings.get_api_handler)
+
+
+def post_membership(data):
+    """
+    Receive a webhook event of type membership, forgetting the cached members of its team.
+    @params data: Request json passed in from GitHub
+    @return: Returns 200 with the number of cached entries forgotten.
+    """
+    return webhook.receive_invalidation('membership', data, settings.get_api_handler)
+
+
+def post_team(data):
+    """
+    Receive a webhook event of type team, forgetting the cached members of its team.
+    @params data: Request json passed in from GitHub
+    @return: Returns 200 with the number of cached entries forgotten.
+    """
+    return webhook.receive_invalidation('team', data, settings.get_api_handler)
+
+
+def post_organization(data):
+    """
+    Receive a webhook event of type organization, forgetting the cached members of the
+    organization and its teams.
+    @params data: Request json passed in from GitHub
+    @return: Returns 200 with the number of cached entries forgotten.
+    """
+    return webhook.receive_invalidation('organization', data, settings.get_api_handler)
+
+
+def post_member(data):
+    """
+    Receive a webhook event of type member, forgetting the cached permission of the collaborator.
+    @params data: Request json passed in from GitHub
+    @return: Returns 200 with the number of cached entries forgotten.
+    """
+    return webhook.receive_invalidation('member', data, settings.get_api_handler)
+
+
+def get_metrics():
+    """
+    Reports the GitHub API calls made by this process, for long-lived servers. Only served when
+    metrics_route is enabled.
+    @return: Returns 200 with the call counts, status codes, bytes and latency histograms of
+    each GitHub endpoint, the rate limit budget, the reuse of pooled connections and the cache
+    stats, or 404 if the route is disabled.
+    """
+    if not settings.metrics_route():
+        return ({'status': 'Not Found', 'message': 'The metrics route is disabled'}, 404)
+
+    api_handler = settings.get_api_handler()
+    metrics = {
+        'github_requests': api_handler.request_count,
+        'github_endpoints': api_handler.metrics.snapshot(),
+        'rate_limit': api_handler.rate_limit.snapshot(),
+        'connections': api_handler.connection_stats(),
+        'caches': api_handler.cache_stats()
+    }
+    if api_handler.membership is not None:
+        metrics['membership'] = api_handler.membership.snapshot()
+    if settings.processing_mode() == 'queue':
+        from github_approval_checker.api import queue_worker
+        metrics['work_queue'] = queue_worker.get_shared_worker().metrics()
+    return (metrics, 200)
@@ -0,0 +1,78 @@
+"""
+Processes a claimed review delivery with the settings of the environment. Shared by the
+webhook entry points, which process deliveries as they arrive, and by the queue worker, which
+processes them once they were queued.
+"""
+
+import os
+from contextlib import contextmanager
+from github_approval_checker.api import review_processor, settings
+from github_approval_checker.utils import tracing
+
+
+def process_delivery(data, get_api_handler, store=None, keys=()):
+    """
+    Processes a review delivery, then releases the idempotency keys claimed for it that must
+    not stop it from being processed again. Every key is released if processing raises.
+    @params data: The PullRequestReview event payload.
+    @params get_api_handler: A callable returning the GithubHandler.
+    @params store: The idempotency store the keys were claimed in, or None.
+    @params keys: The keys claimed for the delivery, as built by review_keys.
+    @return: A response tuple of body and HTTP status code.
+    """
+    try:
+        response = review_processor.process_review(
+            get_api_handler(),
+            data,
+            os.getenv('config_filename'),
+            prefetch_authorization=settings.prefetch_authorization(),
+            coalesce_window=settings.coalesce_window()
+        )
+    except Exception:
+        release_unfinished(store, keys, None)
+        raise
+    release_unfinished(store, keys, response)
+    return response
+
+
+def succeeded(response):
+    """
+    @params response: A response returned by process_review.
+    @return boolean: Whether the response reports the review as processed, with every status
+    it tried to overwrite written.
+    """
+    return isinstance(response, tuple) and response[1] < 300 and 'failed_contexts' not in response[0]
+
+
+def release_unfinished(store, keys, response):
+    """
+    Releases the idempotency keys that must not stop a review from being processed again. Every
+    key is released if processing failed. Otherwise the review key, the last of review_keys, is
+    released unless statuses were overwritten: a reviewer approving while the checks are still
+    pending has to be able to approve again once they fail.
+    @params store: The idempotency store the keys were claimed in, or None.
+    @params keys: The keys claimed for the delivery, as built by review_keys.
+    @params response: The response returned by process_review, or None if it raised.
+    """
+    if store is None or not keys:
+        return
+    if not succeeded(response):
+        store.release(keys)
+    elif not response[0].get('overwritten_contexts'):
+        store.release(keys[-1:])
+
+
+@contextmanager
+def observed(delivery_id):
+    """
+    Traces the stages of a delivery to the trace_path file, and profiles it when it is sampled
+    by profile_requests.
+    @params delivery_id: The X-GitHub-Delivery header of the webhook, or None if it was not sent.
+    @return: A context manager yielding the Trace of the delivery, or None if it is not traced.
+    """
+    with tracing.start_trace(delivery_id, settings.trace_sink()) as trace:
+        if tracing.should_profile(settings.profile_sample_rate()):
+            with tracing.profiled(delivery_id, settings.profile_dir()):
+                yield trace
+        else:
+            yield trace
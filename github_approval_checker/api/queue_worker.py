@@ -0,0 +1,208 @@
+"""
+Acknowledge-then-process mode: verified review events are put on the work queue and answered
+with a 202 straight away, and a pool of worker threads processes them afterwards, retrying
+those that fail.
+
+Run `python -m github_approval_checker.api.queue_worker` to drain the queue file from a
+standalone process on the same host.
+"""
+
+import logging
+import threading
+import time
+from github_approval_checker.api import processing, settings
+from github_approval_checker.utils.work_queue import get_shared_queue
+
+ACCEPTED = ({'status': 'Accepted', 'message': 'Review queued for processing'}, 202)
+
+# Seconds before the first retry of a failed item, doubled for every attempt after it
+DEFAULT_RETRY_DELAY = 5
+
+# Seconds an idle worker waits before checking the queue again
+DEFAULT_POLL_INTERVAL = 1.0
+
+logger = logging.getLogger(__name__)
+
+_SHARED_WORKER = None
+_SHARED_WORKER_LOCK = threading.Lock()
+
+
+def process_queued_review(payload):
+    """
+    Processes a review event taken from the queue with the handler configured in the environment.
+    When processing fails, the idempotency keys of the delivery are released so that a
+    redelivery is not answered as a duplicate while the item waits for its retry, and the review
+    key is released unless statuses were overwritten.
+    @params payload: The queued dict of the event payload, its idempotency keys and its delivery id.
+    @return: A response tuple of body and HTTP status code.
+    """
+    with processing.observed(payload.get('delivery_id')):
+        return processing.process_delivery(
+            payload['data'],
+            settings.get_api_handler,
+            settings.idempotency_store(),
+            payload.get('idempotency_keys')
+        )
+
+
+def get_shared_worker():
+    """
+    Returns the process-wide QueueWorker for the queue configured in the environment.
+    @return worker: The shared QueueWorker, which is not started yet on first use.
+    """
+    global _SHARED_WORKER  # pylint: disable=global-statement
+    with _SHARED_WORKER_LOCK:
+        if _SHARED_WORKER is None:
+            _SHARED_WORKER = QueueWorker(
+                get_shared_queue(settings.work_queue_path()),
+                process_queued_review,
+                workers=settings.queue_workers()
+            )
+        return _SHARED_WORKER
+
+
+def enqueue_review(data, start_worker=True, idempotency_keys=(), delivery_id=None):
+    """
+    Puts a verified review event on the work queue.
+    @params data: The PullRequestReview event payload.
+    @params start_worker: Whether to make sure this process drains the queue as well.
+    @params idempotency_keys: The keys claimed for the delivery, released if processing fails.
+    @params delivery_id: The X-GitHub-Delivery header, which the processing is traced under.
+    @return: The 202 response tuple to answer the delivery with.
+    """
+    worker = get_shared_worker()
+    worker.queue.put({'data': data, 'idempotency_keys': list(idempotency_keys), 'delivery_id': delivery_id})
+    if start_worker:
+        worker.start()
+    return ACCEPTED
+
+
+class QueueWorker(object):
+    """
+    Drains a WorkQueue with a pool of threads, retrying failed items with exponential backoff.
+    """
+
+    def __init__(self, queue, process, workers=settings.DEFAULT_QUEUE_WORKERS,
+                 retry_delay=DEFAULT_RETRY_DELAY, poll_interval=DEFAULT_POLL_INTERVAL):
+        """
+        @params queue: The WorkQueue to drain.
+        @params process: A callable taking a payload and returning a response tuple. Responses
+        with a 5XX status code or failed contexts, and exceptions, are retried.
+        @params workers: The number of threads processing items at once.
+        @params retry_delay: Seconds before the first retry of a failed item.
+        @params poll_interval: Seconds an idle worker waits before checking the queue again.
+        """
+        self.queue = queue
+        self.process = process
+        self.workers = workers
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.processed = 0
+        self.retried = 0
+        self.dead = 0
+        self.last_lag = 0
+        self.max_lag = 0
+        self._threads = []
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts the worker threads, unless they are already running.
+        """
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name='queue-worker-{}'.format(index))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """
+        Stops the worker threads once they finish their current item.
+        @params timeout: The seconds to wait for each thread to stop.
+        """
+        self._stopping.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            if not self.run_once():
+                self._stopping.wait(self.poll_interval)
+
+    def run_once(self):
+        """
+        Claims and processes a single item.
+        @return boolean: True if an item was processed, False if the queue had none available.
+        """
+        item = self.queue.claim()
+        if item is None:
+            return False
+
+        try:
+            body, status_code = self.process(item.payload)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Queued review %s failed on attempt %s', item.item_id, item.attempts)
+            body, status_code = {}, None
+
+        failed_contexts = body.get('failed_contexts')
+        if failed_contexts:
+            logger.error('Queued review %s failed to overwrite %s on attempt %s',
+                         item.item_id, failed_contexts, item.attempts)
+        if status_code is not None and status_code < 500 and not failed_contexts:
+            self.queue.ack(item)
+            lag = self.queue.clock() - item.enqueued_at
+            with self._lock:
+                self.processed += 1
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+        elif self.queue.retry(item, self.retry_delay * 2 ** (item.attempts - 1)):
+            with self._lock:
+                self.retried += 1
+        else:
+            logger.error('Queued review %s given up after %s attempts', item.item_id, item.attempts)
+            with self._lock:
+                self.dead += 1
+        logger.info('Work queue metrics: %s', self.metrics())
+        return True
+
+    def metrics(self):
+        """
+        @return metrics: A dict of the queue's depth and age, and of the items processed, retried
+        and given up on by this worker with the end-to-end lag in seconds of the processed ones.
+        """
+        metrics = self.queue.stats()
+        with self._lock:
+            metrics.update({
+                'processed': self.processed,
+                'retried': self.retried,
+                'given_up': self.dead,
+                'last_lag': self.last_lag,
+                'max_lag': self.max_lag
+            })
+        return metrics
+
+
+def main():
+    """
+    Drains the work queue configured in the environment until interrupted.
+    """
+    from github_approval_checker.utils import logging_config
+    logging_config.configure_logging(False, False)
+    worker = get_shared_worker()
+    worker.start()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        worker.stop()
+
+
+if __name__ == '__main__':
+    main()
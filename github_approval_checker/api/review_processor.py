@@ -0,0 +1,236 @@
+"""
+Processes pull request review events independently of the web framework that received them.
+"""
+
+import logging
+from collections import namedtuple, OrderedDict
+from github_approval_checker.utils import api_metrics, tracing, util
+from github_approval_checker.utils.api_metrics import ApiMetrics
+from github_approval_checker.utils.triage import triage, dropped_counts, DROP_MESSAGES
+from github_approval_checker.utils.concurrency import SingleFlight, WorkerPool
+from github_approval_checker.utils.exceptions import ConfigError, APIError
+from github_approval_checker.utils.rate_limit import PRIORITY_OPTIONAL
+from github_approval_checker.utils.status_reconciler import reconcile
+
+PREFETCH_WORKERS = 8
+
+logger = logging.getLogger(__name__)
+
+_PREFETCH_POOL = WorkerPool(PREFETCH_WORKERS)
+
+# Reviews of the same commit are processed one batch at a time
+_SINGLE_FLIGHT = SingleFlight()
+
+
+class ReviewEvent(namedtuple('ReviewEvent', 'repo organization repo_full_name reviewer state commit_id')):
+    """
+    The fields of a PullRequestReview event that processing depends on.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_payload(cls, data):
+        """
+        @params data: The PullRequestReview event payload.
+        @return event: The ReviewEvent for the payload.
+        """
+        return cls(
+            repo=data['repository']['name'],
+            organization=data['repository']['owner']['login'],
+            repo_full_name=data['repository']['full_name'],
+            reviewer=data['review']['user']['login'],
+            state=data['review']['state'],
+            commit_id=data['review']['commit_id']
+        )
+
+
+def triage_response(data):
+    """
+    Checks whether a review event can be dropped without calling the GitHub API.
+    @params data: The PullRequestReview event payload.
+    @return: The response tuple for a dropped event, or None if the event should be processed.
+    """
+    reason = triage(data)
+    if reason is None:
+        return None
+    logger.info('%s. Nothing overwritten. Events dropped so far: %s', DROP_MESSAGES[reason], dropped_counts())
+    return ({'status': 'OK', 'message': DROP_MESSAGES[reason]}, 200)
+
+
+def finish_review(event, results, requests_made, rate_limit=None, skipped=0, connections=None):
+    """
+    Logs the outcome of processing a review and builds the response for it.
+    @params event: The ReviewEvent processed.
+    @params results: A dict mapping each overwritten context to the HTTP status code received.
+    @params requests_made: The number of GitHub requests made for the review.
+    @params rate_limit: The RateLimitTracker of the handler, whose budget is logged if given.
+    @params skipped: The number of contexts not written because they were already overwritten.
+    @params connections: The connection_stats of the handler, which are logged if given.
+    @return: A response tuple of body and HTTP status code. The body lists the contexts that were
+    overwritten, or those that failed to be.
+    """
+    failed_contexts = sorted(context for context, status_code in results.items() if status_code != 201)
+    for context in failed_contexts:
+        logger.error('Failed to post status %s to Github for an approved review.', context)
+
+    logger.info(
+        "Review by %s on %s@%s: %s status overrides attempted, %s failed, %s skipped as already "
+        "overwritten, %s GitHub requests made",
+        event.reviewer, event.repo_full_name, event.commit_id, len(results), len(failed_contexts),
+        skipped, requests_made
+    )
+    if rate_limit is not None:
+        logger.info("GitHub rate limit budget: %s", rate_limit.snapshot())
+    if connections is not None:
+        logger.info("GitHub connections: %s", connections)
+    if failed_contexts:
+        return ({'status': 'OK', 'failed_contexts': failed_contexts}, 200)
+    if results:
+        return ({'status': 'OK', 'overwritten_contexts': sorted(results)}, 200)
+    return util.STATUS_OK
+
+
+def process_review(api_handler, data, config_filename, prefetch_authorization=False, coalesce_window=None):
+    """
+    Overwrites the failed statuses on a reviewed commit if the review is an approval from an
+    authorized reviewer. Events that cannot lead to an overwrite are dropped before any API call.
+    @params api_handler: The GithubHandler to call the GitHub API with.
+    @params data: The PullRequestReview event payload.
+    @params config_filename: The filename of the configuration file in each repository.
+    @params prefetch_authorization: Whether to authorize the reviewer while the statuses are still
+    being fetched. This lowers latency but makes membership lookups even when no status failed,
+    so it is skipped while the rate limit budget is low.
+    @params coalesce_window: Seconds to wait for other reviews of the same commit, which are then
+    processed together with this one. Reviews of a commit that is already being processed always
+    wait for it and are processed together afterwards. None processes the review on its own.
+    @return: A response tuple of body and HTTP status code.
+    """
+    dropped = triage_response(data)
+    if dropped is not None:
+        return dropped
+
+    event = ReviewEvent.from_payload(data)
+    if coalesce_window is None:
+        return process_reviews(api_handler, [event], config_filename, prefetch_authorization)
+    return _SINGLE_FLIGHT.run(
+        (event.repo_full_name, event.commit_id),
+        event,
+        lambda events: process_reviews(api_handler, events, config_filename, prefetch_authorization),
+        window=coalesce_window
+    )
+
+
+def process_reviews(api_handler, events, config_filename, prefetch_authorization=False):
+    """
+    Processes the approvals of a commit, recording the GitHub calls made for them and logging
+    their summary as a single EMF line.
+    @params api_handler: The GithubHandler to call the GitHub API with.
+    @params events: The approved ReviewEvents of a single commit.
+    @params config_filename: The filename of the configuration file in each repository.
+    @params prefetch_authorization: Whether to authorize the first reviewer while the statuses
+    are still being fetched.
+    @return: A response tuple of body and HTTP status code.
+    """
+    with api_metrics.recording(ApiMetrics()) as recorder:
+        response = _process_reviews(api_handler, recorder, events, config_filename, prefetch_authorization)
+    api_metrics.log_summary(recorder, events[0], response)
+    return response
+
+
+def _process_reviews(api_handler, recorder, events, config_filename, prefetch_authorization=False):
+    """
+    Overwrites the failed statuses on a commit if any of its approvals is from an authorized
+    reviewer. The configuration and the commit's statuses are fetched concurrently, and each
+    result is only waited for once it is needed. Reviewers are authorized in order until one is
+    authorized, and each failed status is overwritten at most once.
+    @params api_handler: The GithubHandler to call the GitHub API with.
+    @params recorder: The ApiMetrics recording the GitHub calls made for the approvals.
+    @params events: The approved ReviewEvents of a single commit.
+    @params config_filename: The filename of the configuration file in each repository.
+    @params prefetch_authorization: Whether to authorize the first reviewer while the statuses
+    are still being fetched.
+    @return: A response tuple of body and HTTP status code.
+    """
+    event = events[0]
+    reviewers = list(OrderedDict.fromkeys(review.reviewer for review in events))
+    if len(events) > 1:
+        logger.info(
+            "Coalesced %s reviews of %s@%s by %s", len(events), event.repo_full_name, event.commit_id,
+            ', '.join(reviewers)
+        )
+    api_handler.prepare_review(event.repo_full_name, config_filename, event.commit_id, event.reviewer)
+
+    config_result = _PREFETCH_POOL.submit(api_handler.get_config, event.repo_full_name, config_filename)
+    statuses_result = _PREFETCH_POOL.submit(api_handler.get_statuses, event.repo_full_name, event.commit_id)
+
+    try:
+        with tracing.span('get_config'):
+            repo_config = config_result.get()
+    except APIError as err:
+        logger.error("Configuration file error: %s", err)
+        return err.response
+
+    try:
+        with tracing.span('validate_config'):
+            util.validate_config(repo_config)
+    except ConfigError as err:
+        logger.error("Configuration validation error: %s", err)
+        return err.response
+
+    authorized_result = None
+    if prefetch_authorization and api_handler.rate_limit.allows(PRIORITY_OPTIONAL):
+        authorized_result = _PREFETCH_POOL.submit(
+            api_handler.is_authorized, event.reviewer, event.organization, event.repo, repo_config
+        )
+
+    try:
+        # Only write the contexts whose current status differs from the target state
+        with tracing.span('get_statuses'):
+            plan = reconcile(statuses_result.get())
+
+        # Authorize each reviewer at most once, and only if there is something to overwrite
+        authorized_reviewer = None
+        if plan.writes:
+            with tracing.span('authorize', reviewers=len(reviewers)):
+                authorized_reviewer = _first_authorized(
+                    api_handler, event, reviewers, repo_config, authorized_result
+                )
+    except APIError as err:
+        logger.error("Unable to check the review: %s", err)
+        return err.response
+
+    results = {}
+    if authorized_reviewer is not None:
+        event = event._replace(reviewer=authorized_reviewer)
+        logger.info(
+            "%s is authorized to overwrite failed status in repository %s", event.reviewer, event.repo
+        )
+        with tracing.span('post_statuses', statuses=len(plan.writes)):
+            results = api_handler.post_statuses(
+                event.repo_full_name, event.commit_id, plan.writes, event.reviewer
+            )
+
+    return finish_review(
+        event, results, recorder.totals()['calls'], api_handler.rate_limit, len(plan.skipped),
+        api_handler.connection_stats()
+    )
+
+
+def _first_authorized(api_handler, event, reviewers, repo_config, authorized_result=None):
+    """
+    Authorizes reviewers in order until one of them is authorized.
+    @params event: The ReviewEvent whose reviewer may already be authorized by authorized_result.
+    @params reviewers: The reviewers of the commit.
+    @params repo_config: The repository's configuration.
+    @params authorized_result: The prefetched authorization of the event's reviewer, or None.
+    @return reviewer: The first authorized reviewer, or None if none of them is.
+    """
+    for reviewer in reviewers:
+        if authorized_result is not None and reviewer == event.reviewer:
+            authorized = authorized_result.get()
+        else:
+            authorized = api_handler.is_authorized(reviewer, event.organization, event.repo, repo_config)
+        if authorized:
+            return reviewer
+    return None
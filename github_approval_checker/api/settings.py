@@ -0,0 +1,192 @@
+"""
+Reads the approval checker's settings from the environment, shared by every entry point.
+The configured GitHub handler class is only imported once it is asked for.
+"""
+
+import importlib
+import os
+
+# Values of github_data_provider mapped to the dotted path of their GithubHandler class
+HANDLER_CLASSES = {
+    'rest': 'github_approval_checker.utils.github_handler.GithubHandler',
+    'graphql': 'github_approval_checker.utils.graphql_handler.GraphQLGithubHandler'
+}
+
+PROCESSING_MODES = ('sync', 'queue')
+DEFAULT_COALESCE_WINDOW = 0
+DEFAULT_WORK_QUEUE_PATH = '/tmp/github_approval_checker_queue.db'
+DEFAULT_QUEUE_WORKERS = 4
+
+IDEMPOTENCY_BACKENDS = ('memory', 'sqlite', 'none')
+DEFAULT_IDEMPOTENCY_PATH = '/tmp/github_approval_checker_idempotency.db'
+DEFAULT_IDEMPOTENCY_TTL = 3600
+
+DEFAULT_PROFILE_DIR = '/tmp'
+
+DEFAULT_CACHE_PATH = '/tmp/github_approval_checker_cache.db'
+DEFAULT_CACHE_URL = 'redis://localhost:6379/0'
+
+# Environment variables mapped to the GithubHandler option they set
+HANDLER_OPTIONS = {
+    'github_pool_size': 'pool_size',
+    'github_max_workers': 'max_workers',
+    'config_cache_max_bytes': 'config_cache_max_bytes',
+    'config_cache_ttl': 'config_ttl',
+    'config_cache_negative_ttl': 'config_negative_ttl',
+    'membership_ttl': 'membership_ttl',
+    'membership_refresh_interval': 'membership_refresh_interval'
+}
+
+
+def get_api_handler():
+    """
+    Returns the process-wide GithubHandler, configured from the environment.
+    """
+    from github_approval_checker.utils.github_handler import get_shared_handler
+    return get_shared_handler(
+        os.getenv('github_username'),
+        os.getenv('github_api_key'),
+        handler_class=handler_class(),
+        cache_backend=shared_cache(),
+        **handler_options()
+    )
+
+
+def handler_class():
+    """
+    @return handler_class: The GithubHandler class selected by github_data_provider.
+    """
+    module_name, class_name = HANDLER_CLASSES[os.getenv('github_data_provider', 'rest')].rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def handler_options():
+    """
+    @return options: The GithubHandler keyword arguments set in the environment. Options that
+    are not set are left to the handler's defaults.
+    """
+    return {
+        option: int(os.getenv(variable))
+        for variable, option in HANDLER_OPTIONS.items()
+        if os.getenv(variable) is not None
+    }
+
+
+def prefetch_authorization():
+    """
+    @return boolean: Whether reviewers are authorized while the statuses are still being fetched.
+    """
+    return os.getenv('prefetch_authorization', 'false').lower() == 'true'
+
+
+def coalesce_window():
+    """
+    @return window: Seconds a review waits for other reviews of the same commit to process them
+    together. Reviews arriving while their commit is being processed are always coalesced.
+    """
+    return float(os.getenv('coalesce_window', str(DEFAULT_COALESCE_WINDOW)))
+
+
+def metrics_route():
+    """
+    @return boolean: Whether the /metrics route reports the GitHub calls made by this process.
+    """
+    return os.getenv('metrics_route', 'false').lower() == 'true'
+
+
+def processing_mode():
+    """
+    @return mode: 'sync' to process reviews before responding, or 'queue' to acknowledge them
+    at once and process them from the work queue.
+    """
+    mode = os.getenv('processing_mode', 'sync')
+    if mode not in PROCESSING_MODES:
+        raise ValueError('processing_mode must be one of ' + ', '.join(PROCESSING_MODES))
+    return mode
+
+
+def work_queue_path():
+    """
+    @return path: The SQLite database file of the work queue.
+    """
+    return os.getenv('work_queue_path', DEFAULT_WORK_QUEUE_PATH)
+
+
+def queue_workers():
+    """
+    @return workers: The number of threads draining the work queue.
+    """
+    return int(os.getenv('queue_workers', str(DEFAULT_QUEUE_WORKERS)))
+
+
+def idempotency_store():
+    """
+    @return store: The shared idempotency store selected by idempotency_backend, or None if
+    duplicate deliveries are not detected.
+    """
+    backend = os.getenv('idempotency_backend', 'memory')
+    if backend not in IDEMPOTENCY_BACKENDS:
+        raise ValueError('idempotency_backend must be one of ' + ', '.join(IDEMPOTENCY_BACKENDS))
+    if backend == 'none':
+        return None
+    from github_approval_checker.utils.idempotency import get_shared_store
+    return get_shared_store(backend, os.getenv('idempotency_path', DEFAULT_IDEMPOTENCY_PATH))
+
+
+def idempotency_ttl():
+    """
+    @return ttl: Seconds a processed delivery is remembered for.
+    """
+    return int(os.getenv('idempotency_ttl', str(DEFAULT_IDEMPOTENCY_TTL)))
+
+
+def trace_sink():
+    """
+    @return sink: The shared FileTraceSink writing to trace_path, or None if tracing is disabled.
+    """
+    path = os.getenv('trace_path')
+    if not path:
+        return None
+    from github_approval_checker.utils.tracing import get_shared_sink
+    return get_shared_sink(path)
+
+
+def profile_sample_rate():
+    """
+    @return rate: The fraction of deliveries profiled, from profile_requests being 'true',
+    'false' or a fraction between 0 and 1.
+    """
+    value = os.getenv('profile_requests', 'false').lower()
+    if value in ('true', 'false'):
+        return 1.0 if value == 'true' else 0.0
+    return float(value)
+
+
+def profile_dir():
+    """
+    @return directory: The directory profiles are written to.
+    """
+    return os.getenv('profile_dir', DEFAULT_PROFILE_DIR)
+
+
+def shared_cache():
+    """
+    @return backend: The shared CacheBackend selected by cache_backend, or None if the handler's
+    caches are private to this process.
+    """
+    backend = os.getenv('cache_backend', 'none')
+    if backend == 'none':
+        return None
+    from github_approval_checker.utils.shared_cache import (
+        CACHE_BACKENDS,
+        DEFAULT_SHARED_MAX_BYTES,
+        get_shared_backend
+    )
+    if backend not in CACHE_BACKENDS:
+        raise ValueError('cache_backend must be one of ' + ', '.join(CACHE_BACKENDS))
+    return get_shared_backend(
+        backend,
+        path=os.getenv('cache_path', DEFAULT_CACHE_PATH),
+        url=os.getenv('cache_url', DEFAULT_CACHE_URL),
+        max_bytes=int(os.getenv('cache_max_bytes', str(DEFAULT_SHARED_MAX_BYTES)))
+    )
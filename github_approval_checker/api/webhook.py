@@ -0,0 +1,67 @@
+"""
+Handles a verified PullRequestReview delivery for every entry point: drops events that need no
+work, answers duplicate deliveries from the idempotency store, then processes the review or
+queues it depending on the processing mode.
+"""
+
+import logging
+from github_approval_checker.api import processing, review_processor, settings
+from github_approval_checker.utils import invalidation, tracing
+from github_approval_checker.utils.idempotency import review_keys
+
+DUPLICATE = ({'status': 'OK', 'message': 'Duplicate delivery, review already processed'}, 200)
+
+logger = logging.getLogger(__name__)
+
+
+def receive_review(data, delivery_id, get_api_handler):
+    """
+    Processes or queues a review delivery, unless it is dropped or a duplicate. The idempotency
+    keys of a delivery are released again when processing it fails, so redelivering it retries,
+    and its review key is released unless statuses were overwritten, so approving again retries.
+    @params data: The PullRequestReview event payload.
+    @params delivery_id: The X-GitHub-Delivery header of the webhook, or None if it was not sent.
+    @params get_api_handler: A callable returning the GithubHandler, only called if the review
+    is processed straight away.
+    @return: A response tuple of body and HTTP status code.
+    """
+    with tracing.span('triage'):
+        dropped = review_processor.triage_response(data)
+    if dropped is not None:
+        return dropped
+
+    with tracing.span('deduplicate'):
+        store = settings.idempotency_store()
+        keys = review_keys(delivery_id, review_processor.ReviewEvent.from_payload(data))
+        duplicate = store is not None and not store.claim(keys, settings.idempotency_ttl())
+    if duplicate:
+        logger.info('Duplicate delivery %s for %s. Nothing overwritten.', delivery_id, keys[-1])
+        return DUPLICATE
+
+    if settings.processing_mode() == 'queue':
+        from github_approval_checker.api import queue_worker
+        with tracing.span('enqueue'):
+            return queue_worker.enqueue_review(
+                data, idempotency_keys=keys if store else (), delivery_id=delivery_id
+            )
+
+    with tracing.span('process_review'):
+        return processing.process_delivery(data, get_api_handler, store, keys)
+
+
+def receive_invalidation(event_name, data, get_api_handler):
+    """
+    Receives a webhook event that changes cached configurations or memberships, and forgets
+    the cached entries it changes. No GitHub call is made.
+    @params event_name: The X-GitHub-Event name of the event, one of invalidation.INVALIDATORS.
+    @params data: The event payload.
+    @params get_api_handler: A callable returning the GithubHandler whose caches to invalidate.
+    @return: A response tuple of body and HTTP status code.
+    """
+    try:
+        with tracing.span('invalidate', event=event_name):
+            invalidated = invalidation.invalidate(get_api_handler(), event_name, data)
+    except KeyError as err:
+        return ({'status': 'Bad Request', 'message': 'Missing required field: {}'.format(err)}, 400)
+    logger.info('%s event invalidated %s cached entries', event_name, invalidated)
+    return ({'status': 'OK', 'message': 'Invalidated {} cached entries'.format(invalidated)}, 200)
@@ -1,12 +1,22 @@
 """Contains all of of the functions mapping to operationIds for the API, as well
 as a few helper functions."""
+import os
 import connexion
 from flask_cors import CORS
+from github_approval_checker.api import processing
+from github_approval_checker.utils.signature import SignatureMiddleware, get_verifier
+from github_approval_checker.utils.tracing import TracingMiddleware
 
 
 app = connexion.FlaskApp(__name__, specification_dir='./specs/')
 app.add_api('swagger.yml')
 
+# Reject badly signed webhooks before connexion parses and validates their bodies.
+app.app.wsgi_app = SignatureMiddleware(app.app.wsgi_app, get_verifier(os.getenv('webhook_secret')))
+
+# Trace deliveries from their arrival, so that the signature check is part of their trace.
+app.app.wsgi_app = TracingMiddleware(app.app.wsgi_app, processing.observed)
+
 # Configure cross origin request sources.
 CORS(
     app.app,
@@ -0,0 +1,143 @@
+"""
+Native AWS Lambda entry point for API Gateway proxy events. It serves the webhook routes
+without building the Flask/connexion app, and only imports the GitHub client once an event
+survives triage, keeping cold starts short. The connexion app in app.py remains available for
+serving through serverless-wsgi.
+
+Reviews are always processed before responding. The 'queue' processing mode keeps its work
+queue in a SQLite file that no worker outside the Lambda instance can reach, and the instance
+is frozen once it responds, so reviews queued there would never be processed.
+"""
+
+import base64
+import json
+import logging
+import os
+from github_approval_checker.api import processing, settings, webhook
+from github_approval_checker.utils import invalidation, logging_config, tracing
+from github_approval_checker.utils.exceptions import SignatureError
+from github_approval_checker.utils.signature import get_verifier
+
+WEBHOOK_PATH = '/hooks/pullRequestReview'
+
+# Routes of the events that invalidate cached entries, mapped to their event name
+INVALIDATION_PATHS = {'/hooks/' + event_name: event_name for event_name in invalidation.INVALIDATORS}
+
+# Fields the swagger definition of a PullRequestReview payload requires
+REQUIRED_FIELDS = ('action', 'pull_request', 'review')
+
+QUEUE_MODE_ERROR = ('processing_mode "queue" is not supported by the Lambda handler, '
+                    'its work queue would not be drained')
+
+logging_config.configure_logging(False, False)
+logger = logging.getLogger(__name__)
+
+
+def handler(event, _context):
+    """
+    Receives an API Gateway proxy event carrying a PullRequestReview webhook, or an event that
+    invalidates cached entries.
+    @params event: The API Gateway proxy event, in either payload format version.
+    @params _context: The Lambda context, unused.
+    @return: The API Gateway proxy response.
+    """
+    route_error = _route_error(event)
+    if route_error is not None:
+        return _proxy_response(route_error)
+
+    headers = event.get('headers') or {}
+    with processing.observed(_get_header(headers, 'X-GitHub-Delivery')):
+        return _proxy_response(_handle_delivery(event, headers))
+
+
+def _handle_delivery(event, headers):
+    """
+    Verifies, parses and receives the webhook delivery of an event routed to the webhook.
+    @params event: The API Gateway proxy event.
+    @params headers: The headers of the event.
+    @return: The response tuple for the delivery.
+    """
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body)
+    elif not isinstance(body, bytes):
+        body = body.encode('utf-8')
+
+    # Reject badly signed deliveries before the body is parsed
+    try:
+        with tracing.span('verify_signature'):
+            verifier = get_verifier(os.getenv('webhook_secret'))
+            verifier.verify_request(lambda name: _get_header(headers, name), body)
+    except SignatureError as err:
+        logger.error(str(err))
+        return err.response
+
+    try:
+        with tracing.span('parse_payload', bytes=len(body)):
+            data = json.loads(body.decode('utf-8'))
+    except ValueError:
+        return ({'status': 'Bad Request', 'message': 'Body is not valid JSON'}, 400)
+
+    event_name = INVALIDATION_PATHS.get(_path(event))
+    if event_name is not None:
+        return webhook.receive_invalidation(event_name, data, settings.get_api_handler)
+
+    if settings.processing_mode() == 'queue':
+        logger.error(QUEUE_MODE_ERROR)
+        return ({'status': 'Configuration Error', 'message': QUEUE_MODE_ERROR}, 500)
+
+    missing = [field for field in REQUIRED_FIELDS if field not in data]
+    if missing:
+        return ({
+            'status': 'Bad Request',
+            'message': 'Missing required fields: ' + ', '.join(missing)
+        }, 400)
+
+    # Dropped and duplicate events are answered before the GitHub client is imported or created
+    return webhook.receive_review(data, _get_header(headers, 'X-GitHub-Delivery'), settings.get_api_handler)
+
+
+def _get_header(headers, name):
+    """
+    @return: The value of a header matched case-insensitively, or None if it is missing.
+    """
+    if name in headers:
+        return headers[name]
+    name = name.lower()
+    for header, value in headers.items():
+        if header.lower() == name:
+            return value
+    return None
+
+
+def _route_error(event):
+    """
+    @return: The response tuple for an event that is not a POST to a webhook route, or None.
+    """
+    http = (event.get('requestContext') or {}).get('http') or {}
+    path = _path(event)
+    method = event.get('httpMethod') or http.get('method')
+    if path != WEBHOOK_PATH and path not in INVALIDATION_PATHS:
+        return ({'status': 'Not Found', 'message': 'No route for ' + str(path)}, 404)
+    if method != 'POST':
+        return ({'status': 'Method Not Allowed', 'message': 'Expected POST'}, 405)
+    return None
+
+
+def _path(event):
+    """
+    @return: The path of an event, in either payload format version.
+    """
+    return event.get('path') or event.get('rawPath')
+
+
+def _proxy_response(response):
+    """
+    Converts a response tuple of body and HTTP status code into an API Gateway proxy response.
+    """
+    body, status_code = response
+    return {
+        'statusCode': status_code,
+        'headers': {'Content-Type': 'application/json'},
+        'body': json.dumps(body)
+    }
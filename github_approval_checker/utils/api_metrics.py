@@ -0,0 +1,243 @@
+"""
+Accounts for the GitHub API calls made by the handlers: call counts, status codes, bytes and
+latency histograms per endpoint, both for the whole process and for each review processed.
+Per-review metrics are written as one CloudWatch embedded metric format (EMF) JSON line.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from github_approval_checker.utils.context_local import ContextLocal
+
+NAMESPACE = 'GithubApprovalChecker'
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS = (25, 50, 100, 250, 500, 1000, 2500, 5000)
+BUCKET_NAMES = ['le_{}'.format(bound) for bound in LATENCY_BUCKETS] + ['le_inf']
+
+# URL paths of the GitHub API mapped to the endpoint name their calls are accounted under
+ENDPOINTS = [
+    (re.compile(r'^/repos/[^/]+/[^/]+/commits/[^/]+/status$'), 'get_statuses'),
+    (re.compile(r'^/repos/[^/]+/[^/]+/statuses/[^/]+$'), 'post_status'),
+    (re.compile(r'^/repos/[^/]+/[^/]+/contents/'), 'get_contents'),
+    (re.compile(r'^/repos/[^/]+/[^/]+/collaborators/[^/]+/permission$'), 'get_user_permission'),
+    (re.compile(r'^/repos/[^/]+/[^/]+/pulls$'), 'get_open_pulls'),
+    (re.compile(r'^/repos/[^/]+/[^/]+/pulls/[^/]+/reviews$'), 'get_pull_reviews'),
+    (re.compile(r'^/orgs/[^/]+/repos$'), 'get_org_repositories'),
+    (re.compile(r'^/orgs/[^/]+/teams/[^/]+/memberships/[^/]+$'), 'is_user_on_org_team'),
+    (re.compile(r'^/orgs/[^/]+/teams/[^/]+$'), 'get_team_id'),
+    (re.compile(r'^/orgs/[^/]+/teams/[^/]+/members$'), 'get_org_team_members'),
+    (re.compile(r'^/orgs/[^/]+/teams$'), 'get_organization_teams'),
+    (re.compile(r'^/orgs/[^/]+/members/[^/]+$'), 'is_user_in_org'),
+    (re.compile(r'^/orgs/[^/]+/members$'), 'get_org_members'),
+    (re.compile(r'^/teams/[^/]+/memberships/[^/]+$'), 'is_user_on_team'),
+    (re.compile(r'^/teams/[^/]+/members$'), 'get_team_members'),
+    (re.compile(r'^/graphql$'), 'graphql')
+]
+
+_URL_PATH = re.compile(r'^[a-z]+://[^/]+(/[^?#]*)')
+
+summary_logger = logging.getLogger(__name__)
+
+_ACTIVE = ContextLocal('active_api_metrics', ())
+
+
+def active():
+    """
+    @return recorders: The ApiMetrics recording the calls of the current context.
+    """
+    return _ACTIVE.get()
+
+
+def endpoint_name(url):
+    """
+    @params url: The full url of a GitHub API request.
+    @return name: The endpoint the request is accounted under, or 'other'.
+    """
+    match = _URL_PATH.match(url)
+    path = match.group(1) if match else url
+    for pattern, name in ENDPOINTS:
+        if pattern.match(path):
+            return name
+    return 'other'
+
+
+def response_size(headers):
+    """
+    @params headers: The headers of a response.
+    @return size: The bytes of the response body as sent over the network, or 0 if unknown.
+    """
+    try:
+        return int((headers or {}).get('Content-Length') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def record(handler_metrics, url, status_code, elapsed, size):
+    """
+    Records a call in a handler's metrics and in every ApiMetrics active in the current context.
+    @params handler_metrics: The ApiMetrics of the handler that made the call.
+    @params url: The full url requested.
+    @params status_code: The HTTP status code received, or None if no response was received.
+    @params elapsed: The seconds the call took.
+    @params size: The bytes of the response body, as returned by response_size.
+    @return endpoint: The endpoint name the call was accounted under.
+    """
+    endpoint = endpoint_name(url)
+    for recorder in (handler_metrics,) + tuple(active()):
+        recorder.record(endpoint, status_code, elapsed, size)
+    return endpoint
+
+
+@contextmanager
+def recording(recorder):
+    """
+    Makes an ApiMetrics record the calls made in the current context, and in the worker threads
+    handed work from it through context_local.bind().
+    @params recorder: The ApiMetrics to record calls in.
+    @return: A context manager yielding the recorder.
+    """
+    previous = active()
+    _ACTIVE.set(previous + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _ACTIVE.set(previous)
+
+
+class EndpointStats(object):
+    """
+    The calls made to a single endpoint.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self.status_codes = {}
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, status_code, elapsed, size):
+        """
+        Adds a call to the stats.
+        """
+        latency_ms = elapsed * 1000
+        self.calls += 1
+        self.bytes += size
+        self.latency_ms += latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+        if status_code is None or status_code >= 500:
+            self.errors += 1
+        key = str(status_code)
+        self.status_codes[key] = self.status_codes.get(key, 0) + 1
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS) and latency_ms > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        self.latency_buckets[bucket] += 1
+
+    def to_dict(self):
+        """
+        @return stats: A JSON serializable dict of the stats.
+        """
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'bytes': self.bytes,
+            'latency_ms': round(self.latency_ms, 3),
+            'max_latency_ms': round(self.max_latency_ms, 3),
+            'status_codes': dict(self.status_codes),
+            'latency_histogram': dict(zip(BUCKET_NAMES, self.latency_buckets))
+        }
+
+
+class ApiMetrics(object):
+    """
+    Thread-safe accounting of GitHub API calls per endpoint.
+    """
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, status_code, elapsed, size):
+        """
+        Records a call.
+        @params endpoint: The endpoint name the call is accounted under.
+        @params status_code: The HTTP status code received, or None if no response was received.
+        @params elapsed: The seconds the call took.
+        @params size: The bytes of the response body.
+        """
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.add(status_code, elapsed, size)
+
+    def snapshot(self):
+        """
+        @return snapshot: A dict of endpoint names mapped to the dict of their stats.
+        """
+        with self._lock:
+            return {endpoint: stats.to_dict() for endpoint, stats in self._endpoints.items()}
+
+    def totals(self):
+        """
+        @return totals: A dict of the calls, errors, bytes and latency summed over all endpoints.
+        """
+        totals = {'calls': 0, 'errors': 0, 'bytes': 0, 'latency_ms': 0.0}
+        for stats in self.snapshot().values():
+            for key in totals:
+                totals[key] += stats[key]
+        return totals
+
+
+def emf_summary(recorder, event, status_code, timestamp=None):
+    """
+    Builds the CloudWatch embedded metric format document summarizing the calls of a review.
+    @params recorder: The ApiMetrics of the review.
+    @params event: The ReviewEvent processed.
+    @params status_code: The HTTP status code of the response to the review.
+    @params timestamp: The time of the summary in seconds, defaults to now.
+    @return document: The EMF dict, with the per-endpoint breakdown as a property.
+    """
+    totals = recorder.totals()
+    return {
+        '_aws': {
+            'Timestamp': int((time.time() if timestamp is None else timestamp) * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': NAMESPACE,
+                'Dimensions': [[]],
+                'Metrics': [
+                    {'Name': 'GitHubCalls', 'Unit': 'Count'},
+                    {'Name': 'GitHubErrors', 'Unit': 'Count'},
+                    {'Name': 'GitHubBytes', 'Unit': 'Bytes'},
+                    {'Name': 'GitHubLatency', 'Unit': 'Milliseconds'}
+                ]
+            }]
+        },
+        'GitHubCalls': totals['calls'],
+        'GitHubErrors': totals['errors'],
+        'GitHubBytes': totals['bytes'],
+        'GitHubLatency': round(totals['latency_ms'], 3),
+        'repository': event.repo_full_name,
+        'commit': event.commit_id,
+        'reviewer': event.reviewer,
+        'status_code': status_code,
+        'endpoints': recorder.snapshot()
+    }
+
+
+def log_summary(recorder, event, response):
+    """
+    Writes the EMF summary of a review's calls as a single JSON line.
+    @params recorder: The ApiMetrics of the review.
+    @params event: The ReviewEvent processed.
+    @params response: The response tuple for the review.
+    """
+    status_code = response[1] if isinstance(response, tuple) else None
+    summary_logger.info(json.dumps(emf_summary(recorder, event, status_code), separators=(',', ':')))
@@ -0,0 +1,436 @@
+"""
+Asyncio counterpart to GithubHandler, so that a single long-running worker can keep many GitHub
+calls in flight across webhook deliveries without a thread per request.
+
+Requires Python 3.6+ and the optional aiohttp dependency (pip install github_approval_checker[async]).
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import threading
+import time
+from github_approval_checker.utils import api_metrics, tracing
+from github_approval_checker.utils.api_metrics import ApiMetrics
+from github_approval_checker.utils.cache import TTLCache, DEFAULT_MAX_BYTES
+from github_approval_checker.utils.exceptions import APIError, RateLimitError
+from github_approval_checker.utils.github_handler import (
+    DEFAULT_HEADERS,
+    DEFAULT_CONFIG_TTL,
+    DEFAULT_CONFIG_NEGATIVE_TTL,
+    CONFIG_NOT_FOUND,
+    MAX_PAGE_SIZE,
+    config_key,
+    config_scope,
+    next_page_url,
+    parse_config,
+    rate_limit_resource,
+    _cached_config,
+    _file_not_found
+)
+from github_approval_checker.utils.policy import compile_policy
+from github_approval_checker.utils.rate_limit import (
+    get_shared_tracker,
+    is_rate_limited,
+    PRIORITY_READ,
+    PRIORITY_WRITE
+)
+from github_approval_checker.utils.status_reconciler import override_description
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+DEFAULT_CONNECTION_LIMIT = 100
+
+# Errors of a single request, which post_statuses reports as a failed status rather than raising
+REQUEST_ERRORS = (APIError, asyncio.TimeoutError) + ((aiohttp.ClientError,) if aiohttp is not None else ())
+
+logger = logging.getLogger(__name__)
+
+_SHARED_HANDLERS = {}
+_SHARED_HANDLERS_LOCK = threading.Lock()
+
+
+def get_shared_async_handler(github_username, github_password, **handler_options):
+    """
+    Returns the process-wide AsyncGithubHandler for a set of credentials, creating it on first use.
+    @params github_username: The GitHub username to authenticate as.
+    @params github_password: The password or API key for the GitHub user.
+    @params handler_options: Keyword arguments for AsyncGithubHandler, only applied when the
+    handler is first created.
+    @return handler: The shared AsyncGithubHandler.
+    """
+    key = (github_username, github_password)
+    with _SHARED_HANDLERS_LOCK:
+        handler = _SHARED_HANDLERS.get(key)
+        if handler is None:
+            handler = AsyncGithubHandler(github_username, github_password, **handler_options)
+            _SHARED_HANDLERS[key] = handler
+        return handler
+
+
+class AsyncResponse(object):
+    """
+    A fully read response from the GitHub API.
+    """
+
+    __slots__ = ('status_code', 'headers', 'body')
+
+    def __init__(self, status_code, headers, body):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        """
+        @return: The decoded JSON body, or None if the body is empty.
+        """
+        return json.loads(self.body) if self.body else None
+
+
+class AsyncGithubHandler(object):
+    """
+    Class to handle Github API calls with asyncio. It offers the same methods as GithubHandler,
+    as coroutines.
+    """
+
+    def __init__(self, github_username, github_password, session=None,
+                 connection_limit=DEFAULT_CONNECTION_LIMIT, headers=None,
+                 config_cache_max_bytes=DEFAULT_MAX_BYTES, config_ttl=DEFAULT_CONFIG_TTL,
+                 config_negative_ttl=DEFAULT_CONFIG_NEGATIVE_TTL):
+        """
+        Initialize handler with with Authentication values from the environment.
+        @params session: An optional aiohttp.ClientSession to send requests with. Otherwise one is
+        created on first use, since it must belong to a running event loop.
+        @params connection_limit: The maximum number of connections open at once.
+        @params headers: Extra default headers used when creating a new session.
+        @params config_cache_max_bytes: The memory budget for cached repository configurations.
+        @params config_ttl: Seconds a fetched configuration is used before being revalidated.
+        @params config_negative_ttl: Seconds a missing configuration file is remembered for.
+        """
+        if session is None and aiohttp is None:
+            raise ImportError('AsyncGithubHandler requires aiohttp to be installed')
+        self.auth = (github_username, github_password)
+        self.session = session
+        self.connection_limit = connection_limit
+        self.headers = dict(DEFAULT_HEADERS, **(headers or {}))
+        self.config_cache = TTLCache(max_bytes=config_cache_max_bytes, scope=config_scope)
+        self.config_ttl = config_ttl
+        self.config_negative_ttl = config_negative_ttl
+        self.rate_limit = get_shared_tracker(github_username)
+        self.request_count = 0
+        self.metrics = ApiMetrics()
+
+    def _get_session(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                auth=aiohttp.BasicAuth(*self.auth),
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=self.connection_limit)
+            )
+        return self.session
+
+    async def close(self):
+        """
+        Closes the session and its pooled connections.
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _request(self, method, url, priority=PRIORITY_READ, **kwargs):
+        """
+        Sends a request to the GitHub API over the shared session and reads the whole response,
+        once the rate limit budget allows a request of its priority.
+        @params method: The HTTP method to use.
+        @params url: The full url to request.
+        @params priority: One of the rate_limit.PRIORITY_ constants.
+        @raises RateLimitError if the budget is exhausted or GitHub refused the request for it.
+        @return response: The AsyncResponse received.
+        """
+        wait = self.rate_limit.acquire(priority, rate_limit_resource(url))
+        if wait:
+            await asyncio.sleep(wait)
+        self.request_count += 1
+        started = time.time()
+        try:
+            async with self._get_session().request(method, url, **kwargs) as response:
+                body = await response.text()
+                result = AsyncResponse(response.status, response.headers, body)
+        except Exception:
+            elapsed = time.time() - started
+            endpoint = api_metrics.record(self.metrics, url, None, elapsed, 0)
+            tracing.add_span('github', started, elapsed, endpoint=endpoint, method=method, status_code=None)
+            raise
+        size = api_metrics.response_size(result.headers)
+        elapsed = time.time() - started
+        endpoint = api_metrics.record(self.metrics, url, result.status_code, elapsed, size)
+        tracing.add_span(
+            'github', started, elapsed, endpoint=endpoint, method=method, status_code=result.status_code
+        )
+        self.rate_limit.update(result.headers)
+        if is_rate_limited(result):
+            raise RateLimitError(
+                'GitHub refused {} {} with {}: rate limit exceeded'.format(method, url, result.status_code),
+                retry_after=result.headers.get('Retry-After')
+            )
+        return result
+
+    async def get_user_permission(self, repository_name, user_name):
+        """
+        Checks if a user has permissions in the repository.
+        @param repository_name: The long name of the repository in the format 'owner/repo'
+        @param user_name: A GitHub user's user_name
+        @return user_permission: The permission of the user in that repository, being one of:
+        'admin', 'write', 'read', or 'none'
+        """
+        request_url = 'https://api.github.com/repos/{}/collaborators/{}/permission'.format(
+            repository_name, user_name)
+        response = await self._request('GET', request_url)
+        return response.json()['permission']
+
+    async def post_status(self, repository_name, ref, context, target_url, reviewer, prior_description):
+        """
+        Posts a new status for the specified ref with a given context and target_url.
+        @params repository_name: The full name of the repository in the format 'owner/repo'
+        @params ref: It can be a SHA, a branch name, or a tag name
+        @params context: String label to differentiate status from the status of other systems
+        @params target_url: Target url associated with context
+        @params reviewer: The username of the user that submitted the approved review
+        @params prior_description: Previous status message
+        @return status_code: The HTTP status code received.
+        """
+        request_url = 'https://api.github.com/repos/{}/statuses/{}'.format(repository_name, ref)
+        new_status = {
+            'state': 'success',
+            'description': override_description(reviewer, prior_description),
+            'context': context,
+            'target_url': target_url
+        }
+        response = await self._request(
+            'POST', request_url, priority=PRIORITY_WRITE, data=json.dumps(new_status)
+        )
+        return response.status_code
+
+    async def post_statuses(self, repository_name, ref, statuses, reviewer):
+        """
+        Overwrites several statuses for the specified ref concurrently.
+        @params repository_name: The full name of the repository in the format 'owner/repo'
+        @params ref: It can be a SHA, a branch name, or a tag name
+        @params statuses: The statuses to overwrite, as returned by get_statuses
+        @params reviewer: The username of the user that submitted the approved review
+        @return results: A dict mapping each status context to the HTTP status code received,
+        or to None if the request could not be completed.
+        """
+        async def overwrite(status):
+            """
+            Overwrites a single status, reporting rather than raising connection errors.
+            """
+            try:
+                return status['context'], await self.post_status(
+                    repository_name,
+                    ref,
+                    status['context'],
+                    status['target_url'],
+                    reviewer,
+                    status['description']
+                )
+            except REQUEST_ERRORS as err:
+                logger.error("Error posting status %s to %s: %s", status['context'], repository_name, err)
+                return status['context'], None
+
+        return dict(await asyncio.gather(*[overwrite(status) for status in statuses]))
+
+    async def get_statuses(self, repository_name, ref):
+        """
+        Gets the combined status messages for a given ref and repository.
+        @params repository_name: The full name of the repository in the format 'owner/repo'
+        @params ref: The SHA, branch name, or tag name to retrieve status for.
+        @raises APIError if the statuses cannot be fetched.
+        @return statuses: The statuses for the specified ref.
+        """
+        request_url = 'https://api.github.com/repos/{}/commits/{}/status'.format(repository_name, ref)
+        return [status async for status in self.paginate(request_url, items_key='statuses')]
+
+    async def paginate(self, url, items_key=None, page_size=MAX_PAGE_SIZE):
+        """
+        Lazily yields the items of a paginated list endpoint, as GithubHandler.paginate does.
+        @params url: The url of the first page.
+        @params items_key: The key of the items in each page, for endpoints that do not return a
+        bare list.
+        @params page_size: The number of items requested per page.
+        @raises APIError if a page cannot be fetched.
+        @return items: An asynchronous generator of the items of every page.
+        """
+        kwargs = {'params': {'per_page': page_size}}
+        while url:
+            response = await self._request('GET', url, **kwargs)
+            if response.status_code >= 400:
+                raise APIError('{} error fetching {}'.format(response.status_code, url))
+            page = response.json()
+            for item in page[items_key] if items_key else page:
+                yield item
+            url = next_page_url(response.headers)
+            kwargs = {}
+
+    async def get_organization_teams(self, organization_name):
+        """
+        Returns the list of teams in an organization, following every page.
+        @params organization_name: The organization that the teams are being fetched for
+        @return team_list: The list of teams in json for the organization
+        """
+        request_url = 'https://api.github.com/orgs/{}/teams'.format(organization_name)
+        return [team async for team in self.paginate(request_url)]
+
+    async def get_team_id(self, organization_name, team_slug):
+        """
+        Returns the numeric ID asssociated with a team within an organization.
+        @params organization_name: The organization that the team is in.
+        @params team_slug: The 'slug' name of the team.
+        @raises APIError if the requested team cannot be found.
+        @returns team_id: The numeric ID of the team specified.
+        """
+        request_url = 'https://api.github.com/orgs/{}/teams/{}'.format(organization_name, team_slug)
+        response = await self._request('GET', request_url)
+        if response.status_code == 404:
+            raise APIError("Team not found")
+        return response.json()['id']
+
+    async def is_user_on_team(self, team_id, user_name):
+        """
+        Checks that a user is an active member or maintainer within a team.
+        @params team_id: The id for a team in an organization
+        @params user_name: The username for the user we are checking membership for.
+        @return boolean: True if the member is an active maintainer or member, False if otherwise
+        """
+        request_url = 'https://api.github.com/teams/{}/memberships/{}'.format(team_id, user_name)
+        response = await self._request('GET', request_url)
+        return _is_active_member(response)
+
+    async def is_user_on_org_team(self, organization_name, team_slug, user_name):
+        """
+        Checks that a user is an active member or maintainer within a team, addressing the team
+        by its slug so that no team id lookup is needed.
+        @params organization_name: The organization that the team is in.
+        @params team_slug: The 'slug' name of the team.
+        @params user_name: The username for the user we are checking membership for.
+        @return boolean: True if the member is an active maintainer or member, False if otherwise
+        """
+        request_url = 'https://api.github.com/orgs/{}/teams/{}/memberships/{}'.format(
+            organization_name, team_slug, user_name)
+        response = await self._request('GET', request_url)
+        return _is_active_member(response)
+
+    async def is_user_in_org(self, organization_name, user_name):
+        """
+        Returns the boolean of a user's membership in an organization.
+        @params organization_name: The name of an organization
+        @params user_name: The username for the user we are checking membership for in an organization
+        @return: boolean that denotes whether a user is a member in the organization
+        """
+        request_url = 'https://api.github.com/orgs/{}/members/{}'.format(organization_name, user_name)
+        response = await self._request('GET', request_url)
+        return response.status_code == 204
+
+    async def get_config(self, repo_name, config_filename):
+        """
+        Gets the specified configuration file from the specified repository, with the same caching
+        and ETag revalidation as GithubHandler.get_config.
+        @params repo_name: The full name of the repository to search in the format 'owner/repo'.
+        @params config_filename: The filename of the configuration file to retrieve.
+        @raises APIError if the configuration file specified cannot be found.
+        @returns config: A dict of the retrieved configuration for the specified repository.
+        """
+        key = config_key(repo_name, config_filename)
+        entry = self.config_cache.get(key)
+        if entry is not None and entry.is_fresh(self.config_cache.clock()):
+            return _cached_config(entry, repo_name, config_filename)
+
+        kwargs = {}
+        if entry is not None and entry.etag:
+            kwargs['headers'] = {'If-None-Match': entry.etag}
+        request_url = 'https://api.github.com/repos/{}/contents/{}'.format(repo_name, config_filename)
+        response = await self._request('GET', request_url, **kwargs)
+        if response.status_code == 404:
+            self.config_cache.set(key, CONFIG_NOT_FOUND, self.config_negative_ttl)
+            raise _file_not_found(repo_name, config_filename)
+        if response.status_code == 304:
+            self.config_cache.refresh(key, self.config_ttl)
+            return _cached_config(entry, repo_name, config_filename)
+        if response.status_code >= 400:
+            raise APIError('{} error fetching {}/{}'.format(response.status_code, repo_name, config_filename))
+
+        config_file_contents = base64.standard_b64decode(response.json()['content'])
+        config = parse_config(config_file_contents)
+        self.config_cache.set(
+            key,
+            config,
+            self.config_ttl,
+            size=len(config_file_contents),
+            etag=response.headers.get('ETag')
+        )
+        return config
+
+    def invalidate_config(self, repo_name, filenames=None):
+        """
+        Forgets the cached configurations of a repository, as GithubHandler.invalidate_config does.
+        @params repo_name: The full name of the repository in the format 'owner/repo'.
+        @params filenames: The paths of the files that changed, or None if any may have.
+        @return invalidated: The number of cached configurations forgotten.
+        """
+        if filenames is None:
+            return self.config_cache.invalidate_scope(config_scope((repo_name, None)))
+        return self.config_cache.delete_many(config_key(repo_name, filename) for filename in filenames)
+
+    async def is_authorized(self, username, owner, repo, repo_config):
+        """
+        Validates the user against the conditions in repo config, in the same order as
+        GithubHandler.is_authorized.
+        @params username: The username to check. Likely the review of the PR.
+        @params owner: The owner of the repository.
+        @params repo: The repository the PR is in.
+        @params repo_config: The configuration of organizations and teams authorized to approve PRs.
+        @raises RateLimitError if the rate limit budget does not allow the checks to be made.
+        @returns boolean: True if the user has permission to approve PRs, False if not.
+        """
+        policy = compile_policy(repo_config)
+        if username in policy.users:
+            return True
+        for check in policy.network_checks(owner, repo):
+            started = time.time()
+            try:
+                granted = await _run_check(self, check, username)
+            except RateLimitError:
+                raise
+            except APIError:
+                granted = False
+            policy.stats.record(check, time.time() - started, granted)
+            if granted:
+                return True
+        return False
+
+
+async def _run_check(handler, check, username):
+    """
+    Runs a single network check of a policy, as policy.run_check does for GithubHandler.
+    """
+    kind, target = check
+    if kind == 'org':
+        return await handler.is_user_in_org(target, username)
+    if kind == 'team':
+        owner, team = target.split('/', 1)
+        return await handler.is_user_on_org_team(owner, team, username)
+    return await handler.get_user_permission(target, username) == 'admin'
+
+
+def _is_active_member(response):
+    """
+    Reads a team membership response.
+    """
+    if response.status_code == 404:
+        return False
+    membership = response.json()
+    return membership['role'] in ['member', 'maintainer'] and membership['state'] == 'active'
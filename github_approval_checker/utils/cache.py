@@ -0,0 +1,330 @@
+"""
+Bounded in-memory caches used to avoid repeating GitHub API calls across events.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from github_approval_checker.utils.shared_cache import (
+    cache_key,
+    decode,
+    encode,
+    DEFAULT_LOCAL_TTL,
+    GENERATION_RETENTION,
+    STALE_RETENTION
+)
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 1024 * 1024
+
+
+class CacheEntry(object):
+    """
+    A single cached value along with its expiry time, size and validator.
+    """
+
+    __slots__ = ('value', 'expires_at', 'size', 'etag', 'synced_at')
+
+    def __init__(self, value, expires_at, size, etag=None, synced_at=None):
+        """
+        Create an entry.
+        @params value: The cached value.
+        @params expires_at: The clock time after which the entry is stale.
+        @params size: The approximate number of bytes the entry accounts for.
+        @params etag: The ETag the value was served with, used to revalidate a stale entry.
+        @params synced_at: The clock time the entry was last read from or written to a shared
+        backend, or None if it is only held in memory.
+        """
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.etag = etag
+        self.synced_at = synced_at
+
+    def is_fresh(self, now):
+        """
+        @params now: The current clock time.
+        @return boolean: True if the entry has not expired yet.
+        """
+        return now < self.expires_at
+
+
+class TTLCache(object):
+    """
+    A thread safe LRU cache whose entries expire after a time to live. The cache is bounded
+    both by a number of entries and by the total size reported for those entries.
+
+    Stale entries are kept until they are evicted so that callers can revalidate them
+    (for example with If-None-Match) instead of fetching them again.
+
+    With a shared backend, the cache is the first level in front of it: lookups that miss read
+    the backend, and stores, refreshes and deletes are written through to it. Entries that hit
+    in memory are never encoded or decoded, but are only used for local_ttl seconds before the
+    backend is read again, so that deletes and invalidations made by other processes are seen.
+    Keys can be grouped into scopes, such as the repository of a configuration, that are
+    invalidated at once by moving the scope to a new generation in the backend.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, clock=time.time,
+                 backend=None, namespace=None, scope=None, local_ttl=DEFAULT_LOCAL_TTL):
+        """
+        @params max_entries: The maximum number of entries held.
+        @params max_bytes: The maximum total size of all entries held.
+        @params clock: A callable returning the current time in seconds.
+        @params backend: An optional shared_cache.CacheBackend shared with other processes.
+        @params namespace: The name the cache's keys are stored under in the backend.
+        @params scope: An optional callable returning the scope of a key, for invalidate_scope.
+        @params local_ttl: Seconds an entry read from or written to the backend is used from
+        memory before the backend is read again.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.backend = backend
+        self.namespace = namespace
+        self.scope = scope
+        self.local_ttl = local_ttl
+        self._generations = TTLCache(max_entries=max_entries, clock=clock) if backend is not None else None
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """
+        Looks up an entry, fresh or stale, and marks it as recently used.
+        @params key: The key to look up.
+        @return entry: The CacheEntry for the key, or None if it is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._touch(key, entry)
+                now = self.clock()
+                if entry.is_fresh(now) and (
+                        entry.synced_at is None or now - entry.synced_at < self.local_ttl):
+                    self.hits += 1
+                    return entry
+            if self.backend is None:
+                self.misses += 1
+                return entry
+        # Another process may have fetched, deleted or invalidated the value since it was read
+        entry = self._load(key, entry)
+        with self._lock:
+            if entry is None or not entry.is_fresh(self.clock()):
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def get_fresh(self, key):
+        """
+        Looks up an entry that has not yet expired.
+        @params key: The key to look up.
+        @return entry: The fresh CacheEntry for the key, or None.
+        """
+        entry = self.get(key)
+        if entry is not None and entry.is_fresh(self.clock()):
+            return entry
+        return None
+
+    def set(self, key, value, ttl, size=1, etag=None):
+        """
+        Stores a value, evicting the least recently used entries if the cache is full.
+        Values larger than max_bytes are not stored.
+        @params key: The key to store the value under.
+        @params value: The value to store.
+        @params ttl: The number of seconds the value stays fresh for.
+        @params size: The approximate size of the value in bytes.
+        @params etag: An optional validator to revalidate the value with once it is stale.
+        @return entry: The stored CacheEntry, or None if the value was too large to store.
+        """
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return None
+            entry = CacheEntry(value, self.clock() + ttl, size, etag)
+            self._insert(key, entry)
+        if self._store(key, entry):
+            entry.synced_at = self.clock()
+        return entry
+
+    def refresh(self, key, ttl):
+        """
+        Marks an existing entry as fresh again, for example after a 304 Not Modified.
+        @params key: The key of the entry to refresh.
+        @params ttl: The number of seconds the entry stays fresh for.
+        @return entry: The refreshed CacheEntry, or None if the key is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.expires_at = self.clock() + ttl
+                self._touch(key, entry)
+        if entry is not None and self._store(key, entry):
+            entry.synced_at = self.clock()
+        return entry
+
+    def keys(self):
+        """
+        @return keys: A list of the keys held in memory, fresh or stale, least recently used first.
+        """
+        with self._lock:
+            return list(self._entries)
+
+    def delete(self, key):
+        """
+        Removes an entry if present, from the backend too.
+        @params key: The key to remove.
+        @return boolean: Whether an entry was removed.
+        """
+        return self.delete_many([key]) > 0
+
+    def delete_many(self, keys):
+        """
+        Removes the entries of several keys, from the backend too, whether this process holds
+        them or not.
+        @params keys: The keys to remove.
+        @return removed: The number of keys that had an entry, in memory or in the backend.
+        """
+        keys = list(keys)
+        with self._lock:
+            removed = sum(1 for key in keys if self._remove(key))
+        if self.backend is not None and keys:
+            removed = max(removed, self.backend.delete_many([self._backend_key(key) for key in keys]))
+        return removed
+
+    def invalidate_scope(self, scope):
+        """
+        Removes every entry of a scope. With a backend, the scope moves to a new generation so
+        that the entries stored before are no longer read by any process, including those of
+        keys this process does not hold.
+        @params scope: The scope, as returned by the scope callable.
+        @return removed: The number of entries removed from memory.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if self.scope(key) == scope]
+            for key in keys:
+                self._remove(key)
+        if self.backend is not None:
+            generation = uuid.uuid4().hex[:16]
+            data = encode(generation, self.clock() + GENERATION_RETENTION)
+            self.backend.set(self._generation_key(scope), data, GENERATION_RETENTION)
+            self._generations.set(scope, generation, self.local_ttl)
+        return len(keys)
+
+    def clear(self):
+        """
+        Removes every entry held in memory.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def snapshot(self):
+        """
+        @return stats: A dict of the entries and bytes held in memory, and of the hits, misses
+        and evictions of the cache.
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def _load(self, key, current):
+        """
+        Reads an entry from the backend, and holds it in memory if it is newer than the copy
+        already held.
+        @params current: The CacheEntry held in memory for the key, or None.
+        @return entry: The newest CacheEntry, fresh or stale, or None if neither has one.
+        """
+        data = self.backend.get(self._backend_key(key))
+        decoded = decode(data)
+        now = self.clock()
+        if decoded is None:
+            if current is None or current.synced_at is None or not self.backend.available():
+                # A backend that could not be read says nothing about the entry held in memory
+                return current
+            # Deleted or invalidated by another process, or evicted from the backend
+            with self._lock:
+                if self._entries.get(key) is current:
+                    self._remove(key)
+            return None
+        value, expires_at, etag = decoded
+        if current is not None and current.expires_at >= expires_at:
+            current.synced_at = now
+            return current
+        entry = CacheEntry(value, expires_at, len(data), etag, synced_at=now)
+        with self._lock:
+            self._remove(key)
+            if entry.size <= self.max_bytes:
+                self._insert(key, entry)
+        return entry
+
+    def _store(self, key, entry):
+        """
+        Writes an entry through to the backend, keeping it past its expiry for revalidation.
+        Values that cannot be encoded, such as sentinel objects, are only held in memory.
+        @return boolean: Whether the entry was written to the backend.
+        """
+        if self.backend is None:
+            return False
+        data = encode(entry.value, entry.expires_at, entry.etag)
+        if data is None:
+            return False
+        ttl = entry.expires_at - self.clock() + STALE_RETENTION
+        self.backend.set(self._backend_key(key), data, ttl)
+        return True
+
+    def _backend_key(self, key):
+        """
+        @return key: The key an entry is stored under in the backend, in the current generation
+        of its scope.
+        """
+        if self.scope is None:
+            return cache_key(self.namespace, key)
+        scope = self.scope(key)
+        entry = self._generations.get_fresh(scope)
+        if entry is None:
+            decoded = decode(self.backend.get(self._generation_key(scope)))
+            if decoded is None and not self.backend.available():
+                # Look the generation up again once the backend can be read
+                return cache_key(self.namespace, key)
+            entry = self._generations.set(scope, decoded[0] if decoded else None, self.local_ttl)
+        if entry.value is None:
+            return cache_key(self.namespace, key)
+        return cache_key('{}@{}'.format(self.namespace, entry.value), key)
+
+    def _generation_key(self, scope):
+        return cache_key(self.namespace + '.generation', scope)
+
+    def _insert(self, key, entry):
+        self._entries[key] = entry
+        self.total_bytes += entry.size
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _touch(self, key, entry):
+        del self._entries[key]
+        self._entries[key] = entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+        return entry is not None
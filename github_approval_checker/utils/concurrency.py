@@ -0,0 +1,164 @@
+"""
+Bounded thread pools for running blocking GitHub API calls concurrently, and single-flight
+coalescing of calls that would repeat the same work.
+"""
+
+import threading
+import time
+from github_approval_checker.utils.context_local import bind
+
+
+class CompletedResult(object):
+    """
+    The result of a call that was run inline, with the same interface as an AsyncResult.
+    """
+
+    def __init__(self, func, args):
+        """
+        Runs the function immediately, capturing its result or exception.
+        """
+        self._value = None
+        self._error = None
+        try:
+            self._value = func(*args)
+        except Exception as err:  # pylint: disable=broad-except
+            self._error = err
+
+    def ready(self):
+        """
+        @return boolean: Always True, the call has already completed.
+        """
+        return True
+
+    def get(self, timeout=None):  # pylint: disable=unused-argument
+        """
+        @raises the exception raised by the call, if any.
+        @return value: The value returned by the call.
+        """
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class WorkerPool(object):
+    """
+    A thread pool that is only started the first time work is actually run concurrently, so that
+    processes which never need it do not pay for its threads.
+    """
+
+    def __init__(self, max_workers):
+        """
+        @params max_workers: The maximum number of calls run at once. With 1 or fewer, every call
+        is run inline in the calling thread.
+        """
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                from multiprocessing.pool import ThreadPool
+                self._pool = ThreadPool(self.max_workers)
+            return self._pool
+
+    def submit(self, func, *args):
+        """
+        Starts a call in the background.
+        @params func: The function to call.
+        @params args: The positional arguments to call it with.
+        @return result: An object whose get() waits for and returns the result of the call, or
+        raises the exception the call raised.
+        """
+        if self.max_workers <= 1:
+            return CompletedResult(func, args)
+        return self._get_pool().apply_async(bind(func), args)
+
+    def map(self, func, items):
+        """
+        Applies a function to every item concurrently.
+        @params func: The function to apply.
+        @params items: The list of items to apply the function to.
+        @return results: The list of results, in the same order as items.
+        """
+        if len(items) <= 1 or self.max_workers <= 1:
+            return [func(item) for item in items]
+        return self._get_pool().map(bind(func), items)
+
+
+class _Flight(object):
+    """
+    A batch of items sharing a key, processed by a single call.
+    """
+
+    def __init__(self):
+        self.items = []
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def get(self):
+        """
+        @raises the exception raised while processing the batch, if any.
+        @return value: The value returned for the batch.
+        """
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight(object):
+    """
+    Runs at most one call per key at a time. Items arriving for a key while its call runs are
+    merged into a single batch, processed by one call once the running one finishes, and every
+    caller in a batch receives the batch's result.
+    """
+
+    def __init__(self, sleep=time.sleep):
+        """
+        @params sleep: A callable sleeping for a number of seconds.
+        """
+        self._sleep = sleep
+        self._pending = {}
+        self._running = set()
+        self._condition = threading.Condition()
+
+    def run(self, key, item, process, window=0):
+        """
+        Processes an item together with the other items for its key that arrive around it.
+        @params key: The key of the work the item belongs to.
+        @params item: The item to process.
+        @params process: A callable taking the list of items in a batch and returning its result.
+        @params window: Seconds a new batch waits for more items before it is processed.
+        @raises the exception raised while processing the item's batch, if any.
+        @return value: The value returned for the item's batch.
+        """
+        with self._condition:
+            flight = self._pending.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._pending[key] = _Flight()
+            flight.items.append(item)
+
+        if not leader:
+            flight.done.wait()
+            return flight.get()
+
+        if window > 0:
+            self._sleep(window)
+        with self._condition:
+            while key in self._running:
+                self._condition.wait()
+            del self._pending[key]
+            self._running.add(key)
+
+        try:
+            flight.result = process(list(flight.items))
+        except Exception as err:  # pylint: disable=broad-except
+            flight.error = err
+        finally:
+            with self._condition:
+                self._running.discard(key)
+                self._condition.notify_all()
+            flight.done.set()
+        return flight.get()
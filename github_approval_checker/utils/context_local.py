@@ -0,0 +1,74 @@
+"""
+Values local to the current context, which follow asyncio tasks on Python 3.7+ and fall back to
+threads otherwise, and can be handed on to worker threads with bind().
+"""
+
+import threading
+
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
+_SLOTS = []
+
+
+class ContextLocal(object):
+    """
+    A value local to the current context.
+    """
+
+    def __init__(self, name, default=None):
+        """
+        @params name: The name of the value, for debugging.
+        @params default: The value of contexts that have not set one.
+        """
+        self.default = default
+        if contextvars is not None:
+            self._var = contextvars.ContextVar(name, default=default)
+        else:
+            self._local = threading.local()
+        _SLOTS.append(self)
+
+    def get(self):
+        """
+        @return value: The value of the current context.
+        """
+        if contextvars is not None:
+            return self._var.get()
+        return getattr(self._local, 'value', self.default)
+
+    def set(self, value):
+        """
+        Sets the value of the current context.
+        """
+        if contextvars is not None:
+            self._var.set(value)
+        else:
+            self._local.value = value
+
+
+def bind(func):
+    """
+    Wraps a function to run with the context-local values of the context it was wrapped in,
+    for handing work to another thread.
+    @params func: The function to wrap.
+    @return wrapper: The wrapped function, or func itself if every value is its default.
+    """
+    values = [(slot, slot.get()) for slot in _SLOTS]
+    if all(value == slot.default for slot, value in values):
+        return func
+
+    def wrapper(*args):
+        """
+        Calls func with the captured values set, restoring the previous ones afterwards.
+        """
+        previous = [(slot, slot.get()) for slot, _ in values]
+        for slot, value in values:
+            slot.set(value)
+        try:
+            return func(*args)
+        finally:
+            for slot, value in previous:
+                slot.set(value)
+    return wrapper
@@ -31,3 +31,15 @@ class SignatureError(Exception):
             'status': 'Signature Validation Error',
             'message': message
         }, 400)
+
+
+class RateLimitError(APIError):
+    """
+    Indicates that a request was not made, or was refused, because the GitHub rate limit is spent.
+    """
+    def __init__(self, message, retry_after=None):
+        super(RateLimitError, self).__init__(
+            message,
+            ({'status': 'Rate Limited', 'message': message}, 503)
+        )
+        self.retry_after = retry_after
@@ -4,9 +4,91 @@ Github Handler
 
 import base64
 import json
-import yaml
+import logging
+import threading
+import time
 import requests
-from github_approval_checker.utils.exceptions import APIError
+from requests.adapters import HTTPAdapter
+from requests.utils import parse_header_links
+from github_approval_checker.version import __version__
+from github_approval_checker.utils import api_metrics, tracing
+from github_approval_checker.utils.api_metrics import ApiMetrics
+from github_approval_checker.utils.cache import TTLCache, DEFAULT_MAX_BYTES
+from github_approval_checker.utils.concurrency import WorkerPool
+from github_approval_checker.utils.exceptions import APIError, RateLimitError
+from github_approval_checker.utils.membership import (
+    MembershipDirectory,
+    DEFAULT_MEMBERSHIP_TTL,
+    DEFAULT_REFRESH_INTERVAL
+)
+from github_approval_checker.utils.policy import compile_policy
+from github_approval_checker.utils.rate_limit import (
+    get_shared_tracker,
+    is_rate_limited,
+    PRIORITY_READ,
+    PRIORITY_WRITE
+)
+from github_approval_checker.utils.status_reconciler import override_description
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_CONFIG_TTL = 300
+DEFAULT_CONFIG_NEGATIVE_TTL = 60
+
+# The largest page GitHub's list endpoints return
+MAX_PAGE_SIZE = 100
+DEFAULT_HEADERS = {
+    'Accept': 'application/vnd.github.v3+json',
+    'User-Agent': 'github-approval-checker/{}'.format(__version__)
+}
+
+# Cached in place of a configuration file that does not exist in a repository
+CONFIG_NOT_FOUND = object()
+
+logger = logging.getLogger(__name__)
+
+_SHARED_HANDLERS = {}
+_SHARED_HANDLERS_LOCK = threading.Lock()
+
+
+def build_session(auth, pool_size=DEFAULT_POOL_SIZE, headers=None):
+    """
+    Builds a keep-alive requests Session with a connection pool sized for the API host.
+    @params auth: The (username, password) tuple sent with every request.
+    @params pool_size: The maximum number of pooled connections kept open per host.
+    @params headers: Extra default headers, merged over DEFAULT_HEADERS.
+    @return session: The configured requests.Session.
+    """
+    session = requests.Session()
+    session.auth = auth
+    session.headers.update(DEFAULT_HEADERS)
+    session.headers.update(headers or {})
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_shared_handler(github_username, github_password, handler_class=None, **handler_options):
+    """
+    Returns the process-wide GithubHandler for a set of credentials, creating it on first use.
+    The handler (and its pooled connections and caches) survives across warm Lambda invocations
+    and across requests served by the same WSGI worker.
+    @params github_username: The GitHub username to authenticate as.
+    @params github_password: The password or API key for the GitHub user.
+    @params handler_class: The GithubHandler class, or subclass, to create. Defaults to GithubHandler.
+    @params handler_options: Keyword arguments for GithubHandler, only applied when the handler
+    is first created.
+    @return handler: The shared GithubHandler.
+    """
+    handler_class = handler_class or GithubHandler
+    key = (handler_class, github_username, github_password)
+    with _SHARED_HANDLERS_LOCK:
+        handler = _SHARED_HANDLERS.get(key)
+        if handler is None:
+            handler = handler_class(github_username, github_password, **handler_options)
+            _SHARED_HANDLERS[key] = handler
+        return handler
 
 
 class GithubHandler(object):
@@ -14,11 +96,135 @@ class GithubHandler(object):
     Class to handle Github API calls
     """
 
-    def __init__(self, github_username, github_password):
+    def __init__(self, github_username, github_password, session=None,  # pylint: disable=too-many-arguments
+                 pool_size=DEFAULT_POOL_SIZE, headers=None, config_cache_max_bytes=DEFAULT_MAX_BYTES,
+                 config_ttl=DEFAULT_CONFIG_TTL, config_negative_ttl=DEFAULT_CONFIG_NEGATIVE_TTL,
+                 max_workers=DEFAULT_MAX_WORKERS, membership_ttl=DEFAULT_MEMBERSHIP_TTL,
+                 membership_refresh_interval=DEFAULT_REFRESH_INTERVAL, cache_backend=None):
         """
         Initialize handler with with Authentication values from the environment.
+        @params session: An optional pre-built requests.Session to send requests with.
+        @params pool_size: The connection pool size used when building a new session.
+        @params headers: Extra default headers used when building a new session.
+        @params config_cache_max_bytes: The memory budget for cached repository configurations.
+        @params config_ttl: Seconds a fetched configuration is used before being revalidated.
+        @params config_negative_ttl: Seconds a missing configuration file is remembered for.
+        @params max_workers: The maximum number of requests sent concurrently by map(). This should
+        not exceed pool_size, or connections beyond the pool will not be kept alive.
+        @params membership_ttl: Seconds the member lists of authorized organizations and teams are
+        answered from memory for. 0 checks every membership with GitHub.
+        @params membership_refresh_interval: Seconds between background refreshes of the member lists.
+        @params cache_backend: An optional shared_cache.CacheBackend that configurations and member
+        lists are shared through with other processes.
         """
         self.auth = (github_username, github_password)
+        self.session = session or build_session(self.auth, pool_size, headers)
+        self.config_cache = TTLCache(
+            max_bytes=config_cache_max_bytes, backend=cache_backend, namespace='config', scope=config_scope
+        )
+        self.config_ttl = config_ttl
+        self.config_negative_ttl = config_negative_ttl
+        self.workers = WorkerPool(max_workers)
+        self.rate_limit = get_shared_tracker(github_username)
+        self.request_count = 0
+        self.metrics = ApiMetrics()
+        self.membership = None
+        if membership_ttl > 0:
+            self.membership = MembershipDirectory(
+                self, membership_ttl, membership_refresh_interval, backend=cache_backend
+            )
+        self._count_lock = threading.Lock()
+
+    def _request(self, method, url, priority=PRIORITY_READ, **kwargs):
+        """
+        Sends a request to the GitHub API over the pooled session, once the rate limit budget
+        allows a request of its priority.
+        @params method: The HTTP method to use.
+        @params url: The full url to request.
+        @params priority: One of the rate_limit.PRIORITY_ constants.
+        @raises RateLimitError if the budget is exhausted or GitHub refused the request for it.
+        @return response: The requests.Response received.
+        """
+        resource = rate_limit_resource(url)
+        wait = self.rate_limit.acquire(priority, resource)
+        if wait:
+            time.sleep(wait)
+        with self._count_lock:
+            self.request_count += 1
+        started = time.time()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            elapsed = time.time() - started
+            endpoint = api_metrics.record(self.metrics, url, None, elapsed, 0)
+            tracing.add_span('github', started, elapsed, endpoint=endpoint, method=method, status_code=None)
+            raise
+        size = api_metrics.response_size(response.headers)
+        elapsed = time.time() - started
+        endpoint = api_metrics.record(self.metrics, url, response.status_code, elapsed, size)
+        tracing.add_span(
+            'github', started, elapsed, endpoint=endpoint, method=method, status_code=response.status_code
+        )
+        self.rate_limit.update(response.headers)
+        if is_rate_limited(response):
+            raise RateLimitError(
+                'GitHub refused {} {} with {}: rate limit exceeded'.format(method, url, response.status_code),
+                retry_after=response.headers.get('Retry-After')
+            )
+        return response
+
+    def prepare_review(self, repository_name, config_filename, ref, reviewer):
+        """
+        Hook for handlers that can fetch everything a review needs in a single request before the
+        individual lookups are made. GithubHandler makes each lookup on demand, so does nothing.
+        @params repository_name: The full name of the repository in the format 'owner/repo'
+        @params config_filename: The filename of the configuration file to retrieve.
+        @params ref: The SHA of the reviewed commit.
+        @params reviewer: The username of the reviewer.
+        """
+
+    def map(self, func, items):
+        """
+        Applies a function to every item using the handler's bounded worker pool. The pool is
+        only started once there is more than one item to process.
+        @params func: The function to apply, usually one that calls the GitHub API.
+        @params items: The list of items to apply the function to.
+        @return results: The list of results, in the same order as items.
+        """
+        return self.workers.map(func, items)
+
+    def connection_stats(self):
+        """
+        Reports how well pooled connections are being reused.
+        @return stats: A dict with the number of 'requests' sent, 'connections' opened and
+        requests that 'reused' an already open connection.
+        """
+        requests_sent = 0
+        connections_opened = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                requests_sent += pool.num_requests
+                connections_opened += pool.num_connections
+        return {
+            'requests': requests_sent,
+            'connections': connections_opened,
+            'reused': requests_sent - connections_opened
+        }
+
+    def cache_stats(self):
+        """
+        Reports how well the handler's caches are serving lookups.
+        @return stats: A dict of the stats of the 'config' cache, of the 'membership' directory
+        if it is enabled, and of the 'shared' backend if there is one.
+        """
+        stats = {'config': self.config_cache.snapshot()}
+        if self.membership is not None:
+            stats['membership'] = self.membership.groups.snapshot()
+        if self.config_cache.backend is not None:
+            stats['shared'] = self.config_cache.backend.snapshot()
+        return stats
 
     def get_user_permission(self, repository_name, user_name):
         """
@@ -31,7 +237,7 @@ class GithubHandler(object):
 
         request_url = 'https://api.github.com/repos/{}/collaborators/{}/permission'.format(
             repository_name, user_name)
-        user_permission = requests.get(request_url, auth=self.auth)
+        user_permission = self._request('GET', request_url)
         return user_permission.json()['permission']
 
     def post_status(self, repository_name, ref, context, target_url, reviewer, prior_description):
@@ -49,27 +255,119 @@ class GithubHandler(object):
             repository_name, ref)
         new_status = {
             'state': 'success',
-            'description': 'Overwritten based on approval from: {} Message: {}'.format(
-                reviewer, prior_description
-            ),
+            'description': override_description(reviewer, prior_description),
             'context': context,
             'target_url': target_url
         }
-        status_res = requests.post(request_url, data=json.dumps(new_status), auth=self.auth)
+        status_res = self._request(
+            'POST', request_url, priority=PRIORITY_WRITE, data=json.dumps(new_status)
+        )
         return status_res.status_code
 
+    def post_statuses(self, repository_name, ref, statuses, reviewer):
+        """
+        Overwrites several statuses for the specified ref concurrently.
+        @params repository_name: The full name of the repository in the format 'owner/repo'
+        @params ref: It can be a SHA, a branch name, or a tag name
+        @params statuses: The statuses to overwrite, as returned by get_statuses
+        @params reviewer: The username of the user that submitted the approved review
+        @return results: A dict mapping each status context to the HTTP status code received,
+        or to None if the request could not be completed.
+        """
+        def overwrite(status):
+            """
+            Overwrites a single status, reporting rather than raising connection errors.
+            """
+            try:
+                return status['context'], self.post_status(
+                    repository_name,
+                    ref,
+                    status['context'],
+                    status['target_url'],
+                    reviewer,
+                    status['description']
+                )
+            except (requests.exceptions.RequestException, APIError) as err:
+                logger.error("Error posting status %s to %s: %s", status['context'], repository_name, err)
+                return status['context'], None
+
+        return dict(self.map(overwrite, statuses))
+
     def get_statuses(self, repository_name, ref):
         """
         Gets the combined status messages for a given ref and repository.
         @params repository_name: The full name of the repository in the format 'owner/repo'
         @params ref: The SHA, branch name, or tag name to retrieve status for.
+        @raises APIError if the statuses cannot be fetched.
         @return statuses: The statuses for the specified ref.
         """
 
         request_url = 'https://api.github.com/repos/{}/commits/{}/status'.format(
             repository_name, ref)
-        combined_status = requests.get(request_url, auth=self.auth)
-        return combined_status.json()['statuses']
+        return list(self.paginate(request_url, items_key='statuses'))
+
+    def paginate(self, url, items_key=None, page_size=MAX_PAGE_SIZE, priority=PRIORITY_READ):
+        """
+        Lazily yields the items of a paginated list endpoint, following the 'next' links of each
+        page. A page is only requested once the items before it have been consumed, so a caller
+        that stops iterating early makes no further requests.
+        @params url: The url of the first page.
+        @params items_key: The key of the items in each page, for endpoints that do not return a
+        bare list.
+        @params page_size: The number of items requested per page.
+        @params priority: The rate_limit.PRIORITY_ constant each page is requested with.
+        @raises APIError if a page cannot be fetched.
+        @return items: A generator of the items of every page.
+        """
+        kwargs = {'params': {'per_page': page_size}}
+        while url:
+            response = self._request('GET', url, priority, **kwargs)
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError as err:
+                raise APIError('Unable to fetch {}: {}'.format(url, err))
+            page = response.json()
+            for item in page[items_key] if items_key else page:
+                yield item
+            # The next link already carries the query of the first request
+            url = next_page_url(response.headers)
+            kwargs = {}
+
+    def get_org_repositories(self, organization_name, priority=PRIORITY_READ):
+        """
+        Lazily lists the repositories of an organization that the authenticated user can see.
+        @params organization_name: The name of an organization.
+        @params priority: The rate_limit.PRIORITY_ constant each page is requested with.
+        @raises APIError if a page cannot be fetched.
+        @return repositories: A generator of the repositories of every page.
+        """
+        request_url = 'https://api.github.com/orgs/{}/repos'.format(organization_name)
+        return self.paginate(request_url, priority=priority)
+
+    def get_open_pulls(self, repository_name, priority=PRIORITY_READ):
+        """
+        Lazily lists the open pull requests of a repository, oldest first.
+        @params repository_name: The full name of the repository in the format 'owner/repo'
+        @params priority: The rate_limit.PRIORITY_ constant each page is requested with.
+        @raises APIError if a page cannot be fetched.
+        @return pulls: A generator of the pull requests of every page.
+        """
+        request_url = 'https://api.github.com/repos/{}/pulls?state=open&sort=created&direction=asc'.format(
+            repository_name
+        )
+        return self.paginate(request_url, priority=priority)
+
+    def get_pull_reviews(self, repository_name, number, priority=PRIORITY_READ):
+        """
+        Lists the reviews of a pull request, in the order they were submitted.
+        @params repository_name: The full name of the repository in the format 'owner/repo'
+        @params number: The number of the pull request.
+        @params priority: The rate_limit.PRIORITY_ constant each page is requested with.
+        @raises APIError if a page cannot be fetched.
+        @return reviews: The list of reviews.
+        """
+        request_url = 'https://api.github.com/repos/{}/pulls/{}/reviews'.format(repository_name, number)
+        return list(self.paginate(request_url, priority=priority))
 
     def get_organization_teams(self, organization_name):
         """
@@ -79,31 +377,22 @@ class GithubHandler(object):
         """
 
         request_url = 'https://api.github.com/orgs/{}/teams'.format(organization_name)
-        response = requests.get(request_url, auth=self.auth)
-        team_list = response.json()
-        running = True
-        while running:
-            running = False
-            links = [link.split(";") for link in response.headers.get("link", "").split(",")]
-            for link in links:
-                if len(link) == 2 and link[1].strip() == 'rel="next"':
-                    response = requests.get(link[0][1:-1], auth=self.auth)
-                    running = True
-                    team_list += response.json()
-        return team_list
+        return list(self.paginate(request_url))
 
     def get_team_id(self, organization_name, team_slug):
         """
         Returns the numeric ID asssociated with a team within an organization.
+        The team is looked up by its slug directly rather than by listing the organization's teams.
         @params organization_name: The organization that the team is in.
         @params team_slug: The 'slug' name of the team.
         @raises APIError if the requested team cannot be found.
         @returns team_id: The numeric ID of the team specified.
         """
-        for team in self.get_organization_teams(organization_name):
-            if team['slug'] == team_slug:
-                return team['id']
-        raise APIError("Team not found")
+        request_url = 'https://api.github.com/orgs/{}/teams/{}'.format(organization_name, team_slug)
+        response = self._request('GET', request_url)
+        if response.status_code == 404:
+            raise APIError("Team not found")
+        return response.json()['id']
 
     def get_team_members(self, team_id):
         """
@@ -113,8 +402,32 @@ class GithubHandler(object):
         """
 
         request_url = 'https://api.github.com/teams/{}/members'.format(team_id)
-        members_list = requests.get(request_url, auth=self.auth)
-        return members_list.json()
+        return list(self.paginate(request_url))
+
+    def get_org_members(self, organization_name, priority=PRIORITY_READ):
+        """
+        Lazily lists the members of an organization. Concealed members are only listed when the
+        authenticated user is a member of the organization.
+        @params organization_name: The name of an organization.
+        @params priority: The rate_limit.PRIORITY_ constant each page is requested with.
+        @raises APIError if a page cannot be fetched.
+        @return members: A generator of the members of every page.
+        """
+        request_url = 'https://api.github.com/orgs/{}/members'.format(organization_name)
+        return self.paginate(request_url, priority=priority)
+
+    def get_org_team_members(self, organization_name, team_slug, priority=PRIORITY_READ):
+        """
+        Lazily lists the active members and maintainers of a team, including those of its child
+        teams, addressing the team by its slug.
+        @params organization_name: The organization that the team is in.
+        @params team_slug: The 'slug' name of the team.
+        @params priority: The rate_limit.PRIORITY_ constant each page is requested with.
+        @raises APIError if a page cannot be fetched.
+        @return members: A generator of the members of every page.
+        """
+        request_url = 'https://api.github.com/orgs/{}/teams/{}/members'.format(organization_name, team_slug)
+        return self.paginate(request_url, priority=priority)
 
     def is_user_on_team(self, team_id, user_name):
         """
@@ -125,7 +438,25 @@ class GithubHandler(object):
         """
 
         request_url = 'https://api.github.com/teams/{}/memberships/{}'.format(team_id, user_name)
-        membership = requests.get(request_url, auth=self.auth).json()
+        membership = self._request('GET', request_url).json()
+        return membership['role'] in ['member', 'maintainer'] and membership['state'] == 'active'
+
+    def is_user_on_org_team(self, organization_name, team_slug, user_name):
+        """
+        Checks that a user is an active member or maintainer within a team, addressing the team
+        by its slug so that no team id lookup is needed.
+        @params organization_name: The organization that the team is in.
+        @params team_slug: The 'slug' name of the team.
+        @params user_name: The username for the user we are checking membership for.
+        @return boolean: True if the member is an active maintainer or member, False if otherwise
+        """
+
+        request_url = 'https://api.github.com/orgs/{}/teams/{}/memberships/{}'.format(
+            organization_name, team_slug, user_name)
+        response = self._request('GET', request_url)
+        if response.status_code == 404:
+            return False
+        membership = response.json()
         return membership['role'] in ['member', 'maintainer'] and membership['state'] == 'active'
 
     def is_user_in_org(self, organization_name, user_name):
@@ -137,7 +468,7 @@ class GithubHandler(object):
         """
 
         request_url = 'https://api.github.com/orgs/{}/members/{}'.format(organization_name, user_name)
-        response = requests.get(request_url, auth=self.auth)
+        response = self._request('GET', request_url)
         return response.status_code == 204
 
     def get_file_contents(self, repository_name, filepath):
@@ -149,56 +480,188 @@ class GithubHandler(object):
         @raises requests.exceptions.HTTPError if another 4XX or 5XX error is encountered.
         @returns content: The raw contents of the specified file.
         """
+        response = self._get_contents(repository_name, filepath)
+        return base64.standard_b64decode(response.json()['content'])
 
+    def _get_contents(self, repository_name, filepath, **kwargs):
+        """
+        Requests the contents resource of a file, raising for anything but a 2XX or a 304.
+        @params repository_name: The long name of the repository in the format 'owner/repo'.
+        @params filepath: The filepath of the file to retrieve.
+        @params kwargs: Extra arguments for the request, such as conditional headers.
+        @raises APIError if the file cannot be found.
+        @raises requests.exceptions.HTTPError if another 4XX or 5XX error is encountered.
+        @returns response: The response for the file.
+        """
         request_url = 'https://api.github.com/repos/{}/contents/{}'.format(repository_name, filepath)
-        response = requests.get(request_url, auth=self.auth)
+        response = self._request('GET', request_url, **kwargs)
         if response.status_code == 404:
-            raise APIError(
-                '404 Not Found: {}/{}'.format(repository_name, filepath),
-                ({
-                    "status": "API Error",
-                    "message": 'File not found: {}/{}'.format(
-                        repository_name, filepath
-                    )
-                }, 500)
-            )
+            raise _file_not_found(repository_name, filepath)
         response.raise_for_status()
-        return base64.standard_b64decode(response.json()['content'])
+        return response
 
     def get_config(self, repo_name, config_filename):
         """
         Gets the specified configuration file from the specified repository.
+        Configurations are cached for config_ttl seconds and then revalidated with their ETag,
+        and missing configuration files are remembered for config_negative_ttl seconds.
+        The returned dict is shared between callers and must not be modified.
         @params repo_name: The full name of the repository to search in the format 'owner/repo'.
         @params config_filename: The filename of the configuration file to retrieve.
         @raises APIError if the configuration file specified cannot be found.
         @returns config: A dict of the retrieved configuration for the specified repository.
         """
-        config_file_contents = self.get_file_contents(repo_name, config_filename)
-        config = yaml.safe_load(config_file_contents)
+        key = config_key(repo_name, config_filename)
+        entry = self.config_cache.get(key)
+        if entry is not None and entry.is_fresh(self.config_cache.clock()):
+            return _cached_config(entry, repo_name, config_filename)
+
+        kwargs = {}
+        if entry is not None and entry.etag:
+            kwargs['headers'] = {'If-None-Match': entry.etag}
+        try:
+            response = self._get_contents(repo_name, config_filename, **kwargs)
+        except RateLimitError:
+            # Deferred for the budget, which says nothing about whether the file exists
+            raise
+        except APIError:
+            self.config_cache.set(key, CONFIG_NOT_FOUND, self.config_negative_ttl)
+            raise
+
+        if response.status_code == 304:
+            self.config_cache.refresh(key, self.config_ttl)
+            return _cached_config(entry, repo_name, config_filename)
+
+        config_file_contents = base64.standard_b64decode(response.json()['content'])
+        config = parse_config(config_file_contents)
+        self.config_cache.set(
+            key,
+            config,
+            self.config_ttl,
+            size=len(config_file_contents),
+            etag=response.headers.get('ETag')
+        )
         return config
 
+    def invalidate_config(self, repo_name, filenames=None):
+        """
+        Forgets the cached configurations of a repository, for example after a push changed them.
+        They are forgotten from the shared cache backend too, so that no process uses them again
+        once it reads the backend.
+        @params repo_name: The full name of the repository in the format 'owner/repo'.
+        @params filenames: The paths of the files that changed, or None if any may have.
+        @return invalidated: The number of cached configurations forgotten.
+        """
+        if filenames is None:
+            return self.config_cache.invalidate_scope(config_scope((repo_name, None)))
+        return self.config_cache.delete_many(config_key(repo_name, filename) for filename in filenames)
+
+    def invalidate_memberships(self, organization_name, team_slug=None, user_name=None):
+        """
+        Forgets the cached members of an organization's teams, or of one team.
+        @params organization_name: The organization whose memberships changed.
+        @params team_slug: The slug of the team whose members changed, or None for the whole
+        organization.
+        @params user_name: The user whose membership changed, if known.
+        @return invalidated: The number of cached entries forgotten.
+        """
+        # pylint: disable=unused-argument
+        if self.membership is None:
+            return 0
+        return self.membership.invalidate(organization_name, team_slug)
+
+    def invalidate_permission(self, repository_name, user_name):  # pylint: disable=unused-argument
+        """
+        Forgets the cached permission of a user in a repository. GithubHandler asks GitHub for
+        every permission, so has nothing to forget.
+        @params repository_name: The long name of the repository in the format 'owner/repo'.
+        @params user_name: The user whose permission changed.
+        @return invalidated: The number of cached entries forgotten.
+        """
+        return 0
+
     def is_authorized(self, username, owner, repo, repo_config):
         """
-        Validates the user against the conditions in repo config
+        Validates the user against the conditions in repo config. The configured users are
+        checked first, then organizations, teams and admins in order of their observed cost.
+        Organization and team memberships are answered from the membership directory when it
+        has their member lists loaded.
         @params username: The username to check. Likely the review of the PR.
         @params owner: The owner of the repository.
         @params repo: The repository the PR is in.
         @params repo_config: The configuration of organizations and teams authorized to approve PRs.
         @returns boolean: True if the user has permission to approve PRs, False if not.
         """
-        for org in repo_config.get("orgs", []):
-            if self.is_user_in_org(org, username):
-                return True
-        for team in repo_config.get("teams", []):
-            try:
-                team_id = self.get_team_id(owner, team)
-                if self.is_user_on_team(team_id, username):
-                    return True
-            except APIError:
-                pass
-        if username in repo_config.get("users", []):
-            return True
-        if repo_config.get("admins", False):
-            repo_full_name = "{}/{}".format(owner, repo)
-            return self.get_user_permission(repo_full_name, username) == 'admin'
-        return False
+        return compile_policy(repo_config).is_authorized(self, username, owner, repo, self.membership)
+
+
+def next_page_url(headers):
+    """
+    @params headers: The headers of a page of a GitHub list endpoint.
+    @return url: The url of the next page, or None if this is the last page.
+    """
+    for link in parse_header_links(headers.get('link', '')):
+        if link.get('rel') == 'next':
+            return link['url']
+    return None
+
+
+def parse_config(contents):
+    """
+    Parses the contents of a repository configuration file. yaml is only imported here, since
+    most configurations are served from the cache.
+    @params contents: The YAML text of the configuration file.
+    @return config: The parsed configuration.
+    """
+    import yaml
+    with tracing.span('parse_config', bytes=len(contents)):
+        return yaml.safe_load(contents)
+
+
+def rate_limit_resource(url):
+    """
+    @params url: The url of a GitHub API request.
+    @return resource: The rate limited resource the request counts against.
+    """
+    return 'graphql' if url.endswith('/graphql') else 'core'
+
+
+def _file_not_found(repository_name, filepath):
+    """
+    Builds the error raised when a requested file does not exist.
+    """
+    return APIError(
+        '404 Not Found: {}/{}'.format(repository_name, filepath),
+        ({
+            "status": "API Error",
+            "message": 'File not found: {}/{}'.format(
+                repository_name, filepath
+            )
+        }, 500)
+    )
+
+
+def config_key(repo_name, config_filename):
+    """
+    @params repo_name: The full name of the repository in the format 'owner/repo', in any case.
+    @params config_filename: The filename of the configuration file.
+    @return key: The key the configuration is cached under.
+    """
+    return (repo_name.lower(), config_filename)
+
+
+def config_scope(key):
+    """
+    @params key: A key built by config_key.
+    @return scope: The repository the configuration belongs to, which a push invalidates at once.
+    """
+    return key[0].lower()
+
+
+def _cached_config(entry, repo_name, config_filename):
+    """
+    Returns the configuration held by a cache entry, raising if the file was missing.
+    """
+    if entry.value is CONFIG_NOT_FOUND:
+        raise _file_not_found(repo_name, config_filename)
+    return entry.value
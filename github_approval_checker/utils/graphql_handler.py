@@ -0,0 +1,276 @@
+"""
+GraphQL-backed GithubHandler that fetches everything a review needs in a single request.
+"""
+
+import json
+import logging
+from github_approval_checker.utils.cache import TTLCache
+from github_approval_checker.utils.exceptions import RateLimitError
+from github_approval_checker.utils.github_handler import (
+    GithubHandler,
+    CONFIG_NOT_FOUND,
+    config_key,
+    parse_config
+)
+from github_approval_checker.utils.rate_limit import PRIORITY_OPTIONAL
+
+GRAPHQL_URL = 'https://api.github.com/graphql'
+
+# Seconds prefetched statuses and memberships are trusted for
+SNAPSHOT_TTL = 30
+
+# Teams and organizations fetched per query. Memberships the query does not list, because the
+# reviewer belongs to more, or to a team only through a child team, or keeps an organization
+# membership private, are checked with the REST API.
+MEMBERSHIP_PAGE_SIZE = 100
+
+REVIEW_QUERY = '''
+query($owner: String!, $name: String!, $expression: String!, $oid: GitObjectID!,
+      $login: String!, $logins: [String!], $pageSize: Int!, $withConfig: Boolean!) {
+  repository(owner: $owner, name: $name) {
+    config: object(expression: $expression) @include(if: $withConfig) {
+      ... on Blob { text }
+    }
+    commit: object(oid: $oid) {
+      ... on Commit {
+        status { contexts { context state description targetUrl } }
+      }
+    }
+    collaborators(query: $login, first: 10) {
+      edges { permission node { login } }
+    }
+  }
+  organization(login: $owner) {
+    teams(first: $pageSize, userLogins: $logins) {
+      nodes { slug }
+    }
+  }
+  user(login: $login) {
+    organizations(first: $pageSize) {
+      nodes { login }
+    }
+  }
+}
+'''
+
+logger = logging.getLogger(__name__)
+
+
+class GraphQLGithubHandler(GithubHandler):
+    """
+    A GithubHandler whose prepare_review fetches the repository configuration, the reviewed
+    commit's statuses and the reviewer's organizations, teams and repository permission in one
+    GraphQL query. The other methods answer from that snapshot and fall back to the REST API for
+    anything it does not cover.
+    """
+
+    def __init__(self, github_username, github_password, **handler_options):
+        """
+        Initialize handler with with Authentication values from the environment.
+        @params handler_options: Keyword arguments for GithubHandler.
+        """
+        super(GraphQLGithubHandler, self).__init__(github_username, github_password, **handler_options)
+        self.snapshots = TTLCache()
+
+    def prepare_review(self, repository_name, config_filename, ref, reviewer):
+        """
+        Fetches the data for a review in a single GraphQL query. The configuration is left out
+        of the query while a cached copy of it is still fresh. The query is optional, so it is
+        skipped when the GraphQL rate limit budget runs low.
+        @params repository_name: The full name of the repository in the format 'owner/repo'
+        @params config_filename: The filename of the configuration file to retrieve.
+        @params ref: The SHA of the reviewed commit.
+        @params reviewer: The username of the reviewer.
+        """
+        owner, name = repository_name.split('/', 1)
+        with_config = self.config_cache.get_fresh(config_key(repository_name, config_filename)) is None
+        if not self.rate_limit.allows(PRIORITY_OPTIONAL, 'graphql'):
+            logger.info("GraphQL rate limit budget is low, skipping prefetch")
+            return
+        try:
+            response = self._prefetch_query(owner, name, config_filename, ref, reviewer, with_config)
+        except RateLimitError as err:
+            logger.warning("GraphQL prefetch rate limited, falling back to REST: %s", err)
+            return
+        if response.status_code != 200:
+            logger.warning("GraphQL prefetch failed with %s, falling back to REST", response.status_code)
+            return
+        body = response.json()
+        for error in body.get('errors') or []:
+            logger.info("GraphQL prefetch partially failed: %s", error.get('message'))
+        self._store_snapshot(repository_name, config_filename, ref, reviewer, body.get('data') or {})
+
+    def _prefetch_query(self, owner, name, config_filename, ref, reviewer, with_config):
+        """
+        Sends the GraphQL query for a review.
+        """
+        return self._request('POST', GRAPHQL_URL, priority=PRIORITY_OPTIONAL, data=json.dumps({
+            'query': REVIEW_QUERY,
+            'variables': {
+                'owner': owner,
+                'name': name,
+                'expression': 'HEAD:{}'.format(config_filename),
+                'oid': ref,
+                'login': reviewer,
+                'logins': [reviewer],
+                'pageSize': MEMBERSHIP_PAGE_SIZE,
+                'withConfig': with_config
+            }
+        }))
+
+    def _store_snapshot(self, repository_name, config_filename, ref, reviewer, data):
+        """
+        Records the parts of a GraphQL response that were resolved.
+        """
+        owner = repository_name.split('/', 1)[0]
+        repository = data.get('repository') or {}
+
+        if 'config' in repository:
+            config = repository['config']
+            if config is None:
+                self.config_cache.set(config_key(repository_name, config_filename), CONFIG_NOT_FOUND,
+                                      self.config_negative_ttl)
+            else:
+                self.config_cache.set(
+                    config_key(repository_name, config_filename),
+                    parse_config(config['text']),
+                    self.config_ttl,
+                    size=len(config['text'])
+                )
+
+        commit = repository.get('commit')
+        if commit is not None:
+            contexts = (commit.get('status') or {}).get('contexts') or []
+            self.snapshots.set(('statuses', repository_name, ref), [
+                {
+                    'state': context['state'].lower(),
+                    'context': context['context'],
+                    'description': context['description'],
+                    'target_url': context['targetUrl']
+                }
+                for context in contexts
+            ], SNAPSHOT_TTL)
+
+        # The collaborators query searches logins and names, so a reviewer missing from its first
+        # matches may still be a collaborator and is left to the REST API
+        collaborators = repository.get('collaborators') or {}
+        for edge in collaborators.get('edges') or []:
+            if edge['node']['login'].lower() == reviewer.lower():
+                self.snapshots.set(
+                    ('permission', repository_name, reviewer), edge['permission'].lower(), SNAPSHOT_TTL
+                )
+
+        teams = (data.get('organization') or {}).get('teams')
+        if teams is not None:
+            self._store_memberships('teams', owner, reviewer, teams, 'slug')
+
+        organizations = (data.get('user') or {}).get('organizations')
+        if organizations is not None:
+            self._store_memberships('orgs', None, reviewer, organizations, 'login')
+
+    def _store_memberships(self, kind, owner, reviewer, connection, field):
+        """
+        Records the teams or organizations the query lists the reviewer in. The list only proves
+        memberships: it leaves out teams joined through a child team, secret teams and private
+        organization memberships, so a missing entry is not a non-membership.
+        """
+        members_of = frozenset(node[field].lower() for node in connection['nodes'])
+        self.snapshots.set((kind, owner, reviewer), members_of, SNAPSHOT_TTL)
+
+    def _membership(self, kind, owner, reviewer, target):
+        """
+        @return: True if the snapshot lists the reviewer in the target, or None if the REST API
+        has to be asked.
+        """
+        entry = self.snapshots.get_fresh((kind, owner, reviewer))
+        if entry is not None and target.lower() in entry.value:
+            return True
+        return None
+
+    def invalidate_memberships(self, organization_name, team_slug=None, user_name=None):
+        """
+        Forgets the cached members of an organization's teams, and the teams and organizations
+        snapshotted for the user whose membership changed.
+        @params organization_name: The organization whose memberships changed.
+        @params team_slug: The slug of the team whose members changed, or None for the whole
+        organization.
+        @params user_name: The user whose membership changed, if known.
+        @return invalidated: The number of cached entries forgotten.
+        """
+        invalidated = super(GraphQLGithubHandler, self).invalidate_memberships(
+            organization_name, team_slug, user_name
+        )
+        if user_name is not None:
+            for key in (('teams', organization_name, user_name), ('orgs', None, user_name)):
+                if key in self.snapshots:
+                    self.snapshots.delete(key)
+                    invalidated += 1
+        return invalidated
+
+    def invalidate_permission(self, repository_name, user_name):
+        """
+        Forgets the snapshotted permission of a user in a repository.
+        @params repository_name: The long name of the repository in the format 'owner/repo'.
+        @params user_name: The user whose permission changed.
+        @return invalidated: The number of cached entries forgotten.
+        """
+        key = ('permission', repository_name, user_name)
+        if key not in self.snapshots:
+            return 0
+        self.snapshots.delete(key)
+        return 1
+
+    def get_statuses(self, repository_name, ref):
+        """
+        Gets the combined status messages for a given ref and repository, from the prefetched
+        snapshot if there is one.
+        @params repository_name: The full name of the repository in the format 'owner/repo'
+        @params ref: The SHA, branch name, or tag name to retrieve status for.
+        @return statuses: The statuses for the specified ref.
+        """
+        key = ('statuses', repository_name, ref)
+        entry = self.snapshots.get_fresh(key)
+        if entry is not None:
+            # Statuses change often, so a snapshot only ever answers a single call
+            self.snapshots.delete(key)
+            return entry.value
+        return super(GraphQLGithubHandler, self).get_statuses(repository_name, ref)
+
+    def get_user_permission(self, repository_name, user_name):
+        """
+        Checks if a user has permissions in the repository, from the prefetched snapshot if
+        there is one.
+        @param repository_name: The long name of the repository in the format 'owner/repo'
+        @param user_name: A GitHub user's user_name
+        @return user_permission: The permission of the user in that repository
+        """
+        entry = self.snapshots.get_fresh(('permission', repository_name, user_name))
+        if entry is not None:
+            return entry.value
+        return super(GraphQLGithubHandler, self).get_user_permission(repository_name, user_name)
+
+    def is_user_on_org_team(self, organization_name, team_slug, user_name):
+        """
+        Checks that a user is a member of a team, from the prefetched snapshot if it can tell.
+        @params organization_name: The organization that the team is in.
+        @params team_slug: The 'slug' name of the team.
+        @params user_name: The username for the user we are checking membership for.
+        @return boolean: True if the user is a member of the team, False if otherwise
+        """
+        member = self._membership('teams', organization_name, user_name, team_slug)
+        if member is not None:
+            return member
+        return super(GraphQLGithubHandler, self).is_user_on_org_team(organization_name, team_slug, user_name)
+
+    def is_user_in_org(self, organization_name, user_name):
+        """
+        Returns the boolean of a user's membership in an organization, from the prefetched
+        snapshot if it can tell.
+        @params organization_name: The name of an organization
+        @params user_name: The username for the user we are checking membership for in an organization
+        @return: boolean that denotes whether a user is a member in the organization
+        """
+        member = self._membership('orgs', None, user_name, organization_name)
+        if member is not None:
+            return member
+        return super(GraphQLGithubHandler, self).is_user_in_org(organization_name, user_name)
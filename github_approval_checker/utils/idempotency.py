@@ -0,0 +1,151 @@
+"""
+Idempotency stores that remember which webhook deliveries and reviews are already processed or
+in progress, so that redelivered and replayed webhooks are answered without any GitHub calls.
+"""
+
+import sqlite3
+import threading
+import time
+from github_approval_checker.utils.cache import TTLCache
+
+DEFAULT_MAX_ENTRIES = 10000
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def review_keys(delivery_id, event):
+    """
+    Lists the idempotency keys of a review event.
+    @params delivery_id: The X-GitHub-Delivery header of the webhook, or None if it was not sent.
+    @params event: The ReviewEvent.
+    @return keys: A list of keys, one for the delivery and one for the reviewed commit.
+    """
+    keys = ['review:{}:{}:{}'.format(event.repo_full_name, event.commit_id, event.reviewer)]
+    if delivery_id:
+        keys.insert(0, 'delivery:{}'.format(delivery_id))
+    return keys
+
+
+def get_shared_store(backend, path=None):
+    """
+    Returns the process-wide idempotency store for a backend, creating it on first use.
+    @params backend: 'memory' for a store private to this process, or 'sqlite' for one shared
+    through a database file.
+    @params path: The path of the SQLite database file.
+    @return store: The shared MemoryIdempotencyStore or SQLiteIdempotencyStore.
+    """
+    key = (backend, path)
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            if backend == 'memory':
+                store = MemoryIdempotencyStore()
+            elif backend == 'sqlite':
+                store = SQLiteIdempotencyStore(path)
+            else:
+                raise ValueError('Unknown idempotency backend: ' + str(backend))
+            _STORES[key] = store
+        return store
+
+
+class MemoryIdempotencyStore(object):
+    """
+    An idempotency store held in this process, bounded to its most recently claimed keys.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, clock=time.time):
+        """
+        @params max_entries: The most keys remembered, the least recently used are evicted.
+        @params clock: A callable returning the current time in seconds.
+        """
+        self._keys = TTLCache(max_entries=max_entries, clock=clock)
+        self._lock = threading.Lock()
+
+    def claim(self, keys, ttl):
+        """
+        Records a set of keys, unless any of them is already recorded.
+        @params keys: The idempotency keys of a delivery.
+        @params ttl: Seconds the keys are remembered for.
+        @return boolean: True if the keys were claimed, False if this is a duplicate.
+        """
+        with self._lock:
+            if any(self._keys.get_fresh(key) is not None for key in keys):
+                return False
+            for key in keys:
+                self._keys.set(key, True, ttl)
+            return True
+
+    def release(self, keys):
+        """
+        Forgets a set of keys, so that a delivery that failed can be processed again.
+        @params keys: The idempotency keys of a delivery.
+        """
+        with self._lock:
+            for key in keys:
+                self._keys.delete(key)
+
+
+class SQLiteIdempotencyStore(object):
+    """
+    An idempotency store in a SQLite database file, shared by every process using the file.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, clock=time.time):
+        """
+        @params path: The path of the SQLite database file, or ':memory:'.
+        @params max_entries: The most keys remembered, those expiring soonest are evicted.
+        @params clock: A callable returning the current time in seconds.
+        """
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS idempotency_keys (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)'
+        )
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS idempotency_keys_expiry ON idempotency_keys (expires_at)'
+        )
+
+    def claim(self, keys, ttl):
+        """
+        Records a set of keys, unless any of them is already recorded.
+        @params keys: The idempotency keys of a delivery.
+        @params ttl: Seconds the keys are remembered for.
+        @return boolean: True if the keys were claimed, False if this is a duplicate.
+        """
+        now = self.clock()
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._connection.execute('DELETE FROM idempotency_keys WHERE expires_at <= ?', (now,))
+                placeholders = ','.join('?' * len(keys))
+                duplicate = self._connection.execute(
+                    'SELECT 1 FROM idempotency_keys WHERE key IN ({}) LIMIT 1'.format(placeholders), keys
+                ).fetchone() is not None
+                if not duplicate:
+                    self._connection.executemany(
+                        'INSERT INTO idempotency_keys (key, expires_at) VALUES (?, ?)',
+                        [(key, now + ttl) for key in keys]
+                    )
+                    self._connection.execute(
+                        'DELETE FROM idempotency_keys WHERE key IN ('
+                        'SELECT key FROM idempotency_keys ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+                        (self.max_entries,)
+                    )
+                self._connection.execute('COMMIT')
+            except Exception:
+                self._connection.execute('ROLLBACK')
+                raise
+        return not duplicate
+
+    def release(self, keys):
+        """
+        Forgets a set of keys, so that a delivery that failed can be processed again.
+        @params keys: The idempotency keys of a delivery.
+        """
+        with self._lock:
+            self._connection.executemany(
+                'DELETE FROM idempotency_keys WHERE key = ?', [(key,) for key in keys]
+            )
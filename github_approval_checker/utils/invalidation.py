@@ -0,0 +1,125 @@
+"""
+Invalidates exactly the cached configurations and memberships that a GitHub webhook event
+reports as changed. An event only reaches one process, so other processes only see the
+invalidation through a shared cache backend, and otherwise keep their entries until they expire.
+"""
+
+# GitHub only lists this many commits in a push payload, longer pushes may change any file
+MAX_PUSH_COMMITS = 20
+
+# Actions that change the members of an organization or of a team
+ORGANIZATION_ACTIONS = frozenset(['member_added', 'member_removed', 'renamed', 'deleted'])
+TEAM_ACTIONS = frozenset(['created', 'deleted', 'edited'])
+
+
+def changed_files(data):
+    """
+    @params data: The push event payload.
+    @return files: The set of paths added, modified or removed by the push, or None if the
+    payload does not list every commit.
+    """
+    commits = data.get('commits')
+    if commits is None or len(commits) >= MAX_PUSH_COMMITS or data.get('forced'):
+        return None
+    files = set()
+    for commit in commits:
+        for key in ('added', 'modified', 'removed'):
+            files.update(commit.get(key) or [])
+    return files
+
+
+def invalidate_push(handler, data):
+    """
+    Forgets the cached configurations changed by a push to a repository's default branch, the
+    branch configurations are read from.
+    @return invalidated: The number of cached entries forgotten.
+    """
+    repository = data['repository']
+    if data.get('ref') != 'refs/heads/{}'.format(repository.get('default_branch')):
+        return 0
+    return handler.invalidate_config(repository['full_name'], changed_files(data))
+
+
+def invalidate_membership(handler, data):
+    """
+    Forgets the cached members of the team a user was added to or removed from, and of its
+    parent team, whose member list includes those of its child teams.
+    @return invalidated: The number of cached entries forgotten.
+    """
+    if data.get('scope', 'team') != 'team':
+        return 0
+    organization = data['organization']['login']
+    user_name = (data.get('member') or {}).get('login')
+    team = data['team']
+    invalidated = handler.invalidate_memberships(organization, team['slug'], user_name)
+    parent = team.get('parent')
+    if parent:
+        invalidated += handler.invalidate_memberships(organization, parent['slug'], user_name)
+    return invalidated
+
+
+def invalidate_team(handler, data):
+    """
+    Forgets the cached members of a team that was created, deleted or edited, and of its parent
+    team. A renamed or moved team's old slug is not in the payload, so edits forget every
+    team of the organization.
+    @return invalidated: The number of cached entries forgotten.
+    """
+    if data.get('action') not in TEAM_ACTIONS:
+        return 0
+    organization = data['organization']['login']
+    if data['action'] == 'edited':
+        return handler.invalidate_memberships(organization)
+    team = data['team']
+    invalidated = handler.invalidate_memberships(organization, team['slug'])
+    parent = team.get('parent')
+    if parent:
+        invalidated += handler.invalidate_memberships(organization, parent['slug'])
+    return invalidated
+
+
+def invalidate_organization(handler, data):
+    """
+    Forgets the cached members of an organization and of all its teams when a member joins or
+    leaves it, or it is renamed or deleted.
+    @return invalidated: The number of cached entries forgotten.
+    """
+    if data.get('action') not in ORGANIZATION_ACTIONS:
+        return 0
+    user_name = ((data.get('membership') or {}).get('user') or {}).get('login')
+    invalidated = handler.invalidate_memberships(data['organization']['login'], user_name=user_name)
+    old_login = ((data.get('changes') or {}).get('login') or {}).get('from')
+    if old_login:
+        invalidated += handler.invalidate_memberships(old_login, user_name=user_name)
+    return invalidated
+
+
+def invalidate_member(handler, data):
+    """
+    Forgets the cached permission of a collaborator added to, removed from or changed in a
+    repository.
+    @return invalidated: The number of cached entries forgotten.
+    """
+    return handler.invalidate_permission(data['repository']['full_name'], data['member']['login'])
+
+
+# Webhook event names mapped to the function invalidating the entries they change
+INVALIDATORS = {
+    'push': invalidate_push,
+    'membership': invalidate_membership,
+    'team': invalidate_team,
+    'organization': invalidate_organization,
+    'member': invalidate_member
+}
+
+
+def invalidate(handler, event_name, data):
+    """
+    Forgets the cached entries of a handler that a webhook event reports as changed.
+    @params handler: The GithubHandler whose caches to invalidate.
+    @params event_name: The X-GitHub-Event name of the event, one of INVALIDATORS.
+    @params data: The event payload.
+    @raises KeyError if the payload lacks a field the event always carries.
+    @return invalidated: The number of cached entries forgotten.
+    """
+    return INVALIDATORS[event_name](handler, data)
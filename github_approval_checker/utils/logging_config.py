@@ -5,6 +5,10 @@ Defines logging in CloudWatch
 import logging
 import sys
 
+# Loggers whose records are complete JSON documents, such as CloudWatch embedded metric format
+# lines, and are written without the usual prefix so that they can still be parsed
+JSON_LOGGERS = ('github_approval_checker.utils.api_metrics',)
+
 
 def configure_logging(debug=False, silent=False):
     """
@@ -32,3 +36,13 @@ def configure_logging(debug=False, silent=False):
     stream_handler.setLevel(logging.INFO)
     stream_handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(levelname)s %(message)s'))
     logger.addHandler(stream_handler)
+
+    json_handler = logging.StreamHandler(sys.__stdout__)
+    json_handler.setLevel(logging.INFO)
+    json_handler.setFormatter(logging.Formatter('%(message)s'))
+    for name in JSON_LOGGERS:
+        json_logger = logging.getLogger(name)
+        for handler in list(json_logger.handlers):
+            json_logger.removeHandler(handler)
+        json_logger.addHandler(json_handler)
+        json_logger.propagate = False
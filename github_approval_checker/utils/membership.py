@@ -0,0 +1,239 @@
+"""
+A local directory of the members of the organizations and teams that repository configurations
+authorize, so that authorization checks are answered from memory instead of one GitHub call per
+organization and team. Member lists are loaded in bulk and refreshed in the background.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+import requests
+from github_approval_checker.utils.cache import TTLCache
+from github_approval_checker.utils.exceptions import APIError, RateLimitError
+from github_approval_checker.utils.rate_limit import PRIORITY_OPTIONAL
+
+# Seconds a loaded member list is used for, 0 disables the directory
+DEFAULT_MEMBERSHIP_TTL = 0
+
+# Seconds between background refreshes. Lists expiring before the next refresh are reloaded.
+DEFAULT_REFRESH_INTERVAL = 60
+
+# Groups with more members than this are left to live checks
+DEFAULT_MAX_MEMBERS = 10000
+
+DEFAULT_MAX_GROUPS = 256
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def policy_groups(policy, owner):
+    """
+    @params policy: A compiled AuthorizationPolicy.
+    @params owner: The owner of the repository the policy is applied to.
+    @return groups: The ('org', org) and ('team', 'owner/slug') checks of the policy.
+    """
+    return [('org', org) for org in policy.orgs] + [
+        ('team', '{}/{}'.format(owner, team)) for team in policy.teams
+    ]
+
+
+def group_key(group):
+    """
+    @params group: An ('org', org) or ('team', 'owner/slug') group, in any case.
+    @return key: The group in lower case, as its member list is cached under.
+    """
+    return (group[0], group[1].lower())
+
+
+def group_scope(key):
+    """
+    @params key: A key built by group_key.
+    @return scope: The organization the group belongs to, whose lists are invalidated at once.
+    """
+    return key[1].split('/', 1)[0]
+
+
+class MembershipDirectory(object):
+    """
+    Thread-safe sets of the members of organizations and teams, each loaded with every page of
+    its member list and kept for a time to live.
+    """
+
+    def __init__(self, handler, ttl, refresh_interval=DEFAULT_REFRESH_INTERVAL,
+                 max_members=DEFAULT_MAX_MEMBERS, max_groups=DEFAULT_MAX_GROUPS,
+                 max_bytes=DEFAULT_MAX_BYTES, clock=time.time, background=True, backend=None):
+        """
+        @params handler: The GithubHandler member lists are loaded with.
+        @params ttl: Seconds a loaded member list is used for.
+        @params refresh_interval: Seconds between background refreshes.
+        @params max_members: The largest member list kept, larger groups are checked live.
+        @params max_groups: The most groups tracked and kept.
+        @params max_bytes: The memory budget for the member lists, counted in login characters.
+        @params clock: A callable returning the current time in seconds.
+        @params background: Whether a daemon thread refreshes the lists. Otherwise refresh() has
+        to be called.
+        @params backend: An optional shared_cache.CacheBackend the lists are shared through.
+        """
+        self.handler = handler
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.max_members = max_members
+        self.max_groups = max_groups
+        self.background = background
+        self.groups = TTLCache(
+            max_entries=max_groups, max_bytes=max_bytes, clock=clock, backend=backend, namespace='membership',
+            scope=group_scope
+        )
+        self.counts = {'loads': 0, 'load_errors': 0, 'hits': 0, 'misses': 0}
+        self._tracked = OrderedDict()
+        self._oversized = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._refresher = None
+
+    def track(self, groups):
+        """
+        Adds groups to the directory, waking the background refresher to load new ones.
+        The least recently tracked groups are dropped beyond max_groups.
+        @params groups: The ('org', org) and ('team', 'owner/slug') groups to keep loaded.
+        """
+        added = False
+        with self._lock:
+            for group in map(group_key, groups):
+                if group in self._oversized:
+                    continue
+                if group in self._tracked:
+                    del self._tracked[group]
+                else:
+                    added = True
+                self._tracked[group] = None
+            while len(self._tracked) > self.max_groups:
+                self._tracked.popitem(last=False)
+            if added and self.background:
+                self._start_refresher()
+        if added:
+            self._wakeup.set()
+
+    def lookup(self, group, username):
+        """
+        @params group: The ('org', org) or ('team', 'owner/slug') group.
+        @params username: The username to look for.
+        @return: True or False if the group's loaded members answer whether the user belongs to
+        it, or None if the group is not loaded and has to be checked live.
+        """
+        entry = self.groups.get_fresh(group_key(group))
+        if entry is None:
+            self.counts['misses'] += 1
+            return None
+        self.counts['hits'] += 1
+        return username.lower() in entry.value
+
+    def invalidate(self, organization, team=None):
+        """
+        Forgets loaded member lists so that they are checked live until they are reloaded, and
+        wakes the background refresher to reload them. With a shared backend, the lists are
+        forgotten there too, including those this process never loaded.
+        @params organization: The organization whose lists changed.
+        @params team: The slug of the team whose list changed, or None for the organization's
+        list and the lists of all its teams.
+        @return invalidated: The number of lists forgotten.
+        """
+        organization = organization.lower()
+        if team is not None:
+            invalidated = self.groups.delete(group_key(('team', '{}/{}'.format(organization, team))))
+        else:
+            invalidated = self.groups.invalidate_scope(organization)
+        self._wakeup.set()
+        return int(invalidated)
+
+    def refresh(self):
+        """
+        Loads the tracked groups that are missing or expire before the next refresh, one at a time.
+        @return loaded: The number of groups loaded.
+        """
+        with self._lock:
+            tracked = list(self._tracked)
+        due_by = self.groups.clock() + self.refresh_interval
+        loaded = 0
+        for group in tracked:
+            entry = self.groups.get(group)
+            if entry is not None and entry.expires_at > due_by:
+                continue
+            if not self.load(group):
+                break
+            loaded += 1
+        return loaded
+
+    def load(self, group):
+        """
+        Loads every page of a group's member list at optional priority, so that loading never
+        takes the rate limit budget needed for reviews.
+        @params group: The ('org', org) or ('team', 'owner/slug') group.
+        @return boolean: False if the rate limit budget ran out and loading should stop.
+        """
+        group = group_key(group)
+        kind, target = group
+        logins = set()
+        try:
+            if kind == 'org':
+                members = self.handler.get_org_members(target, priority=PRIORITY_OPTIONAL)
+            else:
+                organization, team = target.split('/', 1)
+                members = self.handler.get_org_team_members(organization, team, priority=PRIORITY_OPTIONAL)
+            for member in members:
+                logins.add(member['login'].lower())
+                if len(logins) > self.max_members:
+                    logger.info('%s %s has over %s members, checking it live', kind, target, self.max_members)
+                    self._drop(group)
+                    return True
+        except RateLimitError as err:
+            logger.info('Membership refresh deferred: %s', err)
+            return False
+        except (APIError, requests.exceptions.RequestException) as err:
+            self.counts['load_errors'] += 1
+            logger.error('Unable to load the members of %s %s: %s', kind, target, err)
+            return True
+
+        self.counts['loads'] += 1
+        self.groups.set(group, frozenset(logins), self.ttl, size=sum(len(login) for login in logins) or 1)
+        return True
+
+    def snapshot(self):
+        """
+        @return metrics: A dict of the groups tracked and loaded, loads, errors and lookups.
+        """
+        metrics = {'tracked': len(self._tracked), 'loaded': len(self.groups)}
+        metrics.update(self.counts)
+        return metrics
+
+    def _drop(self, group):
+        """
+        Stops tracking a group that is too large to keep.
+        """
+        with self._lock:
+            self._tracked.pop(group, None)
+            self._oversized.add(group)
+        self.groups.delete(group)
+
+    def _start_refresher(self):
+        """
+        Starts the background refresher thread if it is not running. Called with the lock held.
+        """
+        if self._refresher is None:
+            self._refresher = threading.Thread(target=self._run, name='membership-refresher')
+            self._refresher.daemon = True
+            self._refresher.start()
+
+    def _run(self):
+        """
+        Refreshes the directory every refresh_interval seconds, or as soon as groups are added.
+        """
+        while True:
+            self._wakeup.clear()
+            try:
+                self.refresh()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Membership refresh failed')
+            self._wakeup.wait(self.refresh_interval)
@@ -0,0 +1,169 @@
+"""
+Compiles repository configurations into authorization policies that run the cheapest and most
+successful checks first.
+"""
+
+import threading
+import time
+from github_approval_checker.utils.cache import TTLCache
+from github_approval_checker.utils.exceptions import APIError, RateLimitError
+from github_approval_checker.utils.membership import policy_groups
+
+POLICY_CACHE_TTL = 3600
+POLICY_CACHE_SIZE = 256
+
+# Latency assumed for a check that has never run, in seconds
+DEFAULT_CHECK_COST = 0.1
+
+
+class CheckStats(object):
+    """
+    Process-wide record of how long each authorization check takes and how often it grants.
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, elapsed, granted):
+        """
+        Records the outcome of running a check.
+        @params key: The (kind, target) identifying the check.
+        @params elapsed: The seconds the check took.
+        @params granted: Whether the check authorized the user.
+        """
+        with self._lock:
+            calls, total_time, grants = self._stats.get(key, (0, 0.0, 0))
+            self._stats[key] = (calls + 1, total_time + elapsed, grants + int(granted))
+
+    def expected_cost(self, key):
+        """
+        Estimates the time spent on a check for every grant it produces, which is its mean
+        latency divided by its smoothed hit rate. Lower is better.
+        @params key: The (kind, target) identifying the check.
+        @return cost: The expected seconds per grant.
+        """
+        calls, total_time, grants = self._stats.get(key, (0, 0.0, 0))
+        mean_latency = total_time / calls if calls else DEFAULT_CHECK_COST
+        hit_rate = (grants + 1.0) / (calls + 2.0)
+        return mean_latency / hit_rate
+
+    def clear(self):
+        """
+        Forgets every recorded outcome.
+        """
+        with self._lock:
+            self._stats.clear()
+
+
+CHECK_STATS = CheckStats()
+
+
+class AuthorizationPolicy(object):
+    """
+    A repository configuration compiled for repeated authorization decisions.
+    """
+
+    def __init__(self, repo_config, stats=None):
+        """
+        @params repo_config: The configuration of organizations, teams, users and admins
+        authorized to approve PRs.
+        @params stats: The CheckStats used to order network checks, defaults to CHECK_STATS.
+        """
+        self.users = frozenset(repo_config.get("users", []))
+        self.orgs = tuple(repo_config.get("orgs", []))
+        self.teams = tuple(repo_config.get("teams", []))
+        self.admins = bool(repo_config.get("admins", False))
+        self.stats = stats if stats is not None else CHECK_STATS
+
+    def network_checks(self, owner, repo):
+        """
+        Lists the checks that need the GitHub API, ordered by expected cost per grant.
+        @params owner: The owner of the repository.
+        @params repo: The repository the PR is in.
+        @return checks: A list of (kind, target) tuples.
+        """
+        checks = [('org', org) for org in self.orgs]
+        checks += [('team', '{}/{}'.format(owner, team)) for team in self.teams]
+        if self.admins:
+            checks.append(('admin', '{}/{}'.format(owner, repo)))
+        return sorted(checks, key=self.stats.expected_cost)
+
+    def is_authorized(self, handler, username, owner, repo, directory=None):
+        """
+        Validates the user against the policy, stopping at the first check that grants. Checks
+        the membership directory can answer are made first, without the API.
+        @params handler: The GithubHandler used for checks that need the API.
+        @params username: The username to check. Likely the review of the PR.
+        @params owner: The owner of the repository.
+        @params repo: The repository the PR is in.
+        @params directory: An optional MembershipDirectory to answer membership checks from.
+        @raises RateLimitError if the rate limit budget does not allow the checks to be made.
+        @returns boolean: True if the user has permission to approve PRs, False if not.
+        """
+        if username in self.users:
+            return True
+        checks = self.network_checks(owner, repo)
+        if directory is not None:
+            directory.track(policy_groups(self, owner))
+            unanswered = []
+            for check in checks:
+                member = directory.lookup(check, username) if check[0] != 'admin' else None
+                if member:
+                    return True
+                if member is None:
+                    unanswered.append(check)
+            checks = unanswered
+        for check in checks:
+            started = time.time()
+            try:
+                granted = run_check(handler, check, username)
+            except RateLimitError:
+                raise
+            except APIError:
+                granted = False
+            self.stats.record(check, time.time() - started, granted)
+            if granted:
+                return True
+        return False
+
+
+def run_check(handler, check, username):
+    """
+    Runs a single network check.
+    @params handler: The GithubHandler used to call the API.
+    @params check: The (kind, target) tuple to run.
+    @params username: The username to check.
+    @return boolean: True if the check authorizes the user.
+    """
+    kind, target = check
+    if kind == 'org':
+        return handler.is_user_in_org(target, username)
+    if kind == 'team':
+        owner, team = target.split('/', 1)
+        return handler.is_user_on_org_team(owner, team, username)
+    return handler.get_user_permission(target, username) == 'admin'
+
+
+_POLICY_CACHE = TTLCache(max_entries=POLICY_CACHE_SIZE)
+
+
+def compile_policy(repo_config):
+    """
+    Returns the AuthorizationPolicy for a configuration, reusing one compiled earlier for an
+    identical configuration.
+    @params repo_config: The validated repository configuration.
+    @return policy: The compiled AuthorizationPolicy.
+    """
+    key = (
+        tuple(repo_config.get("orgs", [])),
+        tuple(repo_config.get("teams", [])),
+        tuple(repo_config.get("users", [])),
+        bool(repo_config.get("admins", False))
+    )
+    entry = _POLICY_CACHE.get_fresh(key)
+    if entry is not None:
+        return entry.value
+    policy = AuthorizationPolicy(repo_config)
+    _POLICY_CACHE.set(key, policy, POLICY_CACHE_TTL)
+    return policy
@@ -0,0 +1,153 @@
+"""
+Tracks the GitHub API rate limit budget from response headers and schedules requests by priority
+so that status overwrites keep working when the budget runs low.
+"""
+
+import threading
+import time
+from github_approval_checker.utils.exceptions import RateLimitError
+
+# Request priorities, lower numbers are more important
+PRIORITY_WRITE = 0
+PRIORITY_READ = 1
+PRIORITY_OPTIONAL = 2
+
+# Requests kept back for each priority above it. Reads stop before the last DEFAULT_READ_RESERVE
+# requests, which are kept for writes, and optional requests stop earlier still.
+DEFAULT_READ_RESERVE = 100
+DEFAULT_OPTIONAL_RESERVE = 500
+
+# The longest a request will wait for the budget to recover before failing instead
+DEFAULT_MAX_WAIT = 5
+
+DEFAULT_RESOURCE = 'core'
+
+_TRACKERS = {}
+_TRACKERS_LOCK = threading.Lock()
+
+
+def get_shared_tracker(github_username):
+    """
+    Returns the process-wide RateLimitTracker for a GitHub user, since the budget is per user.
+    @params github_username: The GitHub username requests are made as.
+    @return tracker: The shared RateLimitTracker.
+    """
+    with _TRACKERS_LOCK:
+        tracker = _TRACKERS.get(github_username)
+        if tracker is None:
+            tracker = RateLimitTracker()
+            _TRACKERS[github_username] = tracker
+        return tracker
+
+
+class RateLimitTracker(object):
+    """
+    Keeps the latest known budget of each rate limited resource ('core', 'graphql', ...).
+    """
+
+    def __init__(self, read_reserve=DEFAULT_READ_RESERVE, optional_reserve=DEFAULT_OPTIONAL_RESERVE,
+                 max_wait=DEFAULT_MAX_WAIT, clock=time.time):
+        """
+        @params read_reserve: Requests left for writes only.
+        @params optional_reserve: Requests below which optional requests are skipped.
+        @params max_wait: The longest a request waits for the budget before RateLimitError is raised.
+        @params clock: A callable returning the current time in seconds.
+        """
+        self.reserves = {
+            PRIORITY_WRITE: 0,
+            PRIORITY_READ: read_reserve,
+            PRIORITY_OPTIONAL: optional_reserve
+        }
+        self.max_wait = max_wait
+        self.clock = clock
+        self.blocked_until = 0
+        self.deferred = 0
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+    def update(self, headers):
+        """
+        Records the budget reported by a response.
+        @params headers: The headers of a GitHub API response.
+        """
+        now = self.clock()
+        with self._lock:
+            remaining = headers.get('X-RateLimit-Remaining')
+            if remaining is not None:
+                resource = headers.get('X-RateLimit-Resource', DEFAULT_RESOURCE)
+                self._budgets[resource] = (
+                    int(headers.get('X-RateLimit-Limit', 0)),
+                    int(remaining),
+                    int(headers.get('X-RateLimit-Reset', 0))
+                )
+            retry_after = headers.get('Retry-After')
+            if retry_after is not None:
+                self.blocked_until = max(self.blocked_until, now + int(retry_after))
+
+    def remaining(self, resource=DEFAULT_RESOURCE):
+        """
+        @params resource: The rate limited resource.
+        @return remaining: The requests left in the current window, or None if not known yet.
+        """
+        budget = self._budgets.get(resource)
+        if budget is None or budget[2] <= self.clock():
+            return None
+        return budget[1]
+
+    def allows(self, priority, resource=DEFAULT_RESOURCE):
+        """
+        @params priority: One of the PRIORITY_ constants.
+        @params resource: The rate limited resource.
+        @return boolean: True if a request of this priority can be made right now.
+        """
+        remaining = self.remaining(resource)
+        if self.blocked_until > self.clock():
+            return False
+        return remaining is None or remaining > self.reserves[priority]
+
+    def acquire(self, priority, resource=DEFAULT_RESOURCE):
+        """
+        Reserves budget for a request.
+        @params priority: One of the PRIORITY_ constants.
+        @params resource: The rate limited resource.
+        @raises RateLimitError if the budget will not allow the request within max_wait seconds.
+        @return wait: The seconds to wait before making the request.
+        """
+        now = self.clock()
+        with self._lock:
+            wait = max(self.blocked_until - now, 0)
+            budget = self._budgets.get(resource)
+            if budget is not None and budget[2] > now:
+                limit, remaining, reset_at = budget
+                if remaining <= self.reserves[priority]:
+                    wait = max(wait, reset_at - now)
+                else:
+                    # Count the request against the budget until its response reports the real value
+                    self._budgets[resource] = (limit, remaining - 1, reset_at)
+            if wait > self.max_wait:
+                self.deferred += 1
+                raise RateLimitError(
+                    'GitHub {} rate limit budget exhausted for {} more seconds'.format(resource, int(wait)),
+                    retry_after=wait
+                )
+            return wait
+
+    def snapshot(self):
+        """
+        @return metrics: A dict of the remaining budget of each resource and the requests deferred.
+        """
+        with self._lock:
+            metrics = {'deferred': self.deferred}
+            for resource in self._budgets:
+                metrics['{}_remaining'.format(resource)] = self.remaining(resource)
+            return metrics
+
+
+def is_rate_limited(response):
+    """
+    @params response: A GitHub API response.
+    @return boolean: True if the response refused the request because of a rate limit.
+    """
+    return response.status_code in (403, 429) and (
+        response.headers.get('X-RateLimit-Remaining') == '0' or 'Retry-After' in response.headers
+    )
@@ -0,0 +1,512 @@
+"""
+Cache backends shared beyond a single handler, so that new Lambda containers and WSGI workers
+start with the configurations and member lists that others already fetched. TTLCache stays the
+in-process first level, and only reads a backend on a miss and writes to it on a store.
+
+Values are stored in a compact binary format: a fixed header of the format version, expiry time
+and ETag length, the ETag, and the value in marshal format. marshal only handles built-in types
+and is not safe against crafted data, so a backend must only be writable by the approval checker.
+"""
+
+import json
+import logging
+import marshal
+import socket
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('!BdH')
+
+CACHE_BACKENDS = ('none', 'memory', 'sqlite', 'redis')
+DEFAULT_SHARED_MAX_BYTES = 16 * 1024 * 1024
+
+# Seconds a backend keeps an entry past its expiry, so that it can still be revalidated with its ETag
+STALE_RETENTION = 3600
+
+# Seconds a process uses an entry it read from or wrote to a backend before reading it again, which
+# bounds how long an entry deleted or invalidated by another process is still used
+DEFAULT_LOCAL_TTL = 30
+
+# Seconds a backend keeps the generation of an invalidated scope. Entries stored before the
+# invalidation can only reappear once it expires, so cached values must expire well before it.
+GENERATION_RETENTION = 7 * 24 * 3600
+
+DEFAULT_REDIS_TIMEOUT = 0.5
+
+# Seconds a Redis backend is not contacted after it could not be reached, doubled for every
+# consecutive failure up to MAX_ERROR_BACKOFF, so that an outage does not slow every lookup
+ERROR_BACKOFF = 1
+MAX_ERROR_BACKOFF = 30
+
+logger = logging.getLogger(__name__)
+
+_BACKENDS = {}
+_BACKENDS_LOCK = threading.Lock()
+
+
+def cache_key(namespace, key):
+    """
+    @params namespace: The name of the cache the key belongs to.
+    @params key: A key of str, int and tuple parts.
+    @return key: The str the key is stored under in a backend.
+    """
+    return '{}:{}'.format(namespace, json.dumps(key, separators=(',', ':')))
+
+
+def encode(value, expires_at, etag=None):
+    """
+    @params value: The cached value, made of built-in types only.
+    @params expires_at: The clock time after which the value is stale.
+    @params etag: The ETag the value was served with, or None.
+    @return data: The encoded bytes, or None if the value cannot be encoded.
+    """
+    etag_bytes = etag.encode('utf-8') if etag else b''
+    try:
+        payload = marshal.dumps(value)
+    except ValueError:
+        return None
+    return _HEADER.pack(FORMAT_VERSION, expires_at, len(etag_bytes)) + etag_bytes + payload
+
+
+def decode(data):
+    """
+    @params data: Bytes written by encode.
+    @return: A tuple of the value, its expiry time and its ETag, or None if the data was written
+    in another format.
+    """
+    if data is None or len(data) < _HEADER.size:
+        return None
+    version, expires_at, etag_length = _HEADER.unpack_from(data)
+    if version != FORMAT_VERSION:
+        return None
+    start = _HEADER.size + etag_length
+    try:
+        value = marshal.loads(data[start:])
+    except (EOFError, ValueError, TypeError):
+        return None
+    etag = data[_HEADER.size:start].decode('utf-8') or None
+    return value, expires_at, etag
+
+
+def get_shared_backend(backend, path=None, url=None, max_bytes=DEFAULT_SHARED_MAX_BYTES):
+    """
+    Returns the process-wide cache backend of a kind, creating it on first use.
+    @params backend: 'memory', 'sqlite' or 'redis'.
+    @params path: The path of the SQLite database file.
+    @params url: The redis:// url of the Redis server.
+    @params max_bytes: The memory budget of the values stored.
+    @return backend: The shared MemoryBackend, SQLiteBackend or RedisBackend.
+    """
+    key = (backend, path, url)
+    with _BACKENDS_LOCK:
+        shared = _BACKENDS.get(key)
+        if shared is None:
+            if backend == 'memory':
+                shared = MemoryBackend(max_bytes)
+            elif backend == 'sqlite':
+                shared = SQLiteBackend(path, max_bytes)
+            elif backend == 'redis':
+                shared = RedisBackend(url, max_bytes)
+            else:
+                raise ValueError('Unknown cache backend: ' + str(backend))
+            _BACKENDS[key] = shared
+        return shared
+
+
+class CacheBackend(object):
+    """
+    A store of encoded values with a time to live. Backends never raise for an unavailable
+    store, they count the error and behave as if the value was not cached. Callers tell such a
+    failure apart from a real miss with available().
+    """
+
+    def __init__(self, max_bytes, clock=time.time):
+        """
+        @params max_bytes: The memory budget of the values stored. Larger values are not stored.
+        @params clock: A callable returning the current time in seconds.
+        """
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.counts = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'errors': 0, 'skipped': 0}
+        self._failures = 0
+        self._retry_at = 0
+
+    def get(self, key):
+        """
+        @params key: The key, as built by cache_key.
+        @return data: The stored bytes, or None if nothing unexpired is stored.
+        """
+        raise NotImplementedError()
+
+    def set(self, key, data, ttl):
+        """
+        Stores bytes, evicting other values if the backend is over its budget.
+        @params key: The key, as built by cache_key.
+        @params data: The bytes to store.
+        @params ttl: Seconds the bytes are kept for.
+        """
+        raise NotImplementedError()
+
+    def delete(self, key):
+        """
+        Removes a value if present.
+        @params key: The key, as built by cache_key.
+        @return boolean: Whether a value was removed.
+        """
+        return self.delete_many([key]) > 0
+
+    def delete_many(self, keys):
+        """
+        Removes the values of several keys at once.
+        @params keys: The keys, as built by cache_key.
+        @return removed: The number of values removed.
+        """
+        raise NotImplementedError()
+
+    def available(self):
+        """
+        @return boolean: Whether the store answered its last request. While it does not, a None
+        from get is a failure rather than a miss.
+        """
+        return self._failures == 0
+
+    def snapshot(self):
+        """
+        @return metrics: A dict of the hits, misses, sets, evictions and errors of the backend,
+        and of the requests skipped while backing off from errors.
+        """
+        return dict(self.counts)
+
+    def _found(self, data):
+        """
+        Counts a lookup and passes its result through.
+        """
+        self.counts['misses' if data is None else 'hits'] += 1
+        return data
+
+    def _error(self, err):
+        """
+        Counts and logs an error of the store, which is then treated as a miss, and backs off
+        from the store for a time growing with the consecutive errors.
+        """
+        self.counts['errors'] += 1
+        self._failures += 1
+        self._retry_at = self.clock() + min(ERROR_BACKOFF * 2 ** (self._failures - 1), MAX_ERROR_BACKOFF)
+        logger.error('Shared cache error: %s', err)
+
+    def _backing_off(self):
+        """
+        @return boolean: Whether the store failed too recently to be tried again.
+        """
+        return self._failures > 0 and self.clock() < self._retry_at
+
+
+class MemoryBackend(CacheBackend):
+    """
+    An LRU store in this process, shared by every handler in it.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_SHARED_MAX_BYTES, clock=time.time):
+        """
+        @params max_bytes: The memory budget of the values stored.
+        @params clock: A callable returning the current time in seconds.
+        """
+        super(MemoryBackend, self).__init__(max_bytes, clock)
+        self.total_bytes = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            stored = self._values.get(key)
+            if stored is not None and stored[1] <= self.clock():
+                self._remove(key)
+                stored = None
+            if stored is not None:
+                del self._values[key]
+                self._values[key] = stored
+            return self._found(stored[0] if stored is not None else None)
+
+    def set(self, key, data, ttl):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._values[key] = (data, self.clock() + ttl)
+            self.total_bytes += len(data)
+            self.counts['sets'] += 1
+            while self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self._values)))
+                self.counts['evictions'] += 1
+
+    def delete_many(self, keys):
+        with self._lock:
+            return sum(1 for key in keys if self._remove(key))
+
+    def snapshot(self):
+        metrics = super(MemoryBackend, self).snapshot()
+        metrics['bytes'] = self.total_bytes
+        return metrics
+
+    def _remove(self, key):
+        stored = self._values.pop(key, None)
+        if stored is not None:
+            self.total_bytes -= len(stored[0])
+        return stored is not None
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    A store in a SQLite database file, shared by every process on the host using the file.
+    Values expiring soonest are evicted first once the file holds more than max_bytes of values.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_SHARED_MAX_BYTES, clock=time.time):
+        """
+        @params path: The path of the SQLite database file, or ':memory:'.
+        @params max_bytes: The memory budget of the values stored.
+        @params clock: A callable returning the current time in seconds.
+        """
+        super(SQLiteBackend, self).__init__(max_bytes, clock)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS shared_cache ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS shared_cache_expiry ON shared_cache (expires_at)'
+        )
+
+    def get(self, key):
+        with self._lock:
+            try:
+                row = self._connection.execute(
+                    'SELECT value FROM shared_cache WHERE key = ? AND expires_at > ?', (key, self.clock())
+                ).fetchone()
+            except sqlite3.Error as err:
+                self._error(err)
+                return None
+            self._failures = 0
+            return self._found(bytes(row[0]) if row is not None else None)
+
+    def set(self, key, data, ttl):
+        if len(data) > self.max_bytes:
+            return
+        now = self.clock()
+        with self._lock:
+            try:
+                self._connection.execute('BEGIN IMMEDIATE')
+                try:
+                    self._connection.execute('DELETE FROM shared_cache WHERE expires_at <= ?', (now,))
+                    self._connection.execute(
+                        'INSERT OR REPLACE INTO shared_cache (key, value, size, expires_at) '
+                        'VALUES (?, ?, ?, ?)',
+                        (key, sqlite3.Binary(data), len(data), now + ttl)
+                    )
+                    self.counts['evictions'] += self._evict()
+                    self._connection.execute('COMMIT')
+                except Exception:
+                    self._connection.execute('ROLLBACK')
+                    raise
+            except sqlite3.Error as err:
+                self._error(err)
+                return
+            self.counts['sets'] += 1
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        removed = 0
+        with self._lock:
+            try:
+                # Stay below SQLite's limit on the number of parameters of a statement
+                for start in range(0, len(keys), 500):
+                    batch = keys[start:start + 500]
+                    removed += self._connection.execute(
+                        'DELETE FROM shared_cache WHERE key IN ({})'.format(','.join('?' * len(batch))), batch
+                    ).rowcount
+            except sqlite3.Error as err:
+                self._error(err)
+        return removed
+
+    def snapshot(self):
+        metrics = super(SQLiteBackend, self).snapshot()
+        with self._lock:
+            metrics['bytes'] = self._connection.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM shared_cache'
+            ).fetchone()[0]
+        return metrics
+
+    def _evict(self):
+        """
+        Deletes the values expiring soonest until the values fit in max_bytes.
+        @return evicted: The number of values deleted.
+        """
+        evicted = 0
+        total = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM shared_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        for key, size in self._connection.execute(
+                'SELECT key, size FROM shared_cache ORDER BY expires_at').fetchall():
+            if total <= self.max_bytes:
+                break
+            self._connection.execute('DELETE FROM shared_cache WHERE key = ?', (key,))
+            total -= size
+            evicted += 1
+        return evicted
+
+
+class RedisBackend(CacheBackend):
+    """
+    A store in a Redis server, or any server speaking its protocol, shared by every container
+    and worker that can reach it. A minimal client of the GET, SET and DEL commands is built in,
+    over one connection guarded by a lock. Eviction beyond the server's memory budget is left to
+    its maxmemory policy, which should be allkeys-lru. Once the server cannot be reached, commands
+    are skipped without connecting until its backoff has passed.
+    """
+
+    def __init__(self, url, max_bytes=DEFAULT_SHARED_MAX_BYTES, timeout=DEFAULT_REDIS_TIMEOUT,
+                 clock=time.time):
+        """
+        @params url: The redis://[:password@]host[:port][/db] url of the server.
+        @params max_bytes: The largest value stored.
+        @params timeout: Seconds a connection or command may take before it is given up on.
+        @params clock: A callable returning the current time in seconds.
+        """
+        super(RedisBackend, self).__init__(max_bytes, clock)
+        parsed = urlparse(url)
+        self.address = (parsed.hostname or 'localhost', parsed.port or 6379)
+        self.password = parsed.password
+        self.database = int(parsed.path.strip('/') or 0)
+        self.timeout = timeout
+        self._socket = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        data = self._command('GET', key)
+        return self._found(data if isinstance(data, bytes) else None)
+
+    def set(self, key, data, ttl):
+        if len(data) > self.max_bytes:
+            return
+        if self._command('SET', key, data, 'PX', int(ttl * 1000)) is not None:
+            self.counts['sets'] += 1
+
+    def delete_many(self, keys):
+        if not keys:
+            return 0
+        return self._command('DEL', *keys) or 0
+
+    def close(self):
+        """
+        Closes the connection to the server.
+        """
+        with self._lock:
+            self._disconnect()
+
+    def _command(self, *args):
+        """
+        Sends a command, connecting first if needed.
+        @return reply: The decoded reply, or None if the server could not be reached, replied
+        with an error or is being backed off from.
+        """
+        with self._lock:
+            if self._backing_off():
+                self.counts['skipped'] += 1
+                return None
+            try:
+                if self._socket is None:
+                    self._connect()
+                self._socket.sendall(_encode_command(args))
+                reply = self._read_reply()
+            except RedisReplyError as err:
+                self.counts['errors'] += 1
+                logger.error('Shared cache error: %s', err)
+                return None
+            except (socket.error, IOError, RedisError) as err:
+                self._disconnect()
+                self._error(err)
+                return None
+            self._failures = 0
+            return reply
+
+    def _connect(self):
+        self._socket = socket.create_connection(self.address, self.timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._socket.makefile('rb')
+        if self.password:
+            self._socket.sendall(_encode_command(('AUTH', self.password)))
+            self._read_reply()
+        if self.database:
+            self._socket.sendall(_encode_command(('SELECT', self.database)))
+            self._read_reply()
+
+    def _disconnect(self):
+        if self._socket is not None:
+            try:
+                self._reader.close()
+                self._socket.close()
+            except (socket.error, IOError):
+                pass
+        self._socket = None
+        self._reader = None
+
+    def _read_reply(self):
+        """
+        Reads a reply in the Redis serialization protocol.
+        @raises RedisError if the server replied with an error or closed the connection.
+        """
+        line = self._reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise RedisError('Connection closed by the server')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest
+        if kind == b'-':
+            raise RedisReplyError(rest.decode('utf-8', 'replace'))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            return [self._read_reply() for _ in range(int(rest))]
+        raise RedisError('Unexpected reply: {!r}'.format(line))
+
+
+class RedisError(Exception):
+    """
+    An error reply from a Redis server, or a broken connection to it.
+    """
+
+
+class RedisReplyError(RedisError):
+    """
+    An error reply from a Redis server, which was reached and keeps the connection usable.
+    """
+
+
+def _encode_command(args):
+    """
+    @params args: The command name and its arguments, as str, int or bytes.
+    @return data: The command in the Redis serialization protocol.
+    """
+    parts = [b'*' + str(len(args)).encode('ascii') + b'\r\n']
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode('utf-8')
+        parts.append(b'$' + str(len(arg)).encode('ascii') + b'\r\n' + arg + b'\r\n')
+    return b''.join(parts)
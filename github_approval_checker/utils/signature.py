@@ -0,0 +1,145 @@
+"""
+Verifies GitHub webhook signatures on the raw request body, before the body is parsed or a
+handler is set up, so that unsigned or forged deliveries are rejected as cheaply as possible.
+"""
+
+import hashlib
+import hmac
+import io
+import json
+import threading
+from github_approval_checker.utils import tracing
+from github_approval_checker.utils.exceptions import SignatureError
+
+# Signature algorithms mapped to their hash constructors
+SUPPORTED_HASHES = {
+    'sha256': hashlib.sha256,
+    'sha1': hashlib.sha1
+}
+
+# Signature headers in order of preference, since GitHub sends both
+SIGNATURE_HEADERS = ('X-Hub-Signature-256', 'X-Hub-Signature')
+
+_VERIFIERS = {}
+_VERIFIERS_LOCK = threading.Lock()
+
+
+def split_signature(signature_header):
+    """
+    Takes a signature header and checks that its hash algorithm is supported.
+    @params signature_header: The signature header included with the request.
+    @raises SignatureError if the header is malformed or its algorithm is not supported.
+    @return: A tuple of the algorithm and the hex signature.
+    """
+    try:
+        algorithm, signature = signature_header.split('=')
+    except ValueError:
+        raise SignatureError('Malformed signature header. Expected format: algorithm=signature')
+    if algorithm not in SUPPORTED_HASHES:
+        raise SignatureError(
+            'Unsupported signature hash algorithm. Expected one of ' + ', '.join(sorted(SUPPORTED_HASHES))
+        )
+    return algorithm, signature
+
+
+def get_verifier(secret):
+    """
+    Returns the process-wide SignatureVerifier for a webhook secret, creating it on first use.
+    @params secret: The secret key used to sign webhook payloads.
+    @return verifier: The shared SignatureVerifier.
+    """
+    with _VERIFIERS_LOCK:
+        verifier = _VERIFIERS.get(secret)
+        if verifier is None:
+            verifier = SignatureVerifier(secret)
+            _VERIFIERS[secret] = verifier
+        return verifier
+
+
+class SignatureVerifier(object):
+    """
+    Checks request bodies against their signatures with HMACs keyed once per secret.
+    """
+
+    def __init__(self, secret):
+        """
+        @params secret: The secret key used to sign webhook payloads, or None if none is
+        configured, in which case every request is rejected.
+        """
+        self._macs = {}
+        if secret is not None:
+            key = secret if isinstance(secret, bytes) else secret.encode('utf-8')
+            self._macs = {
+                algorithm: hmac.new(key, digestmod=digest)
+                for algorithm, digest in SUPPORTED_HASHES.items()
+            }
+
+    def verify(self, algorithm, signature, body):
+        """
+        Verifies that a body matches its signature.
+        @params algorithm: One of SUPPORTED_HASHES.
+        @params signature: The hex signature sent with the body.
+        @params body: The raw body as bytes, or a memoryview of them.
+        @raises SignatureError if the signature does not match.
+        """
+        if not self._macs:
+            raise SignatureError('No webhook secret is configured.')
+        if isinstance(body, type(u'')):
+            body = body.encode('utf-8')
+        mac = self._macs[algorithm].copy()
+        mac.update(body)
+        if not hmac.compare_digest(mac.hexdigest().encode('ascii'), signature.encode('ascii', 'ignore')):
+            raise SignatureError('Computed signature does not match request signature.')
+
+    def verify_request(self, get_header, body):
+        """
+        Verifies a webhook delivery by its strongest signature header.
+        @params get_header: A callable returning a request header by name, or None if missing.
+        @params body: The raw body as bytes, or a memoryview of them.
+        @raises SignatureError if the request is not signed or the signature does not match.
+        """
+        for header in SIGNATURE_HEADERS:
+            signature_header = get_header(header)
+            if signature_header:
+                algorithm, signature = split_signature(signature_header)
+                self.verify(algorithm, signature, body)
+                return
+        raise SignatureError('Request is not signed.')
+
+
+class SignatureMiddleware(object):
+    """
+    WSGI middleware that rejects POST requests with a bad signature before they are routed, so
+    that the application never parses or validates their bodies.
+    """
+
+    def __init__(self, app, verifier):
+        """
+        @params app: The WSGI application to protect.
+        @params verifier: The SignatureVerifier to check requests with.
+        """
+        self.app = app
+        self.verifier = verifier
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') != 'POST':
+            return self.app(environ, start_response)
+
+        body = environ['wsgi.input'].read(int(environ.get('CONTENT_LENGTH') or 0))
+        try:
+            with tracing.span('verify_signature'):
+                self.verifier.verify_request(
+                    lambda name: environ.get('HTTP_' + name.upper().replace('-', '_')),
+                    body
+                )
+        except SignatureError as err:
+            response_body = json.dumps(err.response[0]).encode('utf-8')
+            start_response('400 Bad Request', [
+                ('Content-Type', 'application/json'),
+                ('Content-Length', str(len(response_body)))
+            ])
+            return [response_body]
+
+        # The body has been consumed, so hand the application a stream over the same bytes
+        environ['wsgi.input'] = io.BytesIO(body)
+        return self.app(environ, start_response)
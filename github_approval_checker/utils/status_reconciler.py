@@ -0,0 +1,71 @@
+"""
+Compares the statuses of a commit with the state the approval checker wants them in, so that
+only the contexts that actually change are written.
+"""
+
+import re
+from collections import namedtuple, OrderedDict
+
+FAILED_STATES = frozenset(['error', 'failure'])
+
+OVERRIDE_DESCRIPTION = 'Overwritten based on approval from: {} Message: {}'
+
+_OVERRIDE_PREFIX = re.compile(r'^Overwritten based on approval from: \S* Message: ')
+
+
+class StatusPlan(namedtuple('StatusPlan', 'writes skipped')):
+    """
+    The statuses of a commit split into those to overwrite and those already overwritten.
+    """
+
+    __slots__ = ()
+
+
+def original_description(description):
+    """
+    @params description: The description of a status, possibly already overwritten.
+    @return description: The description the status had before any overwrite.
+    """
+    description = description or ''
+    while True:
+        stripped = _OVERRIDE_PREFIX.sub('', description, count=1)
+        if stripped == description:
+            return description
+        description = stripped
+
+
+def override_description(reviewer, prior_description):
+    """
+    @params reviewer: The username of the reviewer the status is overwritten for.
+    @params prior_description: The description of the status being overwritten.
+    @return description: The description of the overwritten status, which quotes the original
+    description only once however often the status has been overwritten.
+    """
+    return OVERRIDE_DESCRIPTION.format(reviewer, original_description(prior_description))
+
+
+def is_override(status):
+    """
+    @params status: A status, as returned by get_statuses.
+    @return boolean: Whether the status was written by the approval checker.
+    """
+    if status['state'] != 'success':
+        return False
+    return _OVERRIDE_PREFIX.match(status.get('description') or '') is not None
+
+
+def reconcile(statuses):
+    """
+    Plans the writes that bring a commit's statuses to their target state: every failed context
+    overwritten with a success. Only the most recent status of each context is considered.
+    @params statuses: The statuses of a commit, most recent first, as returned by get_statuses.
+    @return plan: A StatusPlan of the failed statuses to write, and of the contexts skipped
+    because they are already overwritten.
+    """
+    latest = OrderedDict()
+    for status in statuses:
+        latest.setdefault(status['context'], status)
+    return StatusPlan(
+        writes=[status for status in latest.values() if status['state'] in FAILED_STATES],
+        skipped=[status for status in latest.values() if is_override(status)]
+    )
@@ -0,0 +1,230 @@
+"""
+Lightweight timing spans for the stages of processing a webhook delivery, linked by the
+delivery id and exported as one JSON line per delivery to a local trace file, and an opt-in
+cProfile hook for post-mortem analysis of hot paths.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from github_approval_checker.utils.context_local import ContextLocal
+
+logger = logging.getLogger(__name__)
+
+_ACTIVE = ContextLocal('active_trace')
+
+_SINKS = {}
+_SINKS_LOCK = threading.Lock()
+
+
+class Trace(object):
+    """
+    The spans recorded while processing a single delivery.
+    """
+
+    def __init__(self, trace_id, clock=time.time):
+        """
+        @params trace_id: The id linking the spans, usually the X-GitHub-Delivery header.
+        @params clock: A callable returning the current time in seconds.
+        """
+        self.trace_id = trace_id
+        self.clock = clock
+        self.started = clock()
+        self.finished = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add_span(self, name, started, duration, attributes):
+        """
+        Records a finished span.
+        @params name: The name of the stage.
+        @params started: The time the span started, in seconds.
+        @params duration: The seconds the span took.
+        @params attributes: A dict of details about the span.
+        """
+        record = {
+            'name': name,
+            'start_ms': round((started - self.started) * 1000, 3),
+            'duration_ms': round(duration * 1000, 3),
+            'thread': threading.current_thread().name
+        }
+        record.update(attributes)
+        with self._lock:
+            self.spans.append(record)
+
+    def to_dict(self):
+        """
+        @return trace: A JSON serializable dict of the trace and its spans, in start order.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda record: record['start_ms'])
+        return {
+            'trace_id': self.trace_id,
+            'start': self.started,
+            'duration_ms': round(((self.finished or self.clock()) - self.started) * 1000, 3),
+            'spans': spans
+        }
+
+
+class FileTraceSink(object):
+    """
+    Appends each finished trace to a file as a single JSON line.
+    """
+
+    def __init__(self, path):
+        """
+        @params path: The path of the trace file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        """
+        Writes a trace to the file, logging rather than raising when the file cannot be written.
+        @params trace: The finished Trace.
+        """
+        line = json.dumps(trace.to_dict(), separators=(',', ':'))
+        try:
+            with self._lock:
+                with open(self.path, 'a') as trace_file:
+                    trace_file.write(line + '\n')
+        except (IOError, OSError) as err:
+            logger.error('Unable to write trace %s to %s: %s', trace.trace_id, self.path, err)
+
+
+def get_shared_sink(path):
+    """
+    Returns the process-wide FileTraceSink for a path, creating it on first use.
+    @params path: The path of the trace file.
+    @return sink: The shared FileTraceSink.
+    """
+    with _SINKS_LOCK:
+        sink = _SINKS.get(path)
+        if sink is None:
+            sink = _SINKS[path] = FileTraceSink(path)
+        return sink
+
+
+def current_trace():
+    """
+    @return trace: The Trace of the current context, or None if it is not traced.
+    """
+    return _ACTIVE.get()
+
+
+@contextmanager
+def start_trace(trace_id, sink, clock=time.time):
+    """
+    Traces the stages run in the current context, and in the worker threads handed work from it,
+    exporting the trace to the sink at the end.
+    @params trace_id: The id linking the spans, usually the X-GitHub-Delivery header.
+    @params sink: The FileTraceSink to export to, or None to trace nothing.
+    @params clock: A callable returning the current time in seconds.
+    @return: A context manager yielding the Trace, or None if nothing is traced.
+    """
+    if sink is None:
+        yield None
+        return
+    trace = Trace(trace_id, clock)
+    previous = _ACTIVE.get()
+    _ACTIVE.set(trace)
+    try:
+        yield trace
+    finally:
+        _ACTIVE.set(previous)
+        trace.finished = trace.clock()
+        sink.export(trace)
+
+
+def add_span(name, started, duration, **attributes):
+    """
+    Records an already timed stage in the current trace, if the context is traced.
+    @params name: The name of the stage.
+    @params started: The time the stage started, in seconds.
+    @params duration: The seconds the stage took.
+    @params attributes: Details about the span, which must be JSON serializable.
+    """
+    trace = _ACTIVE.get()
+    if trace is not None:
+        trace.add_span(name, started, duration, attributes)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Times a stage of the current trace. Costs a single lookup when the context is not traced.
+    @params name: The name of the stage.
+    @params attributes: Details about the span, which must be JSON serializable.
+    @return: A context manager yielding a dict that further attributes can be added to.
+    """
+    trace = _ACTIVE.get()
+    if trace is None:
+        yield attributes
+        return
+    started = trace.clock()
+    try:
+        yield attributes
+    finally:
+        trace.add_span(name, started, trace.clock() - started, attributes)
+
+
+def should_profile(sample_rate, rng=random.random):
+    """
+    @params sample_rate: The fraction of deliveries to profile, between 0 and 1.
+    @params rng: A callable returning a random float in [0, 1).
+    @return boolean: Whether to profile the current delivery.
+    """
+    return sample_rate >= 1 or (sample_rate > 0 and rng() < sample_rate)
+
+
+@contextmanager
+def profiled(trace_id, directory):
+    """
+    Profiles the current thread with cProfile and writes its stats to a file, which tools such as
+    snakeviz or flameprof can render as a flame graph.
+    @params trace_id: The id the stats file is named after.
+    @params directory: The directory to write the stats file to.
+    @return: A context manager yielding the path of the stats file.
+    """
+    import cProfile
+    path = os.path.join(directory, 'github_approval_checker-{}-{}.prof'.format(
+        int(time.time() * 1000), ''.join(char for char in str(trace_id) if char.isalnum() or char == '-')
+    ))
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield path
+    finally:
+        profiler.disable()
+        try:
+            profiler.dump_stats(path)
+            logger.info('Profile of %s written to %s', trace_id, path)
+        except (IOError, OSError) as err:
+            logger.error('Unable to write profile of %s to %s: %s', trace_id, path, err)
+
+
+class TracingMiddleware(object):
+    """
+    WSGI middleware that traces each request from its arrival, linked by its X-GitHub-Delivery
+    header, so that the signature check and the application's stages share one trace.
+    """
+
+    def __init__(self, app, observe):
+        """
+        @params app: The WSGI application to trace.
+        @params observe: A callable taking the delivery id and returning the context manager
+        that traces, and possibly profiles, the request.
+        """
+        self.app = app
+        self.observe = observe
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') != 'POST':
+            return self.app(environ, start_response)
+        with self.observe(environ.get('HTTP_X_GITHUB_DELIVERY')):
+            # Read the whole response inside the trace, the webhook's responses are small
+            return list(self.app(environ, start_response))
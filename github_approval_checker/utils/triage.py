@@ -0,0 +1,50 @@
+"""
+Drops review events that can never lead to a status being overwritten, using only the payload,
+before any GitHub API call is made for them.
+"""
+
+import threading
+from collections import Counter
+
+# Reasons an event is dropped, mapped to the message returned for it
+DROP_MESSAGES = {
+    'action': 'Review action is not submitted',
+    'state': 'Review state is not approved',
+    'closed': 'Pull request is not open',
+    'stale_commit': 'Review is not for the head commit of the pull request'
+}
+
+_DROPPED = Counter()
+_DROPPED_LOCK = threading.Lock()
+
+
+def triage(data):
+    """
+    Decides whether a PullRequestReview event is worth processing.
+    @params data: The PullRequestReview event payload.
+    @return reason: The key in DROP_MESSAGES the event should be dropped for, or None if it
+    should be processed.
+    """
+    review = data['review']
+    pull_request = data.get('pull_request') or {}
+    if data.get('action', 'submitted') != 'submitted':
+        reason = 'action'
+    elif review['state'] != 'approved':
+        reason = 'state'
+    elif pull_request.get('state', 'open') != 'open':
+        reason = 'closed'
+    elif pull_request.get('head', {}).get('sha', review['commit_id']) != review['commit_id']:
+        reason = 'stale_commit'
+    else:
+        return None
+    with _DROPPED_LOCK:
+        _DROPPED[reason] += 1
+    return reason
+
+
+def dropped_counts():
+    """
+    @return counts: A dict of how many events were dropped for each reason by this process.
+    """
+    with _DROPPED_LOCK:
+        return dict(_DROPPED)
@@ -2,14 +2,10 @@
 Defines utility methods utilized by the API endpoints.
 """
 
-import hashlib
-import hmac
-import jsonschema
-from jsonschema import validate
-from github_approval_checker.utils.exceptions import ConfigError, SignatureError
+from github_approval_checker.utils.exceptions import ConfigError
+from github_approval_checker.utils.signature import SignatureVerifier, split_signature
 
 STATUS_OK = {'status': 'OK'}, 200
-SUPPORTED_HASH = 'sha1'
 
 CONFIG_SCHEMA = {
     'type': 'object',
@@ -45,9 +41,11 @@ def validate_config(config):
     @params config: YAML configuration to check.
     @raises ConfigError if validation of the configuration fails.
     """
+    # jsonschema is slow to import, so only load it once a configuration needs validating
+    from jsonschema import validate, ValidationError
     try:
         validate(config, CONFIG_SCHEMA)
-    except jsonschema.exceptions.ValidationError as validated_error:
+    except ValidationError as validated_error:
         raise ConfigError(
             'Config Validation Error: ' + str(validated_error),
             ({'status': 'Config Validation Error', 'message': str(validated_error)}, 500)
@@ -60,23 +58,16 @@ def parse_signature(signature_header):
     algorithm is supported.
     @param signature_header The signature header included with the request.
     """
-    try:
-        algo, signature = signature_header.split("=")
-    except ValueError:
-        raise SignatureError('Malformed signature header. Expected format: algorithm=signature')
-    if algo != SUPPORTED_HASH:
-        raise SignatureError('Unsupported signature hash algorithm. Expected ' + SUPPORTED_HASH)
-    return signature
+    return split_signature(signature_header)[1]
 
 
-def verify_signature(request_body, signature, hmac_key):
+def verify_signature(request_body, signature, hmac_key, algorithm='sha1'):
     """
     Verifies that a request body matches its accompanying signature computed with
     the configured hashing algorithm.
     @param request_body The body of the request to validate.
     @param signature    The value of the signature included with the header.
     @param hmac_key     The secret key used to compute the signature.
+    @param algorithm    The hashing algorithm the signature was computed with.
     """
-    computed = hmac.new(hmac_key, request_body, hashlib.sha1)
-    if not hmac.compare_digest(computed.hexdigest(), signature.encode('ascii', 'ignore')):
-        raise SignatureError('Computed signature does not match request signature.')
+    SignatureVerifier(hmac_key).verify(algorithm, signature, request_body)
@@ -0,0 +1,166 @@
+"""
+A durable local work queue backed by SQLite, standing in for a cloud queue so that webhook
+deliveries can be acknowledged at once and processed afterwards.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Seconds a claimed item is hidden from other workers before it is handed out again
+DEFAULT_VISIBILITY_TIMEOUT = 300
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS work_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    dead INTEGER NOT NULL DEFAULT 0
+)
+'''
+
+_QUEUES = {}
+_QUEUES_LOCK = threading.Lock()
+
+
+def get_shared_queue(path):
+    """
+    Returns the process-wide WorkQueue for a database file, creating it on first use.
+    @params path: The path of the SQLite database file.
+    @return queue: The shared WorkQueue.
+    """
+    with _QUEUES_LOCK:
+        queue = _QUEUES.get(path)
+        if queue is None:
+            queue = WorkQueue(path)
+            _QUEUES[path] = queue
+        return queue
+
+
+class WorkItem(object):
+    """
+    An item claimed from a WorkQueue.
+    """
+
+    __slots__ = ('item_id', 'payload', 'enqueued_at', 'attempts')
+
+    def __init__(self, item_id, payload, enqueued_at, attempts):
+        self.item_id = item_id
+        self.payload = payload
+        self.enqueued_at = enqueued_at
+        self.attempts = attempts
+
+
+class WorkQueue(object):
+    """
+    A queue of JSON payloads with at-least-once delivery. Claimed items are leased to a worker,
+    and are handed out again if they are not acknowledged before the lease runs out.
+    """
+
+    def __init__(self, path, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT, clock=time.time):
+        """
+        @params path: The path of the SQLite database file, or ':memory:'.
+        @params max_attempts: The number of times an item is tried before it is marked dead.
+        @params visibility_timeout: Seconds a claimed item is leased to its worker.
+        @params clock: A callable returning the current time in seconds.
+        """
+        self.max_attempts = max_attempts
+        self.visibility_timeout = visibility_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._connection.execute(_SCHEMA)
+
+    def put(self, payload):
+        """
+        Adds a payload to the queue.
+        @params payload: A JSON serializable payload.
+        @return item_id: The id of the new item.
+        """
+        now = self.clock()
+        with self._lock:
+            cursor = self._connection.execute(
+                'INSERT INTO work_items (payload, enqueued_at, available_at) VALUES (?, ?, ?)',
+                (json.dumps(payload), now, now)
+            )
+            return cursor.lastrowid
+
+    def claim(self):
+        """
+        Leases the oldest available item.
+        @return item: The claimed WorkItem, or None if no item is available.
+        """
+        now = self.clock()
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._connection.execute(
+                    'SELECT id, payload, enqueued_at, attempts FROM work_items '
+                    'WHERE dead = 0 AND available_at <= ? ORDER BY available_at, id LIMIT 1',
+                    (now,)
+                ).fetchone()
+                if row is not None:
+                    self._connection.execute(
+                        'UPDATE work_items SET available_at = ?, attempts = attempts + 1 WHERE id = ?',
+                        (now + self.visibility_timeout, row[0])
+                    )
+                self._connection.execute('COMMIT')
+            except Exception:
+                self._connection.execute('ROLLBACK')
+                raise
+        if row is None:
+            return None
+        return WorkItem(row[0], json.loads(row[1]), row[2], row[3] + 1)
+
+    def ack(self, item):
+        """
+        Removes a processed item from the queue.
+        @params item: The WorkItem claimed.
+        """
+        with self._lock:
+            self._connection.execute('DELETE FROM work_items WHERE id = ?', (item.item_id,))
+
+    def retry(self, item, delay):
+        """
+        Makes a failed item available again after a delay, or marks it dead once it has used
+        every attempt.
+        @params item: The WorkItem claimed.
+        @params delay: Seconds before the item is handed out again.
+        @return boolean: True if the item will be retried, False if it is now dead.
+        """
+        retrying = item.attempts < self.max_attempts
+        with self._lock:
+            if retrying:
+                self._connection.execute(
+                    'UPDATE work_items SET available_at = ? WHERE id = ?',
+                    (self.clock() + delay, item.item_id)
+                )
+            else:
+                self._connection.execute('UPDATE work_items SET dead = 1 WHERE id = ?', (item.item_id,))
+        return retrying
+
+    def stats(self):
+        """
+        @return metrics: A dict of the items not yet processed ('depth'), those of them that can be
+        claimed right now ('available'), the items given up on ('dead'), and the age in seconds of
+        the oldest unprocessed item ('oldest_age').
+        """
+        now = self.clock()
+        with self._lock:
+            depth, available, dead, oldest = self._connection.execute(
+                'SELECT COALESCE(SUM(dead = 0), 0), COALESCE(SUM(dead = 0 AND available_at <= ?), 0), '
+                'COALESCE(SUM(dead = 1), 0), MIN(CASE WHEN dead = 0 THEN enqueued_at END) FROM work_items',
+                (now,)
+            ).fetchone()
+        return {
+            'depth': depth,
+            'available': available,
+            'dead': dead,
+            'oldest_age': now - oldest if oldest is not None else 0
+        }
@@ -63,5 +63,8 @@ setup(
     include_package_data=True,
     zip_safe=False,
     install_requires=get_requirements(),
+    extras_require={
+        'async': ['aiohttp>=3.0'],
+    },
     test_suite='nose.collector',
 )
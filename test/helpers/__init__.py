@@ -1,3 +1,109 @@
 """
 Helper functions for tests
 """
+
+import threading
+import time
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+
+class GithubResponse(object):
+    '''
+    Mock object for Github API Responses.
+    '''
+    def __init__(self, data=None, status_code=999, headers=None):
+        '''
+        Create a mock response with the given json and statuscode.
+        '''
+        self.data = data
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        '''
+        Get the fake json response
+        '''
+        return self.data
+
+    def raise_for_status(self):
+        '''
+        Fake stand in method
+        '''
+        pass
+
+
+class FakeRedisServer(object):
+    '''
+    A local stand-in for a Redis server, speaking enough of its protocol for the GET, SET, DEL,
+    AUTH and SELECT commands.
+    '''
+    def __init__(self):
+        '''
+        Starts serving on a free port of localhost.
+        '''
+        self.values = {}
+        self.commands = []
+        store = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            '''
+            Answers the commands of a single connection.
+            '''
+            def handle(self):
+                while True:
+                    command = self.read_command()
+                    if command is None:
+                        return
+                    store.commands.append(command)
+                    self.wfile.write(store.execute(command))
+
+            def read_command(self):
+                '''
+                Reads a command sent as an array of bulk strings.
+                '''
+                line = self.rfile.readline()
+                if not line:
+                    return None
+                args = []
+                for _ in range(int(line[1:])):
+                    length = int(self.rfile.readline()[1:])
+                    args.append(self.rfile.read(length + 2)[:-2])
+                return args
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = 'redis://127.0.0.1:{}/1'.format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def execute(self, command):
+        '''
+        @return reply: The encoded reply to a command.
+        '''
+        name = command[0].upper()
+        if name == b'GET':
+            value, expires_at = self.values.get(command[1], (None, 0))
+            if value is None or expires_at <= time.time():
+                return b'$-1\r\n'
+            return b'$' + str(len(value)).encode('ascii') + b'\r\n' + value + b'\r\n'
+        if name == b'SET':
+            self.values[command[1]] = (command[2], time.time() + int(command[4]) / 1000.0)
+            return b'+OK\r\n'
+        if name == b'DEL':
+            removed = sum(self.values.pop(key, None) is not None for key in command[1:])
+            return b':' + str(removed).encode('ascii') + b'\r\n'
+        if name in (b'AUTH', b'SELECT'):
+            return b'+OK\r\n'
+        return b'-ERR unknown command\r\n'
+
+    def close(self):
+        '''
+        Stops serving.
+        '''
+        self.server.shutdown()
+        self.server.server_close()
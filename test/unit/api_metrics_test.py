@@ -0,0 +1,86 @@
+"""
+Unit tests for api_metrics.py
+"""
+
+import json
+import unittest
+from mock import patch
+from github_approval_checker.api.review_processor import ReviewEvent
+from github_approval_checker.utils import api_metrics
+from github_approval_checker.utils.api_metrics import ApiMetrics
+from github_approval_checker.utils.concurrency import WorkerPool
+
+STATUS_URL = "https://api.github.com/repos/owner/repo/commits/sha/status?per_page=100"
+
+
+class ApiMetricsUnitTests(unittest.TestCase):
+    """
+    Test api_metrics.py
+    """
+
+    def test_endpoint_name(self):
+        """
+        Test api_metrics.endpoint_name names the handler endpoint of a url
+        """
+        self.assertEqual(api_metrics.endpoint_name(STATUS_URL), "get_statuses")
+        self.assertEqual(
+            api_metrics.endpoint_name("https://api.github.com/orgs/org/teams/core/memberships/user"),
+            "is_user_on_org_team"
+        )
+        self.assertEqual(
+            api_metrics.endpoint_name("https://api.github.com/orgs/org/teams"), "get_organization_teams"
+        )
+        self.assertEqual(api_metrics.endpoint_name("https://api.github.com/rate_limit"), "other")
+
+    def test_record(self):
+        """
+        Test api_metrics.record counts calls, errors, bytes and latency buckets
+        """
+        handler_metrics = ApiMetrics()
+
+        api_metrics.record(handler_metrics, STATUS_URL, 200, 0.03, 100)
+        api_metrics.record(handler_metrics, STATUS_URL, 502, 6, 10)
+        api_metrics.record(handler_metrics, STATUS_URL, None, 0.001, 0)
+
+        stats = handler_metrics.snapshot()["get_statuses"]
+        self.assertEqual((stats["calls"], stats["errors"], stats["bytes"]), (3, 2, 110))
+        self.assertEqual(stats["status_codes"], {"200": 1, "502": 1, "None": 1})
+        self.assertEqual(
+            (stats["latency_histogram"]["le_25"], stats["latency_histogram"]["le_50"],
+             stats["latency_histogram"]["le_inf"]),
+            (1, 1, 1)
+        )
+
+    def test_recording(self):
+        """
+        Test api_metrics.recording also records calls made from worker threads
+        """
+        handler_metrics = ApiMetrics()
+        recorder = ApiMetrics()
+
+        with api_metrics.recording(recorder):
+            WorkerPool(4).map(lambda _: api_metrics.record(handler_metrics, STATUS_URL, 200, 0.01, 1), [1, 2])
+        api_metrics.record(handler_metrics, STATUS_URL, 200, 0.01, 1)
+
+        self.assertEqual(recorder.totals()["calls"], 2)
+        self.assertEqual(handler_metrics.totals()["calls"], 3)
+
+    @patch("github_approval_checker.utils.api_metrics.summary_logger")
+    def test_log_summary(self, summary_logger):
+        """
+        Test api_metrics.log_summary writes a single EMF line for a review
+        """
+        recorder = ApiMetrics()
+        recorder.record("get_statuses", 200, 0.02, 50)
+        event = ReviewEvent("repo", "owner", "owner/repo", "reviewer", "approved", "sha")
+
+        api_metrics.log_summary(recorder, event, ({"status": "OK"}, 200))
+
+        line = summary_logger.info.call_args[0][0]
+        self.assertNotIn("\n", line)
+        summary = json.loads(line)
+        self.assertEqual(summary["_aws"]["CloudWatchMetrics"][0]["Namespace"], "GithubApprovalChecker")
+        self.assertEqual(
+            (summary["GitHubCalls"], summary["GitHubBytes"], summary["status_code"]), (1, 50, 200)
+        )
+        self.assertEqual(summary["endpoints"]["get_statuses"]["calls"], 1)
@@ -0,0 +1,213 @@
+"""
+Unit tests for async_github_handler.py and async_review_processor.py
+"""
+
+import asyncio
+import json
+import unittest
+from github_approval_checker.api.async_review_processor import process_review_async
+from github_approval_checker.utils.async_github_handler import AsyncGithubHandler
+from github_approval_checker.utils.exceptions import APIError
+
+
+class FakeResponse(object):
+    """
+    Stands in for an aiohttp response.
+    """
+    def __init__(self, data=None, status=200, headers=None):
+        self.status = status
+        self.headers = headers or {}
+        self.data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def text(self):
+        """
+        Fake body of the response
+        """
+        return json.dumps(self.data) if self.data is not None else ''
+
+
+class FakeSession(object):
+    """
+    Stands in for an aiohttp.ClientSession, answering requests by url. A url can be given a list
+    of responses to answer in turn, and an exception to raise instead of a response.
+    """
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        """
+        Records the request and returns the response configured for its url.
+        """
+        self.requests.append((method, url, kwargs))
+        response = self.responses[url]
+        if isinstance(response, list):
+            response = response.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def run(coroutine):
+    """
+    Runs a coroutine to completion on a new event loop.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class AsyncGithubHandlerUnitTests(unittest.TestCase):
+    """
+    Test async_github_handler.AsyncGithubHandler
+    """
+
+    def test_get_statuses(self):
+        """
+        Test async_github_handler.AsyncGithubHandler.get_statuses
+        """
+        session = FakeSession({
+            "https://api.github.com/repos/repo-name/commits/ref-name/status": FakeResponse(
+                {"statuses": ["fake-status"]}
+            )
+        })
+        handler = AsyncGithubHandler("username", "password", session=session)
+
+        self.assertEqual(run(handler.get_statuses("repo-name", "ref-name")), ["fake-status"])
+        self.assertEqual(handler.request_count, 1)
+
+    def test_get_organization_teams(self):
+        """
+        Test async_github_handler.AsyncGithubHandler.get_organization_teams follows next links
+        """
+        session = FakeSession({
+            "https://api.github.com/orgs/org-name/teams": FakeResponse(
+                ["1", "2"], headers={"link": '<https://fake.example.com>; rel="next"'}
+            ),
+            "https://fake.example.com": FakeResponse(["3"])
+        })
+        handler = AsyncGithubHandler("username", "password", session=session)
+
+        self.assertEqual(run(handler.get_organization_teams("org-name")), ["1", "2", "3"])
+
+    def test_get_config(self):
+        """
+        Test async_github_handler.AsyncGithubHandler.get_config caches configs and missing files
+        """
+        session = FakeSession({
+            "https://api.github.com/repos/repo-name/contents/config-filename": FakeResponse(
+                {"content": "a2V5OiB2YWx1ZQ=="}
+            ),
+            "https://api.github.com/repos/repo-name/contents/missing": FakeResponse(status=404)
+        })
+        handler = AsyncGithubHandler("username", "password", session=session)
+
+        self.assertEqual(run(handler.get_config("repo-name", "config-filename")), {"key": "value"})
+        self.assertEqual(run(handler.get_config("repo-name", "config-filename")), {"key": "value"})
+        self.assertRaises(APIError, run, handler.get_config("repo-name", "missing"))
+        self.assertRaises(APIError, run, handler.get_config("repo-name", "missing"))
+        self.assertEqual(len(session.requests), 2)
+
+    def test_get_config_case_insensitive(self):
+        """
+        Test async_github_handler.AsyncGithubHandler.get_config shares a config between the cases of
+        a repository name, and forgets it when it is invalidated
+        """
+        session = FakeSession({
+            "https://api.github.com/repos/Repo-Owner/Repo-Name/contents/config-filename": FakeResponse(
+                {"content": "a2V5OiB2YWx1ZQ=="}
+            )
+        })
+        handler = AsyncGithubHandler("username", "password", session=session)
+
+        run(handler.get_config("Repo-Owner/Repo-Name", "config-filename"))
+        self.assertEqual(run(handler.get_config("repo-owner/repo-name", "config-filename")), {"key": "value"})
+        self.assertEqual(handler.invalidate_config("repo-owner/repo-name", ["config-filename"]), 1)
+        self.assertEqual(len(session.requests), 1)
+
+    def test_post_statuses(self):
+        """
+        Test async_github_handler.AsyncGithubHandler.post_statuses reports request errors as failed
+        statuses and raises anything else
+        """
+        url = "https://api.github.com/repos/repo-name/statuses/ref-name"
+        statuses = [
+            {"context": context, "target_url": "url", "description": "desc"} for context in ("ci", "lint")
+        ]
+        session = FakeSession({url: [FakeResponse(status=201), asyncio.TimeoutError(), ValueError("bug")]})
+        handler = AsyncGithubHandler("username", "password", session=session)
+
+        results = run(handler.post_statuses("repo-name", "ref-name", statuses, "reviewer"))
+
+        self.assertEqual(results, {"ci": 201, "lint": None})
+        with self.assertRaises(ValueError):
+            run(handler.post_statuses("repo-name", "ref-name", statuses[:1], "reviewer"))
+
+    def test_is_authorized_admin(self):
+        """
+        Test async_github_handler.AsyncGithubHandler.is_authorized with an authorized admin
+        """
+        session = FakeSession({
+            "https://api.github.com/repos/repo-owner/repo-name/collaborators/user-name/permission":
+                FakeResponse({"permission": "admin"}),
+            "https://api.github.com/orgs/repo-owner/teams/team-name/memberships/user-name":
+                FakeResponse(status=404)
+        })
+        handler = AsyncGithubHandler("username", "password", session=session)
+
+        self.assertTrue(run(handler.is_authorized(
+            "user-name", "repo-owner", "repo-name", {"teams": ["team-name"], "admins": True}
+        )))
+
+
+class ProcessReviewAsyncUnitTests(unittest.TestCase):
+    """
+    Test async_review_processor.process_review_async
+    """
+
+    def test_process_review_async(self):
+        """
+        Test async_review_processor.process_review_async overwrites failed statuses for an authorized user
+        """
+        session = FakeSession({
+            "https://api.github.com/repos/repo-owner/repo-name/contents/config-filename": FakeResponse(
+                {"content": "dXNlcnM6IFtyZXZpZXctdXNlci1sb2dpbl0="}
+            ),
+            "https://api.github.com/repos/repo-owner/repo-name/commits/review-commit-id/status": FakeResponse(
+                {"statuses": [
+                    {"state": "failure", "context": "context1", "target_url": "url", "description": "desc"},
+                    {"state": "success", "context": "context2", "target_url": "url", "description": "desc"}
+                ]}
+            ),
+            "https://api.github.com/repos/repo-owner/repo-name/statuses/review-commit-id": FakeResponse(
+                status=201
+            )
+        })
+        handler = AsyncGithubHandler("username", "password", session=session)
+        data = {
+            "repository": {
+                "name": "repo-name",
+                "full_name": "repo-owner/repo-name",
+                "owner": {"login": "repo-owner"}
+            },
+            "review": {
+                "state": "approved",
+                "commit_id": "review-commit-id",
+                "user": {"login": "review-user-login"}
+            }
+        }
+
+        response = run(process_review_async(handler, data, "config-filename"))
+
+        self.assertEqual(response, ({'status': 'OK', 'overwritten_contexts': ['context1']}, 200))
+        self.assertEqual(session.requests[-1][0], "POST")
+        self.assertEqual(json.loads(session.requests[-1][2]["data"])["context"], "context1")
+        self.assertEqual(handler.request_count, 3)
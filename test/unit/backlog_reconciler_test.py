@@ -0,0 +1,220 @@
+"""
+Unit tests for backlog_reconciler.py
+"""
+
+import unittest
+from mock import MagicMock, patch
+from github_approval_checker.api import backlog_reconciler
+from github_approval_checker.api.backlog_reconciler import BacklogReconciler, Checkpoint, approved_reviewers
+from github_approval_checker.utils.exceptions import APIError, RateLimitError
+from github_approval_checker.utils.rate_limit import PRIORITY_OPTIONAL, RateLimitTracker
+
+
+def review(login, state, commit_id='head'):
+    """
+    Builds a review as listed by the GitHub API.
+    """
+    return {'user': {'login': login}, 'state': state, 'commit_id': commit_id}
+
+
+def pull(number, head_sha='head'):
+    """
+    Builds a pull request as listed by the GitHub API.
+    """
+    return {'number': number, 'head': {'sha': head_sha}}
+
+
+class ApprovedReviewersUnitTests(unittest.TestCase):
+    """
+    Test backlog_reconciler.approved_reviewers
+    """
+
+    def test_approved_reviewers(self):
+        """
+        Test backlog_reconciler.approved_reviewers keeps reviewers whose latest verdict approves
+        """
+        reviews = [
+            review('alice', 'APPROVED'),
+            review('bob', 'APPROVED'),
+            review('bob', 'CHANGES_REQUESTED'),
+            review('carol', 'APPROVED', 'old'),
+            review('dave', 'CHANGES_REQUESTED'),
+            review('dave', 'APPROVED'),
+            review('alice', 'COMMENTED'),
+            review('erin', 'DISMISSED'),
+            {'user': None, 'state': 'APPROVED', 'commit_id': 'head'}
+        ]
+
+        self.assertEqual(approved_reviewers(reviews, 'head'), ['alice', 'dave'])
+
+
+class CheckpointUnitTests(unittest.TestCase):
+    """
+    Test backlog_reconciler.Checkpoint
+    """
+
+    def test_record(self):
+        """
+        Test backlog_reconciler.Checkpoint remembers pull requests by their head commit
+        """
+        checkpoint = Checkpoint(':memory:')
+        checkpoint.record('org/repo', 1, 'head', 200)
+
+        self.assertTrue(checkpoint.done('org/repo', 1, 'head'))
+        self.assertFalse(checkpoint.done('org/repo', 1, 'pushed'))
+        self.assertFalse(checkpoint.done('org/other', 1, 'head'))
+
+
+class BacklogReconcilerUnitTests(unittest.TestCase):
+    """
+    Test backlog_reconciler.BacklogReconciler
+    """
+
+    def setUp(self):
+        self.handler = MagicMock()
+        self.handler.rate_limit = RateLimitTracker(clock=lambda: 1000)
+        self.handler.get_open_pulls.return_value = iter([pull(1), pull(2)])
+        self.handler.get_pull_reviews.side_effect = lambda repo, number, priority: (
+            [review('alice', 'APPROVED')] if number == 1 else []
+        )
+        self.checkpoint = Checkpoint(':memory:')
+        self.reconciler = BacklogReconciler(
+            self.handler, 'config.yml', self.checkpoint, workers=1, reserve=10
+        )
+
+    @patch('github_approval_checker.api.review_processor.process_reviews')
+    def test_run(self, process_reviews):
+        """
+        Test backlog_reconciler.BacklogReconciler.run processes approved pull requests and records them
+        """
+        process_reviews.return_value = ({'status': 'OK'}, 200)
+
+        counts = self.reconciler.run(['org/repo'])
+
+        events = process_reviews.call_args[0][1]
+        self.assertEqual([(event.repo_full_name, event.reviewer, event.commit_id) for event in events],
+                         [('org/repo', 'alice', 'head')])
+        self.assertEqual((counts['pulls'], counts['reconciled'], counts['unapproved']), (2, 1, 1))
+        self.handler.get_open_pulls.assert_called_once_with('org/repo', PRIORITY_OPTIONAL)
+        self.assertTrue(self.checkpoint.done('org/repo', 1, 'head'))
+        self.assertTrue(self.checkpoint.done('org/repo', 2, 'head'))
+
+    @patch('github_approval_checker.api.review_processor.process_reviews')
+    def test_resume(self, process_reviews):
+        """
+        Test backlog_reconciler.BacklogReconciler.run skips pull requests finished at their head
+        """
+        self.checkpoint.record('org/repo', 1, 'head', 200)
+        self.checkpoint.record('org/repo', 2, 'old')
+
+        counts = self.reconciler.run(['org/repo'])
+
+        process_reviews.assert_not_called()
+        self.handler.get_pull_reviews.assert_called_once_with('org/repo', 2, PRIORITY_OPTIONAL)
+        self.assertEqual((counts['checkpointed'], counts['unapproved']), (1, 1))
+
+    @patch('github_approval_checker.api.review_processor.process_reviews')
+    def test_failures(self, process_reviews):
+        """
+        Test backlog_reconciler.BacklogReconciler.run leaves failed and deferred pull requests to a rerun
+        """
+        self.handler.get_open_pulls.return_value = iter([pull(1), pull(3), pull(5)])
+        self.handler.get_pull_reviews.side_effect = None
+        self.handler.get_pull_reviews.return_value = [review('alice', 'APPROVED')]
+        process_reviews.side_effect = [
+            ({'status': 'OK', 'failed_contexts': ['ci']}, 200),
+            ({'status': 'Rate Limited'}, 503),
+            Exception('boom')
+        ]
+
+        counts = self.reconciler.run(['org/repo'])
+
+        self.assertEqual((counts['failed'], counts['deferred'], counts['reconciled']), (2, 1, 0))
+        self.assertFalse(any(self.checkpoint.done('org/repo', number, 'head') for number in (1, 3, 5)))
+
+    def test_unconfigured(self):
+        """
+        Test backlog_reconciler.BacklogReconciler.run skips repositories without a configuration file
+        """
+        self.handler.get_config.side_effect = APIError('404 Not Found')
+
+        counts = self.reconciler.run(['org/repo'])
+
+        self.assertEqual(counts['unconfigured'], 1)
+        self.handler.get_open_pulls.assert_not_called()
+
+    @patch('github_approval_checker.api.review_processor.process_reviews')
+    def test_reserve(self, process_reviews):
+        """
+        Test backlog_reconciler.BacklogReconciler.run stops once the budget is down to the reserve
+        """
+        self.handler.rate_limit.update({'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '10',
+                                        'X-RateLimit-Reset': '2000'})
+
+        counts = self.reconciler.run(['org/repo', 'org/other'])
+
+        self.assertEqual((counts['repositories'], counts['deferred']), (0, 2))
+        self.handler.get_config.assert_not_called()
+        process_reviews.assert_not_called()
+
+    def test_failed_listing(self):
+        """
+        Test backlog_reconciler.BacklogReconciler.run counts a repository whose pull requests cannot be
+        listed as failed
+        """
+        self.handler.get_open_pulls.side_effect = APIError('502 Bad Gateway')
+
+        counts = self.reconciler.run(['org/repo'])
+
+        self.assertEqual((counts['failed'], counts['unconfigured']), (1, 0))
+
+    def test_deferred_listing(self):
+        """
+        Test backlog_reconciler.BacklogReconciler.run defers a repository when rate limited
+        """
+        self.handler.get_open_pulls.side_effect = RateLimitError('exhausted')
+
+        counts = self.reconciler.run(['org/repo'])
+
+        self.assertEqual(counts['deferred'], 1)
+
+    def test_repositories(self):
+        """
+        Test backlog_reconciler.BacklogReconciler.repositories lists unarchived repositories
+        """
+        self.handler.get_org_repositories.return_value = iter([
+            {'full_name': 'org/repo'},
+            {'full_name': 'org/old', 'archived': True},
+            {'full_name': 'org/extra'}
+        ])
+
+        names = self.reconciler.repositories(['org'], ['org/extra'])
+
+        self.assertEqual(names, ['org/extra', 'org/repo'])
+        self.handler.get_org_repositories.assert_called_once_with('org', PRIORITY_OPTIONAL)
+
+
+class MainUnitTests(unittest.TestCase):
+    """
+    Test backlog_reconciler.main
+    """
+
+    def test_requires_targets(self):
+        """
+        Test backlog_reconciler.main requires an organization or a repository
+        """
+        with patch('sys.stderr'):
+            with self.assertRaises(SystemExit):
+                backlog_reconciler.main([])
+
+    @patch('github_approval_checker.utils.logging_config.configure_logging')
+    @patch('github_approval_checker.api.settings.get_api_handler')
+    @patch.object(BacklogReconciler, 'run')
+    def test_main(self, run, get_api_handler, configure_logging):  # pylint: disable=unused-argument
+        """
+        Test backlog_reconciler.main exits non-zero when pull requests are left to a rerun
+        """
+        run.return_value = {'failed': 0, 'deferred': 2}
+
+        self.assertEqual(backlog_reconciler.main(['--repo', 'org/repo', '--checkpoint', ':memory:']), 1)
+        run.assert_called_once_with(['org/repo'])
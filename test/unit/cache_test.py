@@ -0,0 +1,164 @@
+"""
+Unit tests for cache.py
+"""
+
+import unittest
+from github_approval_checker.utils.cache import TTLCache
+from github_approval_checker.utils.shared_cache import MemoryBackend
+
+
+class FakeClock(object):
+    """
+    A clock that only moves when told to.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class UnreachableBackend(MemoryBackend):
+    """
+    A backend that fails every read while it is down, and recovers on the first read after.
+    """
+    down = False
+
+    def get(self, key):
+        if self.down:
+            self._error(IOError("unreachable"))
+            return None
+        self._failures = 0
+        return super(UnreachableBackend, self).get(key)
+
+
+class TTLCacheUnitTests(unittest.TestCase):
+    """
+    Test cache.TTLCache
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_get_fresh(self):
+        """
+        Test cache.TTLCache.get_fresh only returns unexpired entries
+        """
+        cache = TTLCache(clock=self.clock)
+        cache.set("key", "value", 10)
+
+        self.assertEqual(cache.get_fresh("key").value, "value")
+        self.clock.now += 11
+        self.assertIsNone(cache.get_fresh("key"))
+        self.assertEqual(cache.get("key").value, "value")
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_refresh(self):
+        """
+        Test cache.TTLCache.refresh makes a stale entry fresh again
+        """
+        cache = TTLCache(clock=self.clock)
+        cache.set("key", "value", 10, etag="etag")
+        self.clock.now += 11
+
+        entry = cache.refresh("key", 10)
+
+        self.assertEqual(entry.etag, "etag")
+        self.assertTrue(entry.is_fresh(self.clock()))
+        self.assertIsNone(cache.refresh("missing", 10))
+
+    def test_evicts_least_recently_used(self):
+        """
+        Test cache.TTLCache evicts the least recently used entry when full
+        """
+        cache = TTLCache(max_entries=2, clock=self.clock)
+        cache.set("first", 1, 10)
+        cache.set("second", 2, 10)
+        cache.get("first")
+        cache.set("third", 3, 10)
+
+        self.assertIn("first", cache)
+        self.assertNotIn("second", cache)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_max_bytes(self):
+        """
+        Test cache.TTLCache keeps the total size of its entries under max_bytes
+        """
+        cache = TTLCache(max_bytes=100, clock=self.clock)
+        cache.set("first", 1, 10, size=60)
+        cache.set("second", 2, 10, size=60)
+
+        self.assertNotIn("first", cache)
+        self.assertEqual(cache.total_bytes, 60)
+        self.assertIsNone(cache.set("huge", 3, 10, size=101))
+        self.assertNotIn("huge", cache)
+
+    def test_keys(self):
+        """
+        Test cache.TTLCache.keys lists fresh and stale entries, least recently used first
+        """
+        cache = TTLCache(clock=self.clock)
+        cache.set("first", 1, 10)
+        cache.set("second", 2, 100)
+        self.clock.now += 11
+        cache.get("first")
+
+        self.assertEqual(cache.keys(), ["second", "first"])
+
+    def test_delete(self):
+        """
+        Test cache.TTLCache.delete and cache.TTLCache.clear
+        """
+        cache = TTLCache(clock=self.clock)
+        cache.set("first", 1, 10, size=5)
+        cache.set("second", 2, 10, size=5)
+
+        cache.delete("first")
+        self.assertEqual((len(cache), cache.total_bytes), (1, 5))
+        cache.clear()
+        self.assertEqual((len(cache), cache.total_bytes), (0, 0))
+
+    def test_shared_backend(self):
+        """
+        Test cache.TTLCache reads misses from its backend and writes stores through to it
+        """
+        backend = MemoryBackend(clock=self.clock)
+        first = TTLCache(clock=self.clock, backend=backend, namespace="config")
+        second = TTLCache(clock=self.clock, backend=backend, namespace="config")
+        first.set(("owner/repo", "config.yml"), {"users": ["user"]}, 10, size=20, etag="etag-1")
+        first.set(("owner/repo", "missing.yml"), object(), 10)
+
+        entry = second.get_fresh(("owner/repo", "config.yml"))
+        self.assertEqual((entry.value, entry.expires_at, entry.etag), ({"users": ["user"]}, 1010, "etag-1"))
+        self.assertIsNone(second.get(("owner/repo", "missing.yml")))
+        self.assertEqual(len(second), 1)
+
+        # A copy gone stale in memory is replaced by a newer one from the backend
+        self.clock.now += 11
+        first.set(("owner/repo", "config.yml"), {"users": ["other"]}, 10)
+        self.assertEqual(second.get_fresh(("owner/repo", "config.yml")).value, {"users": ["other"]})
+
+        second.delete(("owner/repo", "config.yml"))
+        first.clear()
+        self.assertIsNone(first.get(("owner/repo", "config.yml")))
+        self.assertEqual(first.snapshot()["misses"], 1)
+
+    def test_shared_backend_unavailable(self):
+        """
+        Test cache.TTLCache keeps the entries held in memory while its backend cannot be read
+        """
+        backend = UnreachableBackend(clock=self.clock)
+        cache = TTLCache(clock=self.clock, backend=backend, namespace="config", local_ttl=5,
+                         scope=lambda key: key[0])
+        cache.set(("owner/repo", "config.yml"), {"users": ["user"]}, 60, etag="etag-1")
+
+        backend.down = True
+        self.clock.now += 6
+        entry = cache.get_fresh(("owner/repo", "config.yml"))
+        self.assertEqual((entry.value, entry.etag), ({"users": ["user"]}, "etag-1"))
+
+        # Entries deleted by another process are still dropped once the backend is back
+        backend.down = False
+        backend.delete_many(list(backend._values))
+        self.assertIsNone(cache.get(("owner/repo", "config.yml")))
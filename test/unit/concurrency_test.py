@@ -0,0 +1,109 @@
+"""
+Unit tests for concurrency.py
+"""
+
+import threading
+import time
+import unittest
+from github_approval_checker.utils.concurrency import SingleFlight, WorkerPool
+from github_approval_checker.utils.exceptions import APIError
+
+
+def fail(message):
+    """
+    Raises an APIError with the given message.
+    """
+    raise APIError(message)
+
+
+class WorkerPoolUnitTests(unittest.TestCase):
+    """
+    Test concurrency.WorkerPool
+    """
+
+    def test_submit(self):
+        """
+        Test concurrency.WorkerPool.submit returns results and re-raises errors from get()
+        """
+        for max_workers in (1, 4):
+            pool = WorkerPool(max_workers)
+
+            self.assertEqual(pool.submit(pow, 2, 3).get(), 8)
+            self.assertRaises(APIError, pool.submit(fail, "api-error").get)
+
+    def test_map(self):
+        """
+        Test concurrency.WorkerPool.map keeps the order of its items
+        """
+        for max_workers in (1, 4):
+            pool = WorkerPool(max_workers)
+
+            self.assertEqual(pool.map(abs, [-1, -2, 3, -4]), [1, 2, 3, 4])
+
+    def test_inline_does_not_start_threads(self):
+        """
+        Test concurrency.WorkerPool only starts its threads when work runs concurrently
+        """
+        pool = WorkerPool(4)
+        pool.map(abs, [-1])
+        self.assertIsNone(pool._pool)
+
+        pool.map(abs, [-1, -2])
+        self.assertIsNotNone(pool._pool)
+
+
+class SingleFlightUnitTests(unittest.TestCase):
+    """
+    Test concurrency.SingleFlight
+    """
+
+    def test_run(self):
+        """
+        Test concurrency.SingleFlight.run processes items arriving during a run as one batch
+        """
+        single_flight = SingleFlight()
+        release = threading.Event()
+        batches = []
+        results = []
+
+        def process(items):
+            """
+            Records the batch, holding the first one until released.
+            """
+            batches.append(items)
+            if len(batches) == 1:
+                self.assertTrue(release.wait(5))
+            return len(batches)
+
+        threads = [
+            threading.Thread(target=lambda item=item: results.append(single_flight.run("key", item, process)))
+            for item in range(3)
+        ]
+        threads[0].start()
+        deadline = time.time() + 5
+        while not batches and time.time() < deadline:
+            time.sleep(0.001)
+        threads[1].start()
+        threads[2].start()
+        while len(single_flight._pending.get("key").items) < 2 and time.time() < deadline:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(batches[0], [0])
+        self.assertEqual(sorted(batches[1]), [1, 2])
+        self.assertEqual(sorted(results), [1, 2, 2])
+
+    def test_run_error(self):
+        """
+        Test concurrency.SingleFlight.run raises the error of its batch and waits out its window
+        """
+        sleep = []
+        single_flight = SingleFlight(sleep=sleep.append)
+
+        self.assertRaises(
+            APIError, single_flight.run, "key", "api-error", lambda items: fail(items[0]), window=2
+        )
+        self.assertEqual(single_flight.run("key", 2, sum), 2)
+        self.assertEqual(sleep, [2])
@@ -4,38 +4,37 @@ Unit Tests for endpoints.py
 
 import unittest
 import os  # pylint: disable=unused-import
-from mock import patch, call
+from mock import patch, MagicMock
 from github_approval_checker.utils import util  # pylint: disable=unused-import
-from github_approval_checker.utils.github_handler import GithubHandler  # pylint: disable=unused-import
-from github_approval_checker.utils.exceptions import ConfigError, APIError, SignatureError  # noqa pylint: disable=unused-import
-from github_approval_checker.api import endpoints  # pylint: disable=unused-import
+from github_approval_checker.utils.exceptions import ConfigError, APIError  # pylint: disable=unused-import
+from github_approval_checker.api import endpoints, webhook  # pylint: disable=unused-import
+from github_approval_checker.utils.idempotency import MemoryIdempotencyStore
 
 
+@patch.dict("os.environ", {"idempotency_backend": "none"})
 class EndpointsUnitTests(unittest.TestCase):
     """
     Test endpoints.py
     """
 
-    @patch("github_approval_checker.utils.util.verify_signature")
-    @patch("github_approval_checker.api.endpoints.connexion")
-    @patch("github_approval_checker.api.endpoints.GithubHandler")
+    def setUp(self):
+        connexion_patcher = patch("github_approval_checker.api.endpoints.connexion")
+        self.connexion = connexion_patcher.start()
+        self.connexion.request.headers = {"X-GitHub-Delivery": "delivery-1"}
+        self.addCleanup(connexion_patcher.stop)
+
+    @patch("github_approval_checker.utils.github_handler.get_shared_handler")
     @patch("github_approval_checker.utils.util.validate_config")
     def test_post_pull_request_review(
             self,
             validate_config,
-            handler_class,
-            conn,
-            verify_signature
+            get_handler
     ):
         """
         Test endpoints.post_pull_request_review
         """
 
-        conn.request.data.return_value = ''
-        conn.request.headers.get.return_value = 'sha1=signature'
-        verify_signature.return_value = None
-
-        handler = handler_class.return_value
+        handler = get_handler.return_value
         handler.get_config.return_value = {
             "context1": [
                 "whitelist1"
@@ -87,54 +86,83 @@ class EndpointsUnitTests(unittest.TestCase):
             }
         }
 
-        handler.post_status.side_effect = [
-            201,
-            400
-        ]
+        handler.post_statuses.return_value = {
+            "context2": 201,
+            "context1": 400
+        }
 
         response = endpoints.post_pull_request_review(data)
 
         handler.get_statuses.assert_called_once_with("repo-full-name", "review-commit-id")
-        self.assertEqual(handler.is_authorized.call_count, 2)
-        handler.post_status.assert_has_calls([
-            call(
-                "repo-full-name",
-                "review-commit-id",
-                "context2",
-                "fake://status_target_2",
-                "review-user-login",
-                "Status Check 2"
-            ),
-            call(
-                "repo-full-name",
-                "review-commit-id",
-                "context1",
-                "fake://status_target_1",
-                "review-user-login",
-                "Status Check 1"
-            )
-        ])
+        handler.is_authorized.assert_called_once_with(
+            "review-user-login", "repo-owner", "repo-name", handler.get_config.return_value
+        )
+        handler.post_statuses.assert_called_once_with(
+            "repo-full-name",
+            "review-commit-id",
+            [handler.get_statuses.return_value[0], handler.get_statuses.return_value[2]],
+            "review-user-login"
+        )
+        self.assertEqual(response, ({'status': 'OK', 'failed_contexts': ['context1']}, 200))
+
+    @patch("github_approval_checker.utils.github_handler.get_shared_handler")
+    @patch("github_approval_checker.utils.util.validate_config")
+    def test_post_review_nothing_failed(
+            self,
+            validate_config,
+            get_handler
+    ):
+        """
+        Test endpoints.post_pull_request_review skips authorization when no status has failed.
+        """
+        validate_config.return_value = None
+
+        handler = get_handler.return_value
+        handler.get_config.return_value = {"users": ["review-user-login"]}
+        handler.get_statuses.return_value = [
+            {
+                "state": "success",
+                "context": "context1",
+                "target_url": "fake://status_target_1",
+                "description": "Status Check 1"
+            }
+        ]
+
+        data = {
+            "repository": {
+                "name": "repo-name",
+                "full_name": "repo-full-name",
+                "owner": {
+                    "login": "repo-owner"
+                }
+            },
+            "review": {
+                "state": "approved",
+                "commit_id": "review-commit-id",
+                "user": {
+                    "login": "review-user-login"
+                }
+            }
+        }
+
+        response = endpoints.post_pull_request_review(data)
+
+        handler.is_authorized.assert_not_called()
+        handler.post_statuses.assert_not_called()
         self.assertEqual(response, util.STATUS_OK)
 
-    @patch("github_approval_checker.utils.util.verify_signature")
-    @patch("github_approval_checker.api.endpoints.connexion")
-    @patch("github_approval_checker.api.endpoints.GithubHandler")
+    @patch("github_approval_checker.utils.github_handler.get_shared_handler")
     @patch("github_approval_checker.utils.util.validate_config")
     def test_post_pull_request_review_unapproved(
             self,
             validate_config,
-            handler_class,
-            conn,
-            verify_signature
+            get_handler
     ):
         """
         Test endpoints.post_pull_request_review with a review where the status is not approved.
         """
-        conn.request.data.return_value = ''
-        conn.request.headers.get.return_value = 'sha1=signature'
-        verify_signature.return_value = None
 
-        handler = handler_class.return_value
+        handler = get_handler.return_value
         handler.get_config.return_value = {
             "context1": [
                 "whitelist1"
@@ -165,29 +193,22 @@ class EndpointsUnitTests(unittest.TestCase):
 
         response = endpoints.post_pull_request_review(data)
 
+        handler.get_config.assert_not_called()
         handler.get_statuses.assert_not_called()
         handler.is_authorized.assert_not_called()
-        handler.post_status.assert_not_called()
+        handler.post_statuses.assert_not_called()
         self.assertEqual(response, ({'status': 'OK', 'message': 'Review state is not approved'}, 200))
 
-    @patch("github_approval_checker.utils.util.verify_signature")
-    @patch("github_approval_checker.api.endpoints.connexion")
-    @patch("github_approval_checker.api.endpoints.GithubHandler")
+    @patch("github_approval_checker.utils.github_handler.get_shared_handler")
     def test_post_pull_request_review_missing(
             self,
-            handler_class,
-            conn,
-            verify_signature
+            get_handler
     ):
         """
         Test endpoints.post_pull_request_review with a missing config file
         """
 
-        conn.request.data.return_value = ''
-        conn.request.headers.get.return_value = 'sha1=signature'
-        verify_signature.return_value = None
-
-        handler = handler_class.return_value
+        handler = get_handler.return_value
         handler.get_config.side_effect = APIError("config-error", "{'message': 'bad-config'}")
 
         data = {
@@ -199,7 +220,7 @@ class EndpointsUnitTests(unittest.TestCase):
                 }
             },
             "review": {
-                "state": "changes-requested",
+                "state": "approved",
                 "commit_id": "review-commit-id",
                 "user": {
                     "login": "review-user-login"
@@ -209,31 +230,22 @@ class EndpointsUnitTests(unittest.TestCase):
 
         response = endpoints.post_pull_request_review(data)
 
-        handler.get_statuses.assert_not_called()
         handler.is_authorized.assert_not_called()
-        handler.post_status.assert_not_called()
+        handler.post_statuses.assert_not_called()
         self.assertEqual(response, "{'message': 'bad-config'}")
 
-    @patch("github_approval_checker.utils.util.verify_signature")
-    @patch("github_approval_checker.api.endpoints.connexion")
-    @patch("github_approval_checker.api.endpoints.GithubHandler")
+    @patch("github_approval_checker.utils.github_handler.get_shared_handler")
     @patch("github_approval_checker.utils.util.validate_config")
     def test_post_pull_request_review_bad_config(
             self,
             validate_config,
-            handler_class,
-            conn,
-            verify_signature
+            get_handler
     ):
         """
         Test endpoints.post_pull_request_review with a bad config file
         """
 
-        conn.request.data.return_value = ''
-        conn.request.headers.get.return_value = 'sha1=signature'
-        verify_signature.return_value = None
-
-        handler = handler_class.return_value
+        handler = get_handler.return_value
         handler.get_config.return_value = "config-data"
 
         validate_config.side_effect = ConfigError(
@@ -250,7 +262,7 @@ class EndpointsUnitTests(unittest.TestCase):
                 }
             },
             "review": {
-                "state": "changes-requested",
+                "state": "approved",
                 "commit_id": "review-commit-id",
                 "user": {
                     "login": "review-user-login"
@@ -260,9 +272,8 @@ class EndpointsUnitTests(unittest.TestCase):
 
         response = endpoints.post_pull_request_review(data)
 
-        handler.get_statuses.assert_not_called()
         handler.is_authorized.assert_not_called()
-        handler.post_status.assert_not_called()
+        handler.post_statuses.assert_not_called()
         handler.get_config.assert_called_once_with("repo-full-name", None)
         validate_config.assert_called_once_with("config-data")
         self.assertEqual(
@@ -276,42 +287,192 @@ class EndpointsUnitTests(unittest.TestCase):
             )
         )
 
-    @patch("github_approval_checker.utils.util.verify_signature")
-    @patch("github_approval_checker.api.endpoints.connexion")
-    @patch("github_approval_checker.api.endpoints.GithubHandler")
+    @patch.dict("os.environ", {"processing_mode": "queue"})
+    @patch("github_approval_checker.api.queue_worker.enqueue_review")
+    @patch("github_approval_checker.utils.github_handler.get_shared_handler")
+    def test_post_pull_request_review_queued(
+            self,
+            get_handler,
+            enqueue_review
+    ):
+        """
+        Test endpoints.post_pull_request_review queues approvals in the queue processing mode
+        """
+        enqueue_review.return_value = ({'status': 'Accepted'}, 202)
+        data = {
+            "repository": {
+                "name": "repo-name",
+                "full_name": "repo-full-name",
+                "owner": {
+                    "login": "repo-owner"
+                }
+            },
+            "review": {
+                "state": "approved",
+                "commit_id": "review-commit-id",
+                "user": {
+                    "login": "review-user-login"
+                }
+            }
+        }
+
+        response = endpoints.post_pull_request_review(data)
+
+        get_handler.assert_not_called()
+        enqueue_review.assert_called_once_with(data, idempotency_keys=(), delivery_id="delivery-1")
+        self.assertEqual(response, ({'status': 'Accepted'}, 202))
+
+    @patch("github_approval_checker.api.settings.idempotency_store")
+    @patch("github_approval_checker.utils.github_handler.get_shared_handler")
     @patch("github_approval_checker.utils.util.validate_config")
-    def test_post_pull_request_review_bad_sign(
+    def test_post_pull_request_review_duplicate(
             self,
             validate_config,
-            handler_class,
-            conn,
-            verify_signature
+            get_handler,
+            idempotency_store
     ):
         """
-        Test endpoints.post_pull_request_review with an incorrect signature
+        Test endpoints.post_pull_request_review answers redeliveries without calling GitHub,
+        but processes deliveries that failed again
         """
+        validate_config.return_value = None
+        idempotency_store.return_value = MemoryIdempotencyStore()
+        handler = get_handler.return_value
+        handler.get_config.side_effect = [
+            APIError("Not Found", ({'status': 'Not Found'}, 404)),
+            {"context1": ["review-user-login"]}
+        ]
+        handler.get_statuses.return_value = [{"state": "failure", "context": "context1"}]
+        handler.is_authorized.return_value = True
+        handler.post_statuses.return_value = {"context1": 201}
+        data = {
+            "repository": {
+                "name": "repo-name",
+                "full_name": "repo-full-name",
+                "owner": {
+                    "login": "repo-owner"
+                }
+            },
+            "review": {
+                "state": "approved",
+                "commit_id": "review-commit-id",
+                "user": {
+                    "login": "review-user-login"
+                }
+            }
+        }
 
-        conn.request.data.return_value = ''
-        conn.request.headers.get.return_value = 'sha1=signature'
-        verify_signature.side_effect = SignatureError("Error validating signature")
+        self.assertEqual(endpoints.post_pull_request_review(data)[1], 404)
+        self.assertEqual(endpoints.post_pull_request_review(data)[0]['overwritten_contexts'], ['context1'])
+        self.connexion.request.headers = {"X-GitHub-Delivery": "delivery-2"}
+        response = endpoints.post_pull_request_review(data)
 
-        response = endpoints.post_pull_request_review({})
+        self.assertEqual(handler.get_config.call_count, 2)
+        self.assertEqual(response, webhook.DUPLICATE)
 
-        handler = handler_class.return_value
-        handler.get_config.return_value = "config-data"
+    @patch("github_approval_checker.api.settings.idempotency_store")
+    @patch("github_approval_checker.utils.github_handler.get_shared_handler")
+    @patch("github_approval_checker.utils.util.validate_config")
+    def test_post_review_nothing_overwritten(
+            self,
+            validate_config,
+            get_handler,
+            idempotency_store
+    ):
+        """
+        Test endpoints.post_pull_request_review processes an approval again when the first one
+        found no failed status to overwrite
+        """
+        validate_config.return_value = None
+        idempotency_store.return_value = MemoryIdempotencyStore()
+        handler = get_handler.return_value
+        handler.get_config.return_value = {"context1": ["review-user-login"]}
+        handler.get_statuses.side_effect = [[], [{"state": "failure", "context": "context1"}]]
+        handler.is_authorized.return_value = True
+        handler.post_statuses.return_value = {"context1": 201}
+        data = {
+            "repository": {
+                "name": "repo-name",
+                "full_name": "repo-full-name",
+                "owner": {
+                    "login": "repo-owner"
+                }
+            },
+            "review": {
+                "state": "approved",
+                "commit_id": "review-commit-id",
+                "user": {
+                    "login": "review-user-login"
+                }
+            }
+        }
 
-        handler.get_statuses.assert_not_called()
-        handler.is_authorized.assert_not_called()
-        handler.post_status.assert_not_called()
-        handler.get_config.assert_not_called()
-        validate_config.assert_not_called()
-        self.assertEqual(
-            response,
-            (
-                {
-                    'status': 'Signature Validation Error',
-                    'message': 'Error validating signature'
-                },
-                400
-            )
+        self.assertEqual(endpoints.post_pull_request_review(data), util.STATUS_OK)
+        self.connexion.request.headers = {"X-GitHub-Delivery": "delivery-2"}
+        response = endpoints.post_pull_request_review(data)
+
+        self.assertEqual(response, ({'status': 'OK', 'overwritten_contexts': ['context1']}, 200))
+
+    @patch("github_approval_checker.utils.github_handler.get_shared_handler")
+    def test_post_push(self, get_handler):
+        """
+        Test endpoints.post_push forgets the configurations changed on the default branch
+        """
+        get_handler.return_value.invalidate_config.return_value = 1
+        data = {
+            "ref": "refs/heads/main",
+            "repository": {"full_name": "owner/repo", "default_branch": "main"},
+            "commits": [{"modified": ["approval-checker-config.yml"]}]
+        }
+
+        response = endpoints.post_push(data)
+
+        get_handler.return_value.invalidate_config.assert_called_once_with(
+            "owner/repo", {"approval-checker-config.yml"}
         )
+        self.assertEqual(response, ({"status": "OK", "message": "Invalidated 1 cached entries"}, 200))
+
+    @patch("github_approval_checker.utils.github_handler.get_shared_handler")
+    def test_post_invalidation_bad_request(self, get_handler):
+        """
+        Test the invalidation endpoints answer 400 for payloads missing a required field
+        """
+        self.assertEqual(endpoints.post_team({"action": "deleted"})[1], 400)
+        self.assertEqual(endpoints.post_membership({})[1], 400)
+        self.assertEqual(endpoints.post_organization({"action": "member_added"})[1], 400)
+        self.assertEqual(endpoints.post_member({})[1], 400)
+        get_handler.return_value.invalidate_memberships.assert_not_called()
+
+    def test_get_metrics_disabled(self):
+        """
+        Test endpoints.get_metrics is not served unless metrics_route is enabled
+        """
+        self.assertEqual(endpoints.get_metrics()[1], 404)
+
+    @patch.dict("os.environ", {"metrics_route": "true"})
+    @patch("github_approval_checker.utils.github_handler.get_shared_handler")
+    def test_get_metrics(self, get_handler):
+        """
+        Test endpoints.get_metrics reports the GitHub calls of the shared handler
+        """
+        handler = get_handler.return_value
+        handler.request_count = 3
+        handler.metrics.snapshot.return_value = {"get_statuses": {"calls": 3}}
+        handler.rate_limit.snapshot.return_value = {"deferred": 0}
+        handler.connection_stats.return_value = {"requests": 3, "connections": 1, "reused": 2}
+        handler.cache_stats.return_value = {"config": {"hits": 2}}
+        handler.membership = None
+
+        response = endpoints.get_metrics()
+
+        self.assertEqual(response, ({
+            "github_requests": 3,
+            "github_endpoints": {"get_statuses": {"calls": 3}},
+            "rate_limit": {"deferred": 0},
+            "connections": {"requests": 3, "connections": 1, "reused": 2},
+            "caches": {"config": {"hits": 2}}
+        }, 200))
+
+        handler.membership = MagicMock()
+        handler.membership.snapshot.return_value = {"loaded": 2}
+        self.assertEqual(endpoints.get_metrics()[0]["membership"], {"loaded": 2})
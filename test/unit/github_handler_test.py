@@ -4,10 +4,13 @@ Unit tests for github_handler.py
 
 import unittest
 import json
-import requests  # pylint: disable=unused-import
+import requests
 from mock import patch, call
+from github_approval_checker.utils import github_handler
 from github_approval_checker.utils.github_handler import GithubHandler
-from github_approval_checker.utils.exceptions import APIError
+from github_approval_checker.utils.exceptions import APIError, RateLimitError
+from github_approval_checker.utils.shared_cache import MemoryBackend
+from test.helpers import GithubResponse
 
 
 class GithubHandlerUnitTests(unittest.TestCase):
@@ -15,29 +18,29 @@ class GithubHandlerUnitTests(unittest.TestCase):
     Unit tests for github_handler.GithubHandler
     '''
 
-    @patch('requests.get')
-    def test_get_user_permission(self, requests_get):
+    @patch("requests.Session.request")
+    def test_get_user_permission(self, session_request):
         '''
         Test github_handler.GithubHandler.check_user_permission
         '''
         handler = GithubHandler('username', 'password')
-        requests_get.return_value = GithubResponse({'permission': 'user-permission'})
+        session_request.return_value = GithubResponse({'permission': 'user-permission'})
 
         response = handler.get_user_permission('repo-name', 'fake-user')
 
-        requests_get.assert_called_once_with(
-            'https://api.github.com/repos/repo-name/collaborators/fake-user/permission',
-            auth=('username', 'password')
+        session_request.assert_called_once_with(
+            'GET',
+            'https://api.github.com/repos/repo-name/collaborators/fake-user/permission'
         )
         self.assertEqual(response, 'user-permission')
 
-    @patch('requests.post')
-    def test_post_status(self, requests_post):
+    @patch("requests.Session.request")
+    def test_post_status(self, session_request):
         '''
         Test github_handler.GithubHandler.post_status
         '''
         handler = GithubHandler('username', 'password')
-        requests_post.return_value = GithubResponse(status_code=123890)
+        session_request.return_value = GithubResponse(status_code=123890)
 
         response = handler.post_status(
             'repo-name',
@@ -48,42 +51,281 @@ class GithubHandlerUnitTests(unittest.TestCase):
             'old-description'
         )
 
-        requests_post.assert_called_once_with(
+        session_request.assert_called_once_with(
+            'POST',
             'https://api.github.com/repos/repo-name/statuses/branch-name',
             data=json.dumps({
                 'state': 'success',
                 'description': 'Overwritten based on approval from: reviewer-name Message: old-description',
                 'context': 'context-string',
                 'target_url': 'target-url'
-            }),
-            auth=('username', 'password')
+            })
         )
 
         self.assertEqual(response, 123890)
 
-    @patch("requests.get")
-    def test_get_statuses(self, requests_get):
+    @patch("github_approval_checker.utils.github_handler.GithubHandler.post_status")
+    def test_post_statuses(self, post_status):
+        '''
+        Test github_handler.GithubHandler.post_statuses reports the result of every context
+        '''
+        handler = GithubHandler("username", "password", max_workers=2)
+
+        def post_status_result(_repo, _ref, context, *_args):
+            '''
+            Fails context2 with an error response and context3 with a connection error
+            '''
+            if context == "context3":
+                raise requests.exceptions.ConnectionError()
+            return {"context1": 201, "context2": 500}[context]
+
+        post_status.side_effect = post_status_result
+        statuses = [
+            {"context": "context{}".format(i), "target_url": "url", "description": "desc"}
+            for i in range(1, 4)
+        ]
+
+        response = handler.post_statuses("repo-name", "ref-name", statuses, "reviewer-name")
+
+        self.assertEqual(post_status.call_count, 3)
+        post_status.assert_any_call("repo-name", "ref-name", "context1", "url", "reviewer-name", "desc")
+        self.assertEqual(response, {"context1": 201, "context2": 500, "context3": None})
+
+    def test_map(self):
+        '''
+        Test github_handler.GithubHandler.map keeps the order of its items
+        '''
+        handler = GithubHandler("username", "password", max_workers=4)
+
+        self.assertEqual(handler.map(lambda x: x * 2, [1, 2, 3, 4, 5]), [2, 4, 6, 8, 10])
+        self.assertEqual(handler.map(lambda x: x * 2, [1]), [2])
+
+    @patch("requests.Session.request")
+    def test_get_statuses(self, session_request):
         '''
         Test github_handler.GithubHandler.get_statuses
         '''
         handler = GithubHandler("username", "password")
-        requests_get.return_value = GithubResponse(data={"statuses": "fake-statuses"})
+        session_request.side_effect = [
+            GithubResponse(
+                data={"statuses": ["status-1", "status-2"]},
+                headers={"link": '<https://fake.example.com>; rel="next"'}
+            ),
+            GithubResponse(data={"statuses": ["status-3"]})
+        ]
 
         response = handler.get_statuses("repo-name", "ref-name")
 
-        requests_get.assert_called_once_with(
-            "https://api.github.com/repos/repo-name/commits/ref-name/status",
-            auth=("username", "password")
+        session_request.assert_has_calls([
+            call(
+                'GET',
+                "https://api.github.com/repos/repo-name/commits/ref-name/status",
+                params={'per_page': 100}
+            ),
+            call('GET', 'https://fake.example.com')
+        ])
+        self.assertEqual(response, ["status-1", "status-2", "status-3"])
+
+    @patch("requests.Session.request")
+    def test_paginate_lazily(self, session_request):
+        '''
+        Test github_handler.GithubHandler.paginate only requests pages as they are consumed
+        '''
+        handler = GithubHandler("username", "password")
+        session_request.return_value = GithubResponse(
+            data=["1", "2"],
+            headers={"link": '<https://fake.example.com>; rel="next", <https://last.example.com>; rel="last"'}
+        )
+
+        items = handler.paginate("https://api.github.com/orgs/org-name/teams", page_size=2)
+
+        self.assertEqual(session_request.call_count, 0)
+        self.assertEqual(next(items), "1")
+        self.assertEqual(next(items), "2")
+        self.assertEqual(session_request.call_count, 1)
+        session_request.assert_called_once_with(
+            'GET', "https://api.github.com/orgs/org-name/teams", params={'per_page': 2}
+        )
+
+    @patch("requests.Session.request")
+    def test_get_org_members(self, session_request):
+        '''
+        Test github_handler.GithubHandler.get_org_members and get_org_team_members list every page
+        '''
+        handler = GithubHandler("username", "password")
+        session_request.side_effect = [
+            GithubResponse(
+                data=[{"login": "a"}], headers={"link": '<https://api.github.com/next>; rel="next"'}
+            ),
+            GithubResponse(data=[{"login": "b"}]),
+            GithubResponse(data=[{"login": "c"}])
+        ]
+
+        self.assertEqual([member["login"] for member in handler.get_org_members("org-name")], ["a", "b"])
+        self.assertEqual(
+            [member["login"] for member in handler.get_org_team_members("org-name", "team-name")], ["c"]
         )
-        self.assertEqual(response, "fake-statuses")
+        self.assertEqual(session_request.call_args_list, [
+            call('GET', "https://api.github.com/orgs/org-name/members", params={'per_page': 100}),
+            call('GET', "https://api.github.com/next"),
+            call(
+                'GET',
+                "https://api.github.com/orgs/org-name/teams/team-name/members",
+                params={'per_page': 100}
+            )
+        ])
+
+    @patch("requests.Session.request")
+    def test_get_open_pulls(self, session_request):
+        '''
+        Test github_handler.GithubHandler.get_org_repositories, get_open_pulls and get_pull_reviews
+        '''
+        handler = GithubHandler("username", "password")
+        session_request.side_effect = [
+            GithubResponse(data=[{"full_name": "org-name/repo-name"}]),
+            GithubResponse(data=[{"number": 1}]),
+            GithubResponse(data=[{"state": "APPROVED"}])
+        ]
+
+        self.assertEqual(
+            list(handler.get_org_repositories("org-name")), [{"full_name": "org-name/repo-name"}]
+        )
+        self.assertEqual(list(handler.get_open_pulls("org-name/repo-name")), [{"number": 1}])
+        self.assertEqual(handler.get_pull_reviews("org-name/repo-name", 1), [{"state": "APPROVED"}])
+        self.assertEqual(session_request.call_args_list, [
+            call('GET', "https://api.github.com/orgs/org-name/repos", params={'per_page': 100}),
+            call(
+                'GET',
+                "https://api.github.com/repos/org-name/repo-name/pulls?state=open&sort=created&direction=asc",
+                params={'per_page': 100}
+            ),
+            call(
+                'GET',
+                "https://api.github.com/repos/org-name/repo-name/pulls/1/reviews",
+                params={'per_page': 100}
+            )
+        ])
+
+    def test_invalidate_config(self):
+        '''
+        Test github_handler.GithubHandler.invalidate_config only forgets the changed configurations
+        '''
+        handler = GithubHandler("username", "password", membership_ttl=600)
+        handler.config_cache.set(("owner/repo", "config.yml"), {}, 60)
+        handler.config_cache.set(("owner/repo", "other.yml"), {}, 60)
+        handler.config_cache.set(("owner/other-repo", "config.yml"), {}, 60)
+
+        self.assertEqual(handler.invalidate_config("Owner/Repo", {"config.yml", "README.md"}), 1)
+        self.assertEqual(handler.invalidate_config("owner/repo"), 1)
+        self.assertEqual(handler.config_cache.keys(), [("owner/other-repo", "config.yml")])
+        self.assertEqual(handler.invalidate_memberships("org-name"), 0)
+        self.assertEqual(GithubHandler("username", "password").invalidate_memberships("org-name"), 0)
+
+    def test_cache_stats(self):
+        '''
+        Test github_handler.GithubHandler.cache_stats reports each cache and the shared backend
+        '''
+        backend = MemoryBackend()
+        handler = GithubHandler("username", "password", membership_ttl=600, cache_backend=backend)
+        handler.config_cache.set(("owner/repo", "config.yml"), {}, 60)
+
+        stats = handler.cache_stats()
+
+        self.assertEqual(stats["config"]["entries"], 1)
+        self.assertEqual(stats["membership"]["entries"], 0)
+        self.assertEqual(stats["shared"]["sets"], 1)
+        self.assertEqual(sorted(GithubHandler("username", "password").cache_stats()), ["config"])
+
+    @patch("requests.Session.request")
+    def test_invalidate_shared_config(self, session_request):
+        '''
+        Test github_handler.GithubHandler.invalidate_config forgets configurations of other handlers
+        sharing a backend, including ones the invalidating handler never loaded
+        '''
+        backend = MemoryBackend()
+        first, second, third = [
+            GithubHandler("username", "password", cache_backend=backend) for _ in range(3)
+        ]
+        first.config_cache.local_ttl = third.config_cache.local_ttl = 0
+        session_request.return_value = GithubResponse(data={"content": "a2V5OiB2YWx1ZQ=="}, status_code=200)
+
+        self.assertEqual(first.get_config("owner/repo", "config.yml"), {"key": "value"})
+        self.assertEqual(third.get_config("Owner/Repo", "config.yml"), {"key": "value"})
+        self.assertEqual(session_request.call_count, 1)
+
+        session_request.return_value = GithubResponse(data={"content": "a2V5OiBvdGhlcg=="}, status_code=200)
+        self.assertEqual(second.invalidate_config("owner/repo", {"config.yml"}), 1)
+        self.assertEqual(first.get_config("owner/repo", "config.yml"), {"key": "other"})
+        self.assertEqual(session_request.call_count, 2)
+
+        # A forced push invalidates every configuration of the repository in every handler
+        self.assertEqual(second.invalidate_config("owner/repo"), 0)
+        self.assertEqual(third.get_config("owner/repo", "config.yml"), {"key": "other"})
+        self.assertEqual(session_request.call_count, 3)
+        self.assertEqual(GithubHandler("username", "password", cache_backend=backend).get_config(
+            "owner/repo", "config.yml"), {"key": "other"})
+        self.assertEqual(session_request.call_count, 3)
+
+    def test_membership_directory(self):
+        '''
+        Test github_handler.GithubHandler only keeps a membership directory if membership_ttl is set
+        '''
+        self.assertIsNone(GithubHandler("username", "password").membership)
+        handler = GithubHandler("username", "password", membership_ttl=600)
+        self.assertEqual(handler.membership.ttl, 600)
+
+    @patch("requests.Session.request")
+    def test_paginate_error(self, session_request):
+        '''
+        Test github_handler.GithubHandler.paginate raises APIError when a page cannot be fetched
+        '''
+        handler = GithubHandler("username", "password")
+        response = requests.Response()
+        response.status_code = 500
+        session_request.return_value = response
+
+        self.assertRaises(APIError, list, handler.paginate("https://api.github.com/orgs/org-name/teams"))
+
+    @patch("requests.Session.request")
+    def test_request_rate_limited(self, session_request):
+        '''
+        Test github_handler.GithubHandler records the budget and raises RateLimitError when refused for it
+        '''
+        handler = GithubHandler("rate-limited-user", "password")
+        session_request.return_value = GithubResponse(status_code=403, headers={
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset": "0"
+        })
+
+        with self.assertRaises(RateLimitError):
+            handler.get_statuses("repo-name", "ref-name")
+
+        self.assertEqual(handler.request_count, 1)
+        self.assertIn("core_remaining", handler.rate_limit.snapshot())
 
-    @patch("requests.get")
-    def test_get_organization_teams(self, requests_get):
+    @patch("requests.Session.request")
+    def test_request_metrics(self, session_request):
+        '''
+        Test github_handler.GithubHandler records each call in its metrics by endpoint
+        '''
+        handler = GithubHandler("username", "password")
+        session_request.return_value = GithubResponse(
+            {'permission': 'admin'}, headers={"Content-Length": "24"}
+        )
+
+        handler.get_user_permission('repo/name', 'fake-user')
+
+        stats = handler.metrics.snapshot()['get_user_permission']
+        self.assertEqual((stats['calls'], stats['bytes'], stats['status_codes']), (1, 24, {'999': 1}))
+
+    @patch("requests.Session.request")
+    def test_get_organization_teams(self, session_request):
         '''
         Test github_handler.GithubHandler.get_organization_teams
         '''
         handler = GithubHandler("username", "password")
-        requests_get.side_effect = [
+        session_request.side_effect = [
             GithubResponse(
                 data=["1", "2", "3"],
                 headers={
@@ -98,155 +340,170 @@ class GithubHandlerUnitTests(unittest.TestCase):
             )
         ]
         response = handler.get_organization_teams("org-name")
-        self.assertEqual(requests_get.call_count, 2)
-        requests_get.assert_has_calls([
-            call(
-                "https://api.github.com/orgs/org-name/teams",
-                auth=('username', 'password')
-            ),
-            call(
-                'https://fake.example.com',
-                auth=('username', 'password')
-            )
+        self.assertEqual(session_request.call_count, 2)
+        session_request.assert_has_calls([
+            call('GET', "https://api.github.com/orgs/org-name/teams", params={'per_page': 100}),
+            call('GET', 'https://fake.example.com')
         ])
         self.assertEqual(response, ['1', '2', '3', '4', '5', '6'])
 
-    @patch("github_approval_checker.utils.github_handler.GithubHandler.get_organization_teams")
-    def test_get_team_id_good(self, get_org_teams):
+    @patch("requests.Session.request")
+    def test_get_team_id_good(self, session_request):
         '''
         Test github_handler.GithubHandler.get_team_id with an existing team
         '''
         handler = GithubHandler("username", "password")
-        get_org_teams.return_value = [
-            {
-                'slug': 'team-slug',
-                'id': 123456
-            }
-        ]
+        session_request.return_value = GithubResponse(
+            data={'slug': 'team-slug', 'id': 123456},
+            status_code=200
+        )
 
         response = handler.get_team_id("org-name", "team-slug")
 
-        get_org_teams.assert_called_once_with("org-name")
+        session_request.assert_called_once_with('GET', "https://api.github.com/orgs/org-name/teams/team-slug")
         self.assertEqual(response, 123456)
 
-    @patch("github_approval_checker.utils.github_handler.GithubHandler.get_organization_teams")
-    def test_get_team_id_bad(self, get_org_teams):
+    @patch("requests.Session.request")
+    def test_get_team_id_bad(self, session_request):
         '''
-        Test github_handler.GithubHandler.get_team_id with an existing team
+        Test github_handler.GithubHandler.get_team_id with a missing team
         '''
         handler = GithubHandler("username", "password")
-        get_org_teams.return_value = [
-            {
-                'slug': 'not-team-slug',
-                'id': 123456
-            }
-        ]
+        session_request.return_value = GithubResponse(status_code=404)
+
         self.assertRaises(APIError, handler.get_team_id, "org-name", "team-slug")
-        get_org_teams.assert_called_once_with("org-name")
+        session_request.assert_called_once_with('GET', "https://api.github.com/orgs/org-name/teams/team-slug")
 
-    @patch("requests.get")
-    def test_get_team_members(self, requests_get):
+    @patch("requests.Session.request")
+    def test_get_team_members(self, session_request):
         """
         Test github_handler.GithubHandler.get_team_members
         """
         handler = GithubHandler("username", "password")
-        requests_get.return_value = GithubResponse(data="members-list")
+        session_request.return_value = GithubResponse(data=["member-1", "member-2"])
 
         response = handler.get_team_members("team-id")
 
-        requests_get.assert_called_once_with(
+        session_request.assert_called_once_with(
+            'GET',
             "https://api.github.com/teams/team-id/members",
-            auth=("username", "password")
+            params={'per_page': 100}
         )
-        self.assertEqual(response, "members-list")
+        self.assertEqual(response, ["member-1", "member-2"])
 
-    @patch("requests.get")
-    def test_is_user_on_team_good(self, requests_get):
+    @patch("requests.Session.request")
+    def test_is_user_on_team_good(self, session_request):
         """
         Test github_handler.GithubHandler.is_user_on_team for an active member
         """
         handler = GithubHandler("username", "password")
-        requests_get.return_value = GithubResponse(data={'role': 'member', 'state': 'active'})
+        session_request.return_value = GithubResponse(data={'role': 'member', 'state': 'active'})
 
         response = handler.is_user_on_team("team-id", "user")
 
-        requests_get.assert_called_once_with(
-            "https://api.github.com/teams/team-id/memberships/user",
-            auth=("username", "password")
+        session_request.assert_called_once_with(
+            'GET',
+            "https://api.github.com/teams/team-id/memberships/user"
         )
         self.assertTrue(response)
 
-    @patch("requests.get")
-    def test_is_user_on_team_pending(self, requests_get):
+    @patch("requests.Session.request")
+    def test_is_user_on_team_pending(self, session_request):
         """
         Test github_handler.GithubHandler.is_user_on_team for an active member
         """
         handler = GithubHandler("username", "password")
-        requests_get.return_value = GithubResponse(data={'role': 'member', 'state': 'pending'})
+        session_request.return_value = GithubResponse(data={'role': 'member', 'state': 'pending'})
 
         response = handler.is_user_on_team("team-id", "user")
 
-        requests_get.assert_called_once_with(
-            "https://api.github.com/teams/team-id/memberships/user",
-            auth=("username", "password")
+        session_request.assert_called_once_with(
+            'GET',
+            "https://api.github.com/teams/team-id/memberships/user"
         )
         self.assertFalse(response)
 
-    @patch("requests.get")
-    def test_is_user_on_team_non_member(self, requests_get):
+    @patch("requests.Session.request")
+    def test_is_user_on_team_non_member(self, session_request):
         """
         Test github_handler.GithubHandler.is_user_on_team for an active member
         """
         handler = GithubHandler("username", "password")
-        requests_get.return_value = GithubResponse(data={'role': 'non-member', 'state': 'active'})
+        session_request.return_value = GithubResponse(data={'role': 'non-member', 'state': 'active'})
 
         response = handler.is_user_on_team("team-id", "user")
 
-        requests_get.assert_called_once_with(
-            "https://api.github.com/teams/team-id/memberships/user",
-            auth=("username", "password")
+        session_request.assert_called_once_with(
+            'GET',
+            "https://api.github.com/teams/team-id/memberships/user"
         )
         self.assertFalse(response)
 
-    @patch("requests.get")
-    def test_is_user_in_org(self, requests_get):
+    @patch("requests.Session.request")
+    def test_is_user_on_org_team(self, session_request):
+        """
+        Test github_handler.GithubHandler.is_user_on_org_team for an active maintainer
+        """
+        handler = GithubHandler("username", "password")
+        session_request.return_value = GithubResponse(data={'role': 'maintainer', 'state': 'active'})
+
+        response = handler.is_user_on_org_team("org-name", "team-slug", "user")
+
+        session_request.assert_called_once_with(
+            'GET',
+            "https://api.github.com/orgs/org-name/teams/team-slug/memberships/user"
+        )
+        self.assertTrue(response)
+
+    @patch("requests.Session.request")
+    def test_is_user_on_org_team_missing(self, session_request):
+        """
+        Test github_handler.GithubHandler.is_user_on_org_team for a user or team that does not exist
+        """
+        handler = GithubHandler("username", "password")
+        session_request.return_value = GithubResponse(status_code=404)
+
+        self.assertFalse(handler.is_user_on_org_team("org-name", "team-slug", "user"))
+
+    @patch("requests.Session.request")
+    def test_is_user_in_org(self, session_request):
         """
         Test github_handler.GithubHandler.is_user_in_org
         """
         handler = GithubHandler("username", "password")
-        requests_get.return_value = GithubResponse(status_code=204)
+        session_request.return_value = GithubResponse(status_code=204)
 
         response = handler.is_user_in_org("org-name", "user-name")
 
-        requests_get.assert_called_once_with(
-            "https://api.github.com/orgs/org-name/members/user-name",
-            auth=("username", "password")
+        session_request.assert_called_once_with(
+            'GET',
+            "https://api.github.com/orgs/org-name/members/user-name"
         )
         self.assertTrue(response)
 
-    @patch("requests.get")
-    def test_get_file_contents(self, requests_get):
+    @patch("requests.Session.request")
+    def test_get_file_contents(self, session_request):
         """
         Test github_handler.GithubHandler.get_file_contents with an existing file
         """
         handler = GithubHandler("username", "password")
-        requests_get.return_value = GithubResponse(data={"content": "ZmFrZS1maWxlLWNvbnRlbnRz"})
+        session_request.return_value = GithubResponse(data={"content": "ZmFrZS1maWxlLWNvbnRlbnRz"})
 
         response = handler.get_file_contents("repo-name", "file-path")
 
-        requests_get.assert_called_once_with(
-            "https://api.github.com/repos/repo-name/contents/file-path",
-            auth=("username", "password")
+        session_request.assert_called_once_with(
+            'GET',
+            "https://api.github.com/repos/repo-name/contents/file-path"
         )
         self.assertEqual(response, "fake-file-contents")
 
-    @patch("requests.get")
-    def test_get_file_contents_bad(self, requests_get):
+    @patch("requests.Session.request")
+    def test_get_file_contents_bad(self, session_request):
         """
         Test github_handler.GithubHandler.get_file_contents with a missing file
         """
         handler = GithubHandler("username", "password")
-        requests_get.return_value = GithubResponse(status_code=404)
+        session_request.return_value = GithubResponse(status_code=404)
 
         try:
             handler.get_file_contents("repo-name", "file-path")
@@ -260,33 +517,95 @@ class GithubHandlerUnitTests(unittest.TestCase):
                 }, 500)
             )
 
-        requests_get.assert_called_once_with(
-            "https://api.github.com/repos/repo-name/contents/file-path",
-            auth=("username", "password")
+        session_request.assert_called_once_with(
+            'GET',
+            "https://api.github.com/repos/repo-name/contents/file-path"
         )
 
-    @patch("github_approval_checker.utils.github_handler.GithubHandler.get_file_contents")
-    def test_get_config(self, get_contents):
+    @patch("requests.Session.request")
+    def test_get_config(self, session_request):
         """
-        Test github_handler.GithubHandler.get_config
+        Test github_handler.GithubHandler.get_config fetches once and then serves from the cache
         """
         handler = GithubHandler("username", "password")
-        get_contents.return_value = "key: value"
+        session_request.return_value = GithubResponse(
+            data={"content": "a2V5OiB2YWx1ZQ=="},
+            status_code=200,
+            headers={"ETag": '"etag"'}
+        )
+
+        response = handler.get_config("repo-name", "config-filename")
+        cached_response = handler.get_config("repo-name", "config-filename")
+
+        session_request.assert_called_once_with(
+            'GET',
+            "https://api.github.com/repos/repo-name/contents/config-filename"
+        )
+        self.assertEqual(response, {"key": "value"})
+        self.assertIs(cached_response, response)
 
+    @patch("requests.Session.request")
+    def test_get_config_revalidate(self, session_request):
+        """
+        Test github_handler.GithubHandler.get_config revalidates an expired config with its ETag
+        """
+        handler = GithubHandler("username", "password", config_ttl=0)
+        session_request.side_effect = [
+            GithubResponse(data={"content": "a2V5OiB2YWx1ZQ=="}, status_code=200, headers={"ETag": '"etag"'}),
+            GithubResponse(status_code=304)
+        ]
+
+        handler.get_config("repo-name", "config-filename")
         response = handler.get_config("repo-name", "config-filename")
 
-        get_contents.assert_called_once_with("repo-name", "config-filename")
+        self.assertEqual(session_request.call_count, 2)
+        session_request.assert_called_with(
+            'GET',
+            "https://api.github.com/repos/repo-name/contents/config-filename",
+            headers={"If-None-Match": '"etag"'}
+        )
         self.assertEqual(response, {"key": "value"})
 
+    @patch("requests.Session.request")
+    def test_get_config_missing(self, session_request):
+        """
+        Test github_handler.GithubHandler.get_config remembers a missing config file
+        """
+        handler = GithubHandler("username", "password")
+        session_request.return_value = GithubResponse(status_code=404)
+
+        self.assertRaises(APIError, handler.get_config, "repo-name", "config-filename")
+        self.assertRaises(APIError, handler.get_config, "repo-name", "config-filename")
+
+        self.assertEqual(session_request.call_count, 1)
+
+    @patch("requests.Session.request")
+    def test_get_config_rate_limited(self, session_request):
+        """
+        Test github_handler.GithubHandler.get_config does not remember a config refused for the rate limit
+        """
+        handler = GithubHandler("config-rate-limited-user", "password")
+        session_request.side_effect = [
+            GithubResponse(status_code=403, headers={
+                "X-RateLimit-Limit": "5000",
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset": "0"
+            }),
+            GithubResponse(data={"content": "a2V5OiB2YWx1ZQ=="}, status_code=200)
+        ]
+
+        self.assertRaises(RateLimitError, handler.get_config, "repo-name", "config-filename")
+
+        self.assertEqual(handler.get_config("repo-name", "config-filename"), {"key": "value"})
+        self.assertEqual(session_request.call_count, 2)
+
     @patch("github_approval_checker.utils.github_handler.GithubHandler.get_user_permission")
-    @patch("github_approval_checker.utils.github_handler.GithubHandler.is_user_on_team")
-    @patch("github_approval_checker.utils.github_handler.GithubHandler.get_team_id")
+    @patch("github_approval_checker.utils.github_handler.GithubHandler.is_user_on_org_team")
     @patch("github_approval_checker.utils.github_handler.GithubHandler.is_user_in_org")
     def test_is_authorized_org(
             self,
             check_org_member,
-            get_team_id,
-            is_user_on_team,
+            is_user_on_org_team,
             get_user_permission
     ):
         """
@@ -301,20 +620,17 @@ class GithubHandlerUnitTests(unittest.TestCase):
         response = handler.is_authorized("user-name", None, None, whitelist)
 
         check_org_member.assert_called_once_with("org-name", "user-name")
-        get_team_id.assert_not_called()
-        is_user_on_team.assert_not_called()
+        is_user_on_org_team.assert_not_called()
         get_user_permission.assert_not_called()
         self.assertTrue(response)
 
     @patch("github_approval_checker.utils.github_handler.GithubHandler.get_user_permission")
-    @patch("github_approval_checker.utils.github_handler.GithubHandler.is_user_on_team")
-    @patch("github_approval_checker.utils.github_handler.GithubHandler.get_team_id")
+    @patch("github_approval_checker.utils.github_handler.GithubHandler.is_user_on_org_team")
     @patch("github_approval_checker.utils.github_handler.GithubHandler.is_user_in_org")
     def test_is_authorized_team(
             self,
             check_org_member,
-            get_team_id,
-            is_user_on_team,
+            is_user_on_org_team,
             get_user_permission
     ):
         """
@@ -324,26 +640,22 @@ class GithubHandlerUnitTests(unittest.TestCase):
         whitelist = {
             "teams": ["team-name"]
         }
-        get_team_id.return_value = "team-id"
-        is_user_on_team.return_value = True
+        is_user_on_org_team.return_value = True
 
         response = handler.is_authorized("user-name", "repo-owner", None, whitelist)
 
         check_org_member.assert_not_called()
-        get_team_id.assert_called_once_with("repo-owner", "team-name")
-        is_user_on_team.assert_called_once_with("team-id", "user-name")
+        is_user_on_org_team.assert_called_once_with("repo-owner", "team-name", "user-name")
         get_user_permission.assert_not_called()
         self.assertTrue(response)
 
     @patch("github_approval_checker.utils.github_handler.GithubHandler.get_user_permission")
-    @patch("github_approval_checker.utils.github_handler.GithubHandler.is_user_on_team")
-    @patch("github_approval_checker.utils.github_handler.GithubHandler.get_team_id")
+    @patch("github_approval_checker.utils.github_handler.GithubHandler.is_user_on_org_team")
     @patch("github_approval_checker.utils.github_handler.GithubHandler.is_user_in_org")
     def test_is_authorized_team_error(
             self,
             check_org_member,
-            get_team_id,
-            is_user_on_team,
+            is_user_on_org_team,
             get_user_permission
     ):
         """
@@ -353,26 +665,22 @@ class GithubHandlerUnitTests(unittest.TestCase):
         whitelist = {
             "teams": ["team-name"]
         }
-        get_team_id.return_value = "team-id"
-        is_user_on_team.side_effect = APIError("api-error")
+        is_user_on_org_team.side_effect = APIError("api-error")
 
         response = handler.is_authorized("user-name", "repo-owner", None, whitelist)
 
         check_org_member.assert_not_called()
-        get_team_id.assert_called_once_with("repo-owner", "team-name")
-        is_user_on_team.assert_called_once_with("team-id", "user-name")
+        is_user_on_org_team.assert_called_once_with("repo-owner", "team-name", "user-name")
         get_user_permission.assert_not_called()
         self.assertFalse(response)
 
     @patch("github_approval_checker.utils.github_handler.GithubHandler.get_user_permission")
-    @patch("github_approval_checker.utils.github_handler.GithubHandler.is_user_on_team")
-    @patch("github_approval_checker.utils.github_handler.GithubHandler.get_team_id")
+    @patch("github_approval_checker.utils.github_handler.GithubHandler.is_user_on_org_team")
     @patch("github_approval_checker.utils.github_handler.GithubHandler.is_user_in_org")
     def test_is_authorized_user(
             self,
             check_org_member,
-            get_team_id,
-            is_user_on_team,
+            is_user_on_org_team,
             get_user_permission
     ):
         """
@@ -386,20 +694,17 @@ class GithubHandlerUnitTests(unittest.TestCase):
         response = handler.is_authorized("user-name", None, None, whitelist)
 
         check_org_member.assert_not_called()
-        get_team_id.assert_not_called()
-        is_user_on_team.assert_not_called()
+        is_user_on_org_team.assert_not_called()
         get_user_permission.assert_not_called()
         self.assertTrue(response)
 
     @patch("github_approval_checker.utils.github_handler.GithubHandler.get_user_permission")
-    @patch("github_approval_checker.utils.github_handler.GithubHandler.is_user_on_team")
-    @patch("github_approval_checker.utils.github_handler.GithubHandler.get_team_id")
+    @patch("github_approval_checker.utils.github_handler.GithubHandler.is_user_on_org_team")
     @patch("github_approval_checker.utils.github_handler.GithubHandler.is_user_in_org")
     def test_is_authorized_admin(
             self,
             check_org_member,
-            get_team_id,
-            is_user_on_team,
+            is_user_on_org_team,
             get_user_permission
     ):
         """
@@ -414,32 +719,42 @@ class GithubHandlerUnitTests(unittest.TestCase):
         response = handler.is_authorized("user-name", "repo-owner", "repo-name", whitelist)
 
         check_org_member.assert_not_called()
-        get_team_id.assert_not_called()
-        is_user_on_team.assert_not_called()
+        is_user_on_org_team.assert_not_called()
         get_user_permission.assert_called_once_with("repo-owner/repo-name", "user-name")
         self.assertTrue(response)
 
+    def test_build_session(self):
+        """
+        Test github_handler.build_session sets auth, default headers and the pool size
+        """
+        session = github_handler.build_session(("username", "password"), 25, {"X-Extra": "extra"})
 
-class GithubResponse(object):
-    '''
-    Mock object for Github API Responses.
-    '''
-    def __init__(self, data=None, status_code=999, headers=None):
-        '''
-        Create a mock response with the given json and statuscode.
-        '''
-        self.data = data
-        self.status_code = status_code
-        self.headers = headers
+        self.assertEqual(session.auth, ("username", "password"))
+        self.assertEqual(session.headers["Accept"], "application/vnd.github.v3+json")
+        self.assertEqual(session.headers["X-Extra"], "extra")
+        self.assertEqual(session.get_adapter("https://api.github.com")._pool_maxsize, 25)
 
-    def json(self):
-        '''
-        Get the fake json response
-        '''
-        return self.data
+    @patch.dict("github_approval_checker.utils.github_handler._SHARED_HANDLERS", clear=True)
+    def test_get_shared_handler(self):
+        """
+        Test github_handler.get_shared_handler reuses one handler per set of credentials
+        """
+        first = github_handler.get_shared_handler("username", "password")
+        second = github_handler.get_shared_handler("username", "password")
+        other = github_handler.get_shared_handler("other-user", "password")
 
-    def raise_for_status(self):
-        '''
-        Fake stand in method
-        '''
-        pass
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual(first.auth, ("username", "password"))
+
+    def test_connection_stats(self):
+        """
+        Test github_handler.GithubHandler.connection_stats sums the pooled connection counters
+        """
+        handler = GithubHandler("username", "password")
+        adapter = handler.session.get_adapter("https://api.github.com")
+        pool = adapter.poolmanager.connection_from_url("https://api.github.com")
+        pool.num_requests = 7
+        pool.num_connections = 2
+
+        self.assertEqual(handler.connection_stats(), {'requests': 7, 'connections': 2, 'reused': 5})
@@ -0,0 +1,156 @@
+"""
+Unit tests for graphql_handler.py
+"""
+
+import json
+import unittest
+from mock import patch
+from github_approval_checker.utils.graphql_handler import GraphQLGithubHandler, GRAPHQL_URL
+from test.helpers import GithubResponse
+
+GRAPHQL_DATA = {
+    "repository": {
+        "config": {"text": "teams: [team-name]\nadmins: true\n"},
+        "commit": {
+            "status": {
+                "contexts": [
+                    {"context": "ci", "state": "FAILURE", "description": "desc", "targetUrl": "url"}
+                ]
+            }
+        },
+        "collaborators": {
+            "edges": [{"permission": "WRITE", "node": {"login": "User-Name"}}]
+        }
+    },
+    "organization": {
+        "teams": {"nodes": [{"slug": "team-name"}]}
+    },
+    "user": {
+        "organizations": {"nodes": [{"login": "org-name"}]}
+    }
+}
+
+
+class GraphQLGithubHandlerUnitTests(unittest.TestCase):
+    """
+    Test graphql_handler.GraphQLGithubHandler
+    """
+
+    @patch("requests.Session.request")
+    def test_prepare_review(self, session_request):
+        """
+        Test graphql_handler.GraphQLGithubHandler.prepare_review answers the review's lookups from one query
+        """
+        handler = GraphQLGithubHandler("username", "password")
+        session_request.return_value = GithubResponse(data={"data": GRAPHQL_DATA}, status_code=200)
+
+        handler.prepare_review("repo-owner/repo-name", "config-filename", "ref-name", "user-name")
+
+        self.assertEqual(session_request.call_count, 1)
+        method, url = session_request.call_args[0]
+        variables = json.loads(session_request.call_args[1]["data"])["variables"]
+        self.assertEqual((method, url), ("POST", GRAPHQL_URL))
+        self.assertEqual(variables["expression"], "HEAD:config-filename")
+        self.assertTrue(variables["withConfig"])
+
+        self.assertEqual(
+            handler.get_config("repo-owner/repo-name", "config-filename"),
+            {"teams": ["team-name"], "admins": True}
+        )
+        self.assertEqual(
+            handler.get_statuses("repo-owner/repo-name", "ref-name"),
+            [{"state": "failure", "context": "ci", "description": "desc", "target_url": "url"}]
+        )
+        self.assertTrue(handler.is_user_on_org_team("repo-owner", "team-name", "user-name"))
+        self.assertTrue(handler.is_user_in_org("org-name", "user-name"))
+        self.assertEqual(handler.get_user_permission("repo-owner/repo-name", "user-name"), "write")
+        self.assertEqual(session_request.call_count, 1)
+
+    @patch("requests.Session.request")
+    def test_falls_back_to_rest(self, session_request):
+        """
+        Test graphql_handler.GraphQLGithubHandler uses REST for anything the snapshot cannot answer
+        """
+        handler = GraphQLGithubHandler("username", "password")
+        session_request.side_effect = [
+            GithubResponse(data={"data": GRAPHQL_DATA}, status_code=200),
+            GithubResponse(status_code=404),
+            GithubResponse(data={"statuses": []}, status_code=200)
+        ]
+
+        handler.prepare_review("repo-owner/repo-name", "config-filename", "ref-name", "user-name")
+        handler.get_statuses("repo-owner/repo-name", "ref-name")
+
+        # Organizations missing from the snapshot may be private memberships, so they are checked
+        self.assertFalse(handler.is_user_in_org("other-org", "user-name"))
+        # Statuses are only served from a snapshot once
+        self.assertEqual(handler.get_statuses("repo-owner/repo-name", "ref-name"), [])
+        session_request.assert_any_call('GET', "https://api.github.com/orgs/other-org/members/user-name")
+        self.assertEqual(session_request.call_count, 3)
+
+    @patch("requests.Session.request")
+    def test_child_team_member(self, session_request):
+        """
+        Test graphql_handler.GraphQLGithubHandler asks REST about teams the query does not list, such
+        as a parent team the reviewer belongs to through a child team
+        """
+        handler = GraphQLGithubHandler("username", "password")
+        session_request.side_effect = [
+            GithubResponse(data={"data": GRAPHQL_DATA}, status_code=200),
+            GithubResponse(data={"role": "member", "state": "active"}, status_code=200)
+        ]
+
+        handler.prepare_review("repo-owner/repo-name", "config-filename", "ref-name", "user-name")
+
+        self.assertTrue(handler.is_user_on_org_team("repo-owner", "parent-team", "user-name"))
+        session_request.assert_called_with(
+            'GET', "https://api.github.com/orgs/repo-owner/teams/parent-team/memberships/user-name"
+        )
+
+    @patch("requests.Session.request")
+    def test_collaborator_not_matched(self, session_request):
+        """
+        Test graphql_handler.GraphQLGithubHandler asks REST for the permission of a reviewer missing
+        from the collaborators the query matched
+        """
+        handler = GraphQLGithubHandler("username", "password")
+        data = dict(GRAPHQL_DATA, repository=dict(
+            GRAPHQL_DATA["repository"],
+            collaborators={"edges": [{"permission": "READ", "node": {"login": "user-name-2"}}]}
+        ))
+        session_request.side_effect = [
+            GithubResponse(data={"data": data}, status_code=200),
+            GithubResponse(data={"permission": "admin"}, status_code=200)
+        ]
+
+        handler.prepare_review("repo-owner/repo-name", "config-filename", "ref-name", "user-name")
+
+        self.assertEqual(handler.get_user_permission("repo-owner/repo-name", "user-name"), "admin")
+        self.assertEqual(session_request.call_count, 2)
+
+    @patch("requests.Session.request")
+    def test_prepare_review_failed(self, session_request):
+        """
+        Test graphql_handler.GraphQLGithubHandler.prepare_review leaves everything to REST if the query fails
+        """
+        handler = GraphQLGithubHandler("username", "password")
+        session_request.return_value = GithubResponse(status_code=502)
+
+        handler.prepare_review("repo-owner/repo-name", "config-filename", "ref-name", "user-name")
+
+        self.assertEqual(len(handler.snapshots), 0)
+        self.assertEqual(len(handler.config_cache), 0)
+
+    def test_invalidate(self):
+        """
+        Test GraphQLGithubHandler forgets the snapshots of a changed membership or permission
+        """
+        handler = GraphQLGithubHandler("username", "password")
+        handler.snapshots.set(("teams", "org-name", "user-name"), frozenset(), 30)
+        handler.snapshots.set(("orgs", None, "user-name"), frozenset(), 30)
+        handler.snapshots.set(("permission", "org-name/repo", "user-name"), "admin", 30)
+
+        self.assertEqual(handler.invalidate_memberships("org-name", "team-name", "user-name"), 2)
+        self.assertEqual(handler.invalidate_permission("org-name/repo", "user-name"), 1)
+        self.assertEqual(handler.invalidate_permission("org-name/repo", "user-name"), 0)
+        self.assertEqual(len(handler.snapshots), 0)
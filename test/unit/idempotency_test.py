@@ -0,0 +1,113 @@
+"""
+Unit tests for idempotency.py
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple
+from github_approval_checker.utils import idempotency
+from github_approval_checker.utils.idempotency import MemoryIdempotencyStore, SQLiteIdempotencyStore
+
+Event = namedtuple('Event', 'repo_full_name commit_id reviewer')
+
+
+class FakeClock(object):
+    """
+    A clock that only moves when told to.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class IdempotencyUnitTests(unittest.TestCase):
+    """
+    Test the idempotency stores
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def check_store(self, store):
+        """
+        Checks that a store claims keys once, until they are released or expire.
+        """
+        self.assertTrue(store.claim(["delivery:1", "review:a"], 60))
+        self.assertFalse(store.claim(["delivery:2", "review:a"], 60))
+        self.assertTrue(store.claim(["delivery:2", "review:b"], 60))
+
+        store.release(["delivery:1", "review:a"])
+        self.assertTrue(store.claim(["delivery:1", "review:a"], 60))
+
+        self.clock.now += 60
+        self.assertTrue(store.claim(["delivery:1", "review:a"], 60))
+
+    def test_memory_store(self):
+        """
+        Test idempotency.MemoryIdempotencyStore
+        """
+        self.check_store(MemoryIdempotencyStore(clock=self.clock))
+
+    def test_memory_store_bounded(self):
+        """
+        Test idempotency.MemoryIdempotencyStore forgets its least recently used keys
+        """
+        store = MemoryIdempotencyStore(max_entries=2, clock=self.clock)
+        store.claim(["a"], 60)
+        store.claim(["b"], 60)
+        store.claim(["c"], 60)
+
+        self.assertTrue(store.claim(["a"], 60))
+
+    def test_sqlite_store(self):
+        """
+        Test idempotency.SQLiteIdempotencyStore
+        """
+        self.check_store(SQLiteIdempotencyStore(":memory:", clock=self.clock))
+
+    def test_sqlite_store_bounded(self):
+        """
+        Test idempotency.SQLiteIdempotencyStore forgets the keys expiring soonest
+        """
+        store = SQLiteIdempotencyStore(":memory:", max_entries=2, clock=self.clock)
+        store.claim(["a"], 10)
+        store.claim(["b"], 60)
+        store.claim(["c"], 60)
+
+        self.assertTrue(store.claim(["a"], 60))
+        self.assertFalse(store.claim(["c"], 60))
+
+    def test_sqlite_store_shared(self):
+        """
+        Test idempotency.SQLiteIdempotencyStore shares keys through its database file
+        """
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "idempotency.db")
+            SQLiteIdempotencyStore(path).claim(["delivery:1"], 60)
+
+            self.assertFalse(SQLiteIdempotencyStore(path).claim(["delivery:1"], 60))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_review_keys(self):
+        """
+        Test idempotency.review_keys
+        """
+        event = Event("org/repo", "sha", "reviewer")
+
+        self.assertEqual(
+            idempotency.review_keys("guid", event), ["delivery:guid", "review:org/repo:sha:reviewer"]
+        )
+        self.assertEqual(idempotency.review_keys(None, event), ["review:org/repo:sha:reviewer"])
+
+    def test_get_shared_store(self):
+        """
+        Test idempotency.get_shared_store returns one store per backend
+        """
+        self.assertIs(idempotency.get_shared_store("memory"), idempotency.get_shared_store("memory"))
+        self.assertRaises(ValueError, idempotency.get_shared_store, "redis")
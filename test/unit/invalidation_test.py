@@ -0,0 +1,130 @@
+"""
+Unit tests for invalidation.py
+"""
+
+import unittest
+from mock import MagicMock, call
+from github_approval_checker.utils import invalidation
+
+
+def push_payload(ref="refs/heads/main", commits=None, forced=False):
+    """
+    Builds a push event payload.
+    """
+    return {
+        "ref": ref,
+        "forced": forced,
+        "repository": {"full_name": "owner/repo", "default_branch": "main"},
+        "commits": commits if commits is not None else [
+            {"added": ["new.py"], "modified": ["approval-checker-config.yml"], "removed": []},
+            {"added": [], "modified": [], "removed": ["old.py"]}
+        ]
+    }
+
+
+class InvalidationUnitTests(unittest.TestCase):
+    """
+    Test invalidation.py
+    """
+
+    def setUp(self):
+        self.handler = MagicMock()
+        self.handler.invalidate_config.return_value = 1
+        self.handler.invalidate_memberships.return_value = 1
+        self.handler.invalidate_permission.return_value = 1
+
+    def test_changed_files(self):
+        """
+        Test invalidation.changed_files only lists the files of pushes it has every commit of
+        """
+        self.assertEqual(
+            invalidation.changed_files(push_payload()), {"new.py", "approval-checker-config.yml", "old.py"}
+        )
+        self.assertIsNone(invalidation.changed_files(push_payload(forced=True)))
+        self.assertIsNone(invalidation.changed_files(push_payload(commits=[{}] * 20)))
+
+    def test_push(self):
+        """
+        Test invalidation.invalidate only forgets configurations pushed to the default branch
+        """
+        self.assertEqual(invalidation.invalidate(self.handler, "push", push_payload()), 1)
+        self.handler.invalidate_config.assert_called_once_with(
+            "owner/repo", {"new.py", "approval-checker-config.yml", "old.py"}
+        )
+
+        self.handler.reset_mock()
+        self.assertEqual(invalidation.invalidate(self.handler, "push", push_payload(ref="refs/heads/dev")), 0)
+        self.handler.invalidate_config.assert_not_called()
+
+    def test_membership(self):
+        """
+        Test invalidation.invalidate forgets the members of a team and of its parent
+        """
+        data = {
+            "action": "removed",
+            "scope": "team",
+            "member": {"login": "user-name"},
+            "team": {"slug": "child", "parent": {"slug": "parent"}},
+            "organization": {"login": "org-name"}
+        }
+
+        self.assertEqual(invalidation.invalidate(self.handler, "membership", data), 2)
+        self.assertEqual(self.handler.invalidate_memberships.call_args_list, [
+            call("org-name", "child", "user-name"),
+            call("org-name", "parent", "user-name")
+        ])
+
+    def test_team(self):
+        """
+        Test invalidation.invalidate forgets a changed team, or every team of an edited one's organization
+        """
+        data = {"action": "deleted", "team": {"slug": "team-name"}, "organization": {"login": "org-name"}}
+        invalidation.invalidate(self.handler, "team", data)
+        self.handler.invalidate_memberships.assert_called_once_with("org-name", "team-name")
+
+        self.handler.reset_mock()
+        data["action"] = "edited"
+        invalidation.invalidate(self.handler, "team", data)
+        self.handler.invalidate_memberships.assert_called_once_with("org-name")
+
+        self.handler.reset_mock()
+        data["action"] = "added_to_repository"
+        self.assertEqual(invalidation.invalidate(self.handler, "team", data), 0)
+        self.handler.invalidate_memberships.assert_not_called()
+
+    def test_organization(self):
+        """
+        Test invalidation.invalidate forgets an organization's members when they change
+        """
+        data = {
+            "action": "member_removed",
+            "membership": {"user": {"login": "user-name"}},
+            "organization": {"login": "org-name"}
+        }
+        invalidation.invalidate(self.handler, "organization", data)
+        self.handler.invalidate_memberships.assert_called_once_with("org-name", user_name="user-name")
+
+        self.handler.reset_mock()
+        data = {
+            "action": "renamed",
+            "changes": {"login": {"from": "old-name"}},
+            "organization": {"login": "new-name"}
+        }
+        self.assertEqual(invalidation.invalidate(self.handler, "organization", data), 2)
+        self.handler.invalidate_memberships.assert_called_with("old-name", user_name=None)
+
+        self.handler.reset_mock()
+        data = {"action": "member_invited", "organization": {"login": "org-name"}}
+        self.assertEqual(invalidation.invalidate(self.handler, "organization", data), 0)
+
+    def test_member(self):
+        """
+        Test invalidation.invalidate forgets the permission of a changed collaborator
+        """
+        data = {
+            "action": "edited",
+            "member": {"login": "user-name"},
+            "repository": {"full_name": "owner/repo"}
+        }
+        invalidation.invalidate(self.handler, "member", data)
+        self.handler.invalidate_permission.assert_called_once_with("owner/repo", "user-name")
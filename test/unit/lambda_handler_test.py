@@ -0,0 +1,191 @@
+"""
+Unit tests for lambda_handler.py
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from mock import patch
+from github_approval_checker import lambda_handler
+
+SECRET = "webhook-secret"
+
+
+def review_payload(state="approved"):
+    """
+    Builds a PullRequestReview event payload.
+    """
+    return {
+        "action": "submitted",
+        "pull_request": {"state": "open", "head": {"sha": "review-commit-id"}},
+        "repository": {
+            "name": "repo-name",
+            "full_name": "repo-full-name",
+            "owner": {"login": "repo-owner"}
+        },
+        "review": {
+            "state": state,
+            "commit_id": "review-commit-id",
+            "user": {"login": "review-user-login"}
+        }
+    }
+
+
+def proxy_event(body, path="/hooks/pullRequestReview", method="POST"):
+    """
+    Builds an API Gateway proxy event carrying a webhook delivery signed with SECRET.
+    """
+    signature = hmac.new(SECRET.encode("utf-8"), body.encode("utf-8"), hashlib.sha256).hexdigest()
+    return {
+        "path": path,
+        "httpMethod": method,
+        "headers": {"x-hub-signature-256": "sha256=" + signature},
+        "body": body,
+        "isBase64Encoded": False
+    }
+
+
+@patch.dict("os.environ", {"webhook_secret": SECRET, "idempotency_backend": "none"})
+class LambdaHandlerUnitTests(unittest.TestCase):
+    """
+    Test lambda_handler.handler
+    """
+
+    @patch("github_approval_checker.utils.github_handler.get_shared_handler")
+    @patch("github_approval_checker.utils.util.validate_config")
+    def test_handler(self, validate_config, get_handler):
+        """
+        Test lambda_handler.handler processes a review
+        """
+        validate_config.return_value = None
+        handler = get_handler.return_value
+        handler.get_config.return_value = {"users": ["review-user-login"]}
+        handler.get_statuses.return_value = [{
+            "state": "failure",
+            "context": "context1",
+            "target_url": "fake://status_target_1",
+            "description": "Status Check 1"
+        }]
+        handler.is_authorized.return_value = True
+        handler.post_statuses.return_value = {"context1": 201}
+        body = json.dumps(review_payload())
+
+        response = lambda_handler.handler(proxy_event(body), None)
+
+        handler.post_statuses.assert_called_once_with(
+            "repo-full-name", "review-commit-id", handler.get_statuses.return_value, "review-user-login"
+        )
+        self.assertEqual(response["statusCode"], 200)
+        self.assertEqual(json.loads(response["body"]), {"status": "OK", "overwritten_contexts": ["context1"]})
+
+    @patch("github_approval_checker.api.webhook.receive_review")
+    def test_handler_delivery_id(self, receive_review):
+        """
+        Test lambda_handler.handler passes the delivery header on for duplicate detection
+        """
+        receive_review.return_value = ({"status": "OK"}, 200)
+        event = proxy_event(json.dumps(review_payload()))
+        event["headers"]["X-GitHub-Delivery"] = "delivery-1"
+
+        lambda_handler.handler(event, None)
+
+        self.assertEqual(receive_review.call_args[0][1], "delivery-1")
+
+    @patch("github_approval_checker.api.webhook.receive_review")
+    def test_handler_traced(self, receive_review):
+        """
+        Test lambda_handler.handler traces the delivery when trace_path is set
+        """
+        receive_review.return_value = ({"status": "OK"}, 200)
+        event = proxy_event(json.dumps(review_payload()))
+        event["headers"]["X-GitHub-Delivery"] = "delivery-1"
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "traces.jsonl")
+        try:
+            with patch.dict("os.environ", {"trace_path": path}):
+                lambda_handler.handler(event, None)
+            with open(path) as trace_file:
+                trace = json.loads(trace_file.read())
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(trace["trace_id"], "delivery-1")
+        self.assertEqual([span["name"] for span in trace["spans"]], ["verify_signature", "parse_payload"])
+
+    @patch("github_approval_checker.utils.github_handler.get_shared_handler")
+    def test_handler_dropped(self, get_handler):
+        """
+        Test lambda_handler.handler answers dropped events without creating a GitHub handler
+        """
+        body = json.dumps(review_payload("commented"))
+        event = proxy_event(body)
+        event["body"] = base64.b64encode(body.encode("utf-8")).decode("ascii")
+        event["isBase64Encoded"] = True
+
+        response = lambda_handler.handler(event, None)
+
+        get_handler.assert_not_called()
+        self.assertEqual(response["statusCode"], 200)
+        self.assertEqual(json.loads(response["body"])["message"], "Review state is not approved")
+
+    @patch("json.loads")
+    def test_handler_bad_signature(self, loads):
+        """
+        Test lambda_handler.handler rejects a forged delivery before parsing its body
+        """
+        event = proxy_event(json.dumps(review_payload()))
+        event["body"] = event["body"].replace("approved", "dismissed")
+
+        response = lambda_handler.handler(event, None)
+
+        loads.assert_not_called()
+        self.assertEqual(response["statusCode"], 400)
+        self.assertIn("Signature Validation Error", response["body"])
+
+    @patch.dict("os.environ", {"processing_mode": "queue"})
+    @patch("github_approval_checker.api.queue_worker.enqueue_review")
+    def test_handler_queue_mode(self, enqueue_review):
+        """
+        Test lambda_handler.handler rejects reviews in the queue processing mode instead of queuing them
+        """
+        response = lambda_handler.handler(proxy_event(json.dumps(review_payload())), None)
+
+        enqueue_review.assert_not_called()
+        self.assertEqual(response["statusCode"], 500)
+        self.assertEqual(json.loads(response["body"])["message"], lambda_handler.QUEUE_MODE_ERROR)
+
+    def test_handler_missing_fields(self):
+        """
+        Test lambda_handler.handler rejects payloads without the required fields
+        """
+        response = lambda_handler.handler(proxy_event(json.dumps({"action": "submitted"})), None)
+
+        self.assertEqual(response["statusCode"], 400)
+        self.assertEqual(
+            json.loads(response["body"])["message"], "Missing required fields: pull_request, review"
+        )
+
+    @patch("github_approval_checker.utils.github_handler.get_shared_handler")
+    def test_handler_invalidation(self, get_handler):
+        """
+        Test lambda_handler.handler routes invalidating events to the handler's caches
+        """
+        get_handler.return_value.invalidate_permission.return_value = 0
+        body = json.dumps({"member": {"login": "user-name"}, "repository": {"full_name": "owner/repo"}})
+
+        response = lambda_handler.handler(proxy_event(body, path="/hooks/member"), None)
+
+        get_handler.return_value.invalidate_permission.assert_called_once_with("owner/repo", "user-name")
+        self.assertEqual(response["statusCode"], 200)
+
+    def test_handler_routes(self):
+        """
+        Test lambda_handler.handler only serves POST requests to the webhook routes
+        """
+        self.assertEqual(lambda_handler.handler(proxy_event("", path="/other"), None)["statusCode"], 404)
+        self.assertEqual(lambda_handler.handler(proxy_event("", method="GET"), None)["statusCode"], 405)
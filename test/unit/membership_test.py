@@ -0,0 +1,162 @@
+"""
+Unit tests for membership.py
+"""
+
+import unittest
+from mock import MagicMock
+from github_approval_checker.utils.exceptions import APIError, RateLimitError
+from github_approval_checker.utils.membership import MembershipDirectory
+from github_approval_checker.utils.rate_limit import PRIORITY_OPTIONAL
+from github_approval_checker.utils.shared_cache import DEFAULT_LOCAL_TTL, MemoryBackend
+
+
+class FakeClock(object):
+    """
+    A clock that only moves when told to.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def members(*logins):
+    """
+    Builds the side effect of a member list call, returning a fresh generator for each call.
+    """
+    return lambda *args, **kwargs: iter([{"login": login} for login in logins])
+
+
+class MembershipDirectoryUnitTests(unittest.TestCase):
+    """
+    Test membership.MembershipDirectory
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.handler = MagicMock()
+        self.handler.get_org_members.side_effect = members("Org-Member", "other")
+        self.handler.get_org_team_members.side_effect = members("team-member")
+        self.directory = MembershipDirectory(
+            self.handler, 600, refresh_interval=60, max_members=3, clock=self.clock, background=False
+        )
+
+    def test_lookup(self):
+        """
+        Test MembershipDirectory answers lookups from the loaded member lists only
+        """
+        self.directory.track([("org", "org-name"), ("team", "owner/team-name")])
+        self.assertIsNone(self.directory.lookup(("org", "org-name"), "org-member"))
+
+        self.assertEqual(self.directory.refresh(), 2)
+
+        self.assertTrue(self.directory.lookup(("org", "org-name"), "org-member"))
+        self.assertFalse(self.directory.lookup(("org", "org-name"), "team-member"))
+        self.assertTrue(self.directory.lookup(("team", "owner/team-name"), "Team-Member"))
+        self.handler.get_org_members.assert_called_once_with("org-name", priority=PRIORITY_OPTIONAL)
+        self.handler.get_org_team_members.assert_called_once_with(
+            "owner", "team-name", priority=PRIORITY_OPTIONAL
+        )
+        self.assertEqual(self.directory.snapshot()["hits"], 3)
+
+    def test_refresh_incremental(self):
+        """
+        Test MembershipDirectory.refresh only reloads the lists expiring before the next refresh
+        """
+        self.directory.track([("org", "org-name")])
+        self.directory.refresh()
+        self.clock.now += 300
+        self.directory.track([("team", "owner/team-name")])
+
+        self.assertEqual(self.directory.refresh(), 1)
+        self.assertEqual(self.handler.get_org_members.call_count, 1)
+
+        self.clock.now += 250
+        self.assertEqual(self.directory.refresh(), 1)
+        self.assertEqual(self.handler.get_org_members.call_count, 2)
+
+        self.clock.now += 600
+        self.assertIsNone(self.directory.lookup(("team", "owner/team-name"), "team-member"))
+
+    def test_oversized(self):
+        """
+        Test MembershipDirectory leaves groups larger than max_members to live checks
+        """
+        self.handler.get_org_members.side_effect = members("a", "b", "c", "d")
+        self.directory.track([("org", "big-org")])
+        self.directory.refresh()
+
+        self.assertIsNone(self.directory.lookup(("org", "big-org"), "a"))
+        self.directory.track([("org", "big-org")])
+        self.assertEqual(self.directory.snapshot()["tracked"], 0)
+
+    def test_load_errors(self):
+        """
+        Test MembershipDirectory stops refreshing when the rate limit budget runs out, and skips
+        lists that cannot be loaded
+        """
+        self.handler.get_org_members.side_effect = APIError("api-error")
+        self.directory.track([("org", "org-name"), ("team", "owner/team-name")])
+        self.assertEqual(self.directory.refresh(), 2)
+        self.assertIsNone(self.directory.lookup(("org", "org-name"), "org-member"))
+        self.assertEqual(self.directory.snapshot()["load_errors"], 1)
+
+        self.handler.get_org_members.side_effect = RateLimitError("budget exhausted")
+        self.clock.now += 600
+        self.assertEqual(self.directory.refresh(), 0)
+        self.assertEqual(self.handler.get_org_team_members.call_count, 1)
+
+    def test_max_groups(self):
+        """
+        Test MembershipDirectory.track drops the least recently tracked groups
+        """
+        directory = MembershipDirectory(self.handler, 600, max_groups=2, background=False)
+        directory.track([("org", "a"), ("org", "b")])
+        directory.track([("org", "a"), ("org", "c")])
+
+        self.assertEqual(directory.refresh(), 2)
+        self.assertEqual(
+            sorted(args[0] for args, _ in self.handler.get_org_members.call_args_list), ["a", "c"]
+        )
+
+    def test_invalidate(self):
+        """
+        Test MembershipDirectory.invalidate forgets a team's list, or an organization's and its teams'
+        """
+        self.directory.track([("org", "Org-Name"), ("team", "org-name/team-a"), ("team", "org-name/team-b")])
+        self.directory.refresh()
+
+        self.assertEqual(self.directory.invalidate("org-name", "Team-A"), 1)
+        self.assertIsNone(self.directory.lookup(("team", "org-name/team-a"), "team-member"))
+        self.assertTrue(self.directory.lookup(("team", "org-name/team-b"), "team-member"))
+
+        self.assertEqual(self.directory.invalidate("org-name"), 2)
+        self.assertIsNone(self.directory.lookup(("org", "Org-Name"), "org-member"))
+        self.assertEqual(self.directory.refresh(), 3)
+
+    def test_invalidate_shared(self):
+        """
+        Test MembershipDirectory.invalidate forgets lists loaded by other directories sharing a backend
+        """
+        backend = MemoryBackend(clock=self.clock)
+        first, second, third = [
+            MembershipDirectory(self.handler, 600, clock=self.clock, background=False, backend=backend)
+            for _ in range(3)
+        ]
+        groups = [("org", "Org-Name"), ("team", "org-name/team-a"), ("team", "org-name/team-b")]
+        first.track(groups)
+        self.assertEqual(first.refresh(), 3)
+        self.assertTrue(second.lookup(("team", "org-name/team-a"), "team-member"))
+        self.assertTrue(second.lookup(("team", "org-name/team-b"), "team-member"))
+
+        # The third directory never loaded the team, but still forgets it for the others
+        self.assertEqual(third.invalidate("Org-Name", "team-a"), 1)
+        self.clock.now += DEFAULT_LOCAL_TTL
+        self.assertIsNone(second.lookup(("team", "org-name/team-a"), "team-member"))
+        self.assertTrue(second.lookup(("team", "org-name/team-b"), "team-member"))
+
+        self.assertEqual(third.invalidate("org-name"), 0)
+        self.clock.now += DEFAULT_LOCAL_TTL
+        self.assertIsNone(second.lookup(("team", "org-name/team-b"), "team-member"))
+        self.assertIsNone(first.lookup(("org", "org-name"), "org-member"))
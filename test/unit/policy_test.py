@@ -0,0 +1,112 @@
+"""
+Unit tests for policy.py
+"""
+
+import unittest
+from mock import MagicMock
+from github_approval_checker.utils import policy
+from github_approval_checker.utils.exceptions import APIError
+
+
+class AuthorizationPolicyUnitTests(unittest.TestCase):
+    """
+    Test policy.AuthorizationPolicy
+    """
+
+    def test_user_checked_first(self):
+        """
+        Test policy.AuthorizationPolicy.is_authorized grants whitelisted users without any API call
+        """
+        handler = MagicMock()
+        auth_policy = policy.AuthorizationPolicy(
+            {"orgs": ["org-name"], "teams": ["team-name"], "users": ["user-name"], "admins": True},
+            policy.CheckStats()
+        )
+
+        self.assertTrue(auth_policy.is_authorized(handler, "user-name", "repo-owner", "repo-name"))
+        self.assertEqual(handler.mock_calls, [])
+
+    def test_network_checks_ordered_by_cost(self):
+        """
+        Test policy.AuthorizationPolicy.network_checks puts the checks that grant most cheaply first
+        """
+        stats = policy.CheckStats()
+        for _ in range(10):
+            stats.record(('org', 'org-name'), 0.2, False)
+            stats.record(('team', 'repo-owner/team-name'), 0.05, True)
+        auth_policy = policy.AuthorizationPolicy(
+            {"orgs": ["org-name"], "teams": ["team-name"], "admins": True},
+            stats
+        )
+
+        self.assertEqual(
+            auth_policy.network_checks("repo-owner", "repo-name"),
+            [('team', 'repo-owner/team-name'), ('admin', 'repo-owner/repo-name'), ('org', 'org-name')]
+        )
+
+    def test_membership_directory(self):
+        """
+        Test policy.AuthorizationPolicy.is_authorized answers from the membership directory first,
+        and only checks the groups it has not loaded live
+        """
+        handler = MagicMock()
+        handler.is_user_on_org_team.return_value = True
+        directory = MagicMock()
+        directory.lookup.side_effect = lambda check, username: {("org", "org-name"): False}.get(check)
+        auth_policy = policy.AuthorizationPolicy(
+            {"orgs": ["org-name"], "teams": ["team-name"]},
+            policy.CheckStats()
+        )
+
+        self.assertTrue(auth_policy.is_authorized(handler, "user-name", "repo-owner", "repo-name", directory))
+
+        directory.track.assert_called_once_with([("org", "org-name"), ("team", "repo-owner/team-name")])
+        handler.is_user_in_org.assert_not_called()
+        handler.is_user_on_org_team.assert_called_once_with("repo-owner", "team-name", "user-name")
+
+        directory.lookup.side_effect = lambda check, username: check == ("team", "repo-owner/team-name")
+        handler.reset_mock()
+        self.assertTrue(auth_policy.is_authorized(handler, "user-name", "repo-owner", "repo-name", directory))
+        self.assertEqual(handler.mock_calls, [])
+
+    def test_stops_at_first_grant(self):
+        """
+        Test policy.AuthorizationPolicy.is_authorized stops at the first check that grants
+        """
+        handler = MagicMock()
+        handler.is_user_on_org_team.side_effect = APIError("api-error")
+        handler.is_user_in_org.return_value = True
+        stats = policy.CheckStats()
+        stats.record(('team', 'repo-owner/team-name'), 0.01, True)
+        auth_policy = policy.AuthorizationPolicy(
+            {"orgs": ["org-name"], "teams": ["team-name"], "admins": True},
+            stats
+        )
+
+        self.assertTrue(auth_policy.is_authorized(handler, "user-name", "repo-owner", "repo-name"))
+        handler.is_user_on_org_team.assert_called_once_with("repo-owner", "team-name", "user-name")
+        handler.is_user_in_org.assert_called_once_with("org-name", "user-name")
+        handler.get_user_permission.assert_not_called()
+
+    def test_admin_check(self):
+        """
+        Test policy.AuthorizationPolicy.is_authorized with a non-admin user
+        """
+        handler = MagicMock()
+        handler.get_user_permission.return_value = "write"
+        auth_policy = policy.AuthorizationPolicy({"admins": True}, policy.CheckStats())
+
+        self.assertFalse(auth_policy.is_authorized(handler, "user-name", "repo-owner", "repo-name"))
+        handler.get_user_permission.assert_called_once_with("repo-owner/repo-name", "user-name")
+
+    def test_compile_policy(self):
+        """
+        Test policy.compile_policy reuses the policy compiled for an identical configuration
+        """
+        first = policy.compile_policy({"orgs": ["org-name"], "users": ["user-name"]})
+        second = policy.compile_policy({"users": ["user-name"], "orgs": ["org-name"]})
+        other = policy.compile_policy({"orgs": ["org-name"]})
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual(first.users, frozenset(["user-name"]))
@@ -0,0 +1,53 @@
+"""
+Unit tests for processing.py
+"""
+
+import unittest
+from mock import MagicMock, patch
+from github_approval_checker.api import processing
+
+KEYS = ["delivery:1", "review:org/repo:sha:user"]
+
+
+class ProcessingUnitTests(unittest.TestCase):
+    """
+    Test processing.process_delivery
+    """
+
+    def setUp(self):
+        self.store = MagicMock()
+
+    @patch("github_approval_checker.api.review_processor.process_review")
+    def test_process_delivery(self, process_review):
+        """
+        Test processing.process_delivery keeps the keys of reviews that overwrote statuses
+        """
+        process_review.return_value = ({'status': 'OK', 'overwritten_contexts': ['ci']}, 200)
+        get_api_handler = MagicMock()
+
+        response = processing.process_delivery({"review": 1}, get_api_handler, self.store, KEYS)
+
+        self.assertEqual(process_review.call_args[0][:2], (get_api_handler.return_value, {"review": 1}))
+        self.assertEqual(response, process_review.return_value)
+        self.store.release.assert_not_called()
+
+    @patch("github_approval_checker.api.review_processor.process_review")
+    def test_process_delivery_unfinished(self, process_review):
+        """
+        Test processing.process_delivery releases the review key of reviews that overwrote nothing,
+        and every key of failed reviews
+        """
+        process_review.side_effect = [
+            ({'status': 'OK'}, 200),
+            ({'status': 'OK', 'failed_contexts': ['ci']}, 200),
+            ({'status': 'Rate Limited'}, 503),
+            Exception("boom")
+        ]
+
+        for _ in range(3):
+            processing.process_delivery({"review": 1}, MagicMock(), self.store, KEYS)
+        with self.assertRaises(Exception):
+            processing.process_delivery({"review": 1}, MagicMock(), self.store, KEYS)
+
+        released = [call[0][0] for call in self.store.release.call_args_list]
+        self.assertEqual(released, [KEYS[1:], KEYS, KEYS, KEYS])
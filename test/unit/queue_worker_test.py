@@ -0,0 +1,145 @@
+"""
+Unit tests for queue_worker.py
+"""
+
+import threading
+import unittest
+from mock import MagicMock, patch
+from github_approval_checker.api import queue_worker
+from github_approval_checker.api.queue_worker import QueueWorker
+from github_approval_checker.utils.work_queue import WorkQueue
+
+
+class FakeClock(object):
+    """
+    A clock that only moves when told to.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class QueueWorkerUnitTests(unittest.TestCase):
+    """
+    Test queue_worker.QueueWorker
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.queue = WorkQueue(':memory:', max_attempts=2, clock=self.clock)
+        self.process = MagicMock(return_value=({'status': 'OK'}, 200))
+        self.worker = QueueWorker(self.queue, self.process, workers=1, retry_delay=5)
+
+    def test_run_once(self):
+        """
+        Test queue_worker.QueueWorker.run_once processes an item and records its lag
+        """
+        self.queue.put({"review": 1})
+        self.clock.now += 3
+
+        self.assertTrue(self.worker.run_once())
+        self.assertFalse(self.worker.run_once())
+
+        self.process.assert_called_once_with({"review": 1})
+        metrics = self.worker.metrics()
+        self.assertEqual((metrics["depth"], metrics["processed"], metrics["last_lag"]), (0, 1, 3))
+
+    def test_retries(self):
+        """
+        Test queue_worker.QueueWorker.run_once retries server errors and exceptions, then gives up
+        """
+        self.process.side_effect = [({'status': 'Rate Limited'}, 503), Exception("boom")]
+        self.queue.put({"review": 1})
+
+        self.worker.run_once()
+        self.assertFalse(self.worker.run_once())
+        self.clock.now += 5
+        self.worker.run_once()
+
+        metrics = self.worker.metrics()
+        self.assertEqual((metrics["retried"], metrics["given_up"], metrics["dead"]), (1, 1, 1))
+
+    def test_retries_failed_contexts(self):
+        """
+        Test queue_worker.QueueWorker.run_once retries reviews whose statuses failed to be overwritten
+        """
+        self.process.side_effect = [
+            ({'status': 'OK', 'failed_contexts': ['ci']}, 200),
+            ({'status': 'OK', 'overwritten_contexts': ['ci']}, 200)
+        ]
+        self.queue.put({"review": 1})
+
+        self.worker.run_once()
+        self.clock.now += 5
+        self.worker.run_once()
+
+        metrics = self.worker.metrics()
+        self.assertEqual((metrics["retried"], metrics["processed"], metrics["depth"]), (1, 1, 0))
+
+    def test_start_stop(self):
+        """
+        Test queue_worker.QueueWorker drains the queue from its threads
+        """
+        processed = threading.Event()
+
+        def process(_payload):
+            """
+            Signals that the item was processed.
+            """
+            processed.set()
+            return ({'status': 'OK'}, 200)
+
+        worker = QueueWorker(WorkQueue(':memory:'), process, workers=2, poll_interval=0.01)
+        worker.queue.put({"review": 1})
+
+        worker.start()
+        worker.start()
+        try:
+            self.assertTrue(processed.wait(5))
+        finally:
+            worker.stop(5)
+
+        self.assertEqual(worker.queue.stats()["depth"], 0)
+
+    @patch("github_approval_checker.api.queue_worker.get_shared_worker")
+    def test_enqueue_review(self, get_shared_worker):
+        """
+        Test queue_worker.enqueue_review queues the event and answers with a 202
+        """
+        worker = get_shared_worker.return_value
+
+        response = queue_worker.enqueue_review({"review": 1}, idempotency_keys=("delivery:1",))
+
+        worker.queue.put.assert_called_once_with(
+            {"data": {"review": 1}, "idempotency_keys": ["delivery:1"], "delivery_id": None}
+        )
+        worker.start.assert_called_once_with()
+        self.assertEqual(response[1], 202)
+
+    @patch("github_approval_checker.api.settings.idempotency_store")
+    @patch("github_approval_checker.api.settings.get_api_handler")
+    @patch("github_approval_checker.api.review_processor.process_review")
+    def test_process_queued_review(self, process_review, _get_api_handler, idempotency_store):
+        """
+        Test queue_worker.process_queued_review releases the idempotency keys of failed reviews,
+        and the review key of reviews that overwrote nothing
+        """
+        store = idempotency_store.return_value
+        process_review.side_effect = [
+            ({'status': 'OK', 'overwritten_contexts': ['ci']}, 200),
+            ({'status': 'OK'}, 200),
+            ({'status': 'OK', 'failed_contexts': ['ci']}, 200),
+            ({'status': 'Rate Limited'}, 503)
+        ]
+        keys = ["delivery:1", "review:org/repo:sha:user"]
+        payload = {"data": {"review": 1}, "idempotency_keys": keys}
+
+        queue_worker.process_queued_review(payload)
+        store.release.assert_not_called()
+        for _ in range(3):
+            queue_worker.process_queued_review(payload)
+
+        self.assertEqual([call[0][0] for call in store.release.call_args_list], [keys[1:], keys, keys])
+        self.assertEqual(process_review.call_args[0][1], {"review": 1})
@@ -0,0 +1,154 @@
+"""
+Unit tests for rate_limit.py
+"""
+
+import unittest
+from github_approval_checker.utils.exceptions import RateLimitError
+from github_approval_checker.utils.rate_limit import (
+    RateLimitTracker,
+    get_shared_tracker,
+    is_rate_limited,
+    PRIORITY_WRITE,
+    PRIORITY_READ,
+    PRIORITY_OPTIONAL
+)
+from test.helpers import GithubResponse
+
+
+class FakeClock(object):
+    """
+    A clock that only moves when told to.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def budget_headers(remaining, reset, resource='core'):
+    """
+    Builds the rate limit headers of a GitHub response.
+    """
+    return {
+        'X-RateLimit-Limit': '5000',
+        'X-RateLimit-Remaining': str(remaining),
+        'X-RateLimit-Reset': str(reset),
+        'X-RateLimit-Resource': resource
+    }
+
+
+class RateLimitTrackerUnitTests(unittest.TestCase):
+    """
+    Test rate_limit.RateLimitTracker
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.tracker = RateLimitTracker(read_reserve=10, optional_reserve=50, max_wait=5, clock=self.clock)
+
+    def test_unknown_budget(self):
+        """
+        Test rate_limit.RateLimitTracker allows every request before a budget is known
+        """
+        self.assertIsNone(self.tracker.remaining())
+        self.assertTrue(self.tracker.allows(PRIORITY_OPTIONAL))
+        self.assertEqual(self.tracker.acquire(PRIORITY_OPTIONAL), 0)
+
+    def test_update(self):
+        """
+        Test rate_limit.RateLimitTracker.update records each resource separately
+        """
+        self.tracker.update(budget_headers(30, 2000))
+        self.tracker.update(budget_headers(4000, 2000, resource='graphql'))
+
+        self.assertEqual(self.tracker.remaining(), 30)
+        self.assertEqual(self.tracker.remaining('graphql'), 4000)
+        self.assertEqual(
+            self.tracker.snapshot(),
+            {'deferred': 0, 'core_remaining': 30, 'graphql_remaining': 4000}
+        )
+
+    def test_expired_budget(self):
+        """
+        Test rate_limit.RateLimitTracker forgets a budget once its window has reset
+        """
+        self.tracker.update(budget_headers(0, 1010))
+        self.clock.now = 1011
+
+        self.assertIsNone(self.tracker.remaining())
+        self.assertTrue(self.tracker.allows(PRIORITY_READ))
+
+    def test_allows_by_priority(self):
+        """
+        Test rate_limit.RateLimitTracker.allows keeps the last requests for higher priorities
+        """
+        self.tracker.update(budget_headers(30, 2000))
+
+        self.assertTrue(self.tracker.allows(PRIORITY_WRITE))
+        self.assertTrue(self.tracker.allows(PRIORITY_READ))
+        self.assertFalse(self.tracker.allows(PRIORITY_OPTIONAL))
+
+    def test_acquire_counts_requests(self):
+        """
+        Test rate_limit.RateLimitTracker.acquire counts requests against the budget
+        """
+        self.tracker.update(budget_headers(12, 2000))
+
+        self.assertEqual(self.tracker.acquire(PRIORITY_READ), 0)
+        self.assertEqual(self.tracker.acquire(PRIORITY_READ), 0)
+        self.assertEqual(self.tracker.remaining(), 10)
+        self.assertFalse(self.tracker.allows(PRIORITY_READ))
+        self.assertTrue(self.tracker.allows(PRIORITY_WRITE))
+
+    def test_acquire_waits_for_reset(self):
+        """
+        Test rate_limit.RateLimitTracker.acquire waits for a reset that is close enough
+        """
+        self.tracker.update(budget_headers(5, 1003))
+
+        self.assertEqual(self.tracker.acquire(PRIORITY_READ), 3)
+        self.assertEqual(self.tracker.acquire(PRIORITY_WRITE), 0)
+
+    def test_acquire_defers(self):
+        """
+        Test rate_limit.RateLimitTracker.acquire raises RateLimitError rather than waiting too long
+        """
+        self.tracker.update(budget_headers(5, 1600))
+
+        with self.assertRaises(RateLimitError) as context:
+            self.tracker.acquire(PRIORITY_READ)
+
+        self.assertEqual(context.exception.retry_after, 600)
+        self.assertEqual(context.exception.response[1], 503)
+        self.assertEqual(self.tracker.snapshot()['deferred'], 1)
+
+    def test_retry_after(self):
+        """
+        Test rate_limit.RateLimitTracker blocks every priority after a Retry-After
+        """
+        self.tracker.update({'Retry-After': '60'})
+
+        self.assertFalse(self.tracker.allows(PRIORITY_WRITE))
+        with self.assertRaises(RateLimitError):
+            self.tracker.acquire(PRIORITY_WRITE)
+        self.clock.now += 60
+        self.assertEqual(self.tracker.acquire(PRIORITY_WRITE), 0)
+
+    def test_get_shared_tracker(self):
+        """
+        Test rate_limit.get_shared_tracker shares one tracker per user
+        """
+        self.assertIs(get_shared_tracker("tracker-user"), get_shared_tracker("tracker-user"))
+        self.assertIsNot(get_shared_tracker("tracker-user"), get_shared_tracker("other-user"))
+
+    def test_is_rate_limited(self):
+        """
+        Test rate_limit.is_rate_limited tells rate limits apart from other refusals
+        """
+        spent = {'X-RateLimit-Remaining': '0'}
+        self.assertTrue(is_rate_limited(GithubResponse(status_code=403, headers=spent)))
+        self.assertTrue(is_rate_limited(GithubResponse(status_code=429, headers={'Retry-After': '30'})))
+        refused = {'X-RateLimit-Remaining': '12'}
+        self.assertFalse(is_rate_limited(GithubResponse(status_code=403, headers=refused)))
+        self.assertFalse(is_rate_limited(GithubResponse(status_code=200, headers=spent)))
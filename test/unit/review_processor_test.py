@@ -0,0 +1,231 @@
+"""
+Unit tests for review_processor.py
+"""
+
+import threading
+import unittest
+from mock import MagicMock, patch
+from github_approval_checker.api import review_processor
+from github_approval_checker.utils import api_metrics, util
+from github_approval_checker.utils.exceptions import RateLimitError
+
+
+def review_event(state="approved"):
+    """
+    Builds a minimal PullRequestReview payload.
+    """
+    return {
+        "repository": {
+            "name": "repo-name",
+            "full_name": "repo-full-name",
+            "owner": {
+                "login": "repo-owner"
+            }
+        },
+        "review": {
+            "state": state,
+            "commit_id": "review-commit-id",
+            "user": {
+                "login": "review-user-login"
+            }
+        }
+    }
+
+
+FAILED_STATUS = {
+    "state": "failure",
+    "context": "context1",
+    "target_url": "fake://status_target_1",
+    "description": "Status Check 1"
+}
+
+
+class ReviewProcessorUnitTests(unittest.TestCase):
+    """
+    Test review_processor.process_review
+    """
+
+    def setUp(self):
+        self.handler = MagicMock()
+        self.handler.get_config.return_value = {"users": ["review-user-login"]}
+        self.handler.get_statuses.return_value = [FAILED_STATUS]
+        self.handler.is_authorized.return_value = True
+        self.handler.post_statuses.return_value = {"context1": 201}
+
+    def test_fetches_concurrently(self):
+        """
+        Test review_processor.process_review fetches the statuses without waiting for the config
+        """
+        statuses_requested = threading.Event()
+
+        def get_config(*_args):
+            """
+            Only returns once the statuses have been requested as well.
+            """
+            self.assertTrue(statuses_requested.wait(5))
+            return {"users": ["review-user-login"]}
+
+        def get_statuses(*_args):
+            """
+            Signals that the statuses were requested.
+            """
+            statuses_requested.set()
+            return [FAILED_STATUS]
+
+        self.handler.get_config.side_effect = get_config
+        self.handler.get_statuses.side_effect = get_statuses
+
+        response = review_processor.process_review(self.handler, review_event(), "config-filename")
+
+        self.handler.post_statuses.assert_called_once_with(
+            "repo-full-name", "review-commit-id", [FAILED_STATUS], "review-user-login"
+        )
+        self.assertEqual(response, ({'status': 'OK', 'overwritten_contexts': ['context1']}, 200))
+
+    def test_prefetch_authorization(self):
+        """
+        Test review_processor.process_review with prefetch_authorization authorizes while fetching statuses
+        """
+        authorizing = threading.Event()
+
+        def is_authorized(*_args):
+            """
+            Signals that authorization has started.
+            """
+            authorizing.set()
+            return True
+
+        def get_statuses(*_args):
+            """
+            Only returns once authorization has started.
+            """
+            self.assertTrue(authorizing.wait(5))
+            return [FAILED_STATUS]
+
+        self.handler.is_authorized.side_effect = is_authorized
+        self.handler.get_statuses.side_effect = get_statuses
+
+        response = review_processor.process_review(
+            self.handler, review_event(), "config-filename", prefetch_authorization=True
+        )
+
+        self.handler.is_authorized.assert_called_once_with(
+            "review-user-login", "repo-owner", "repo-name", {"users": ["review-user-login"]}
+        )
+        self.handler.post_statuses.assert_called_once_with(
+            "repo-full-name", "review-commit-id", [FAILED_STATUS], "review-user-login"
+        )
+        self.assertEqual(response, ({'status': 'OK', 'overwritten_contexts': ['context1']}, 200))
+
+    def test_triage_drops_before_api_calls(self):
+        """
+        Test review_processor.process_review drops events that cannot overwrite anything without API calls
+        """
+        data = review_event()
+        data["action"] = "dismissed"
+
+        response = review_processor.process_review(self.handler, data, "config-filename")
+
+        self.assertEqual(self.handler.mock_calls, [])
+        self.assertEqual(response, ({'status': 'OK', 'message': 'Review action is not submitted'}, 200))
+
+    def test_rate_limited_authorization(self):
+        """
+        Test review_processor.process_review responds with the error when the rate limit stops authorization
+        """
+        self.handler.is_authorized.side_effect = RateLimitError("rate limited")
+
+        response = review_processor.process_review(self.handler, review_event(), "config-filename")
+
+        self.handler.post_statuses.assert_not_called()
+        self.assertEqual(response, ({'status': 'Rate Limited', 'message': 'rate limited'}, 503))
+
+    def test_prefetch_skipped_on_low_budget(self):
+        """
+        Test review_processor.process_review skips prefetch_authorization while the rate limit budget is low
+        """
+        self.handler.rate_limit.allows.return_value = False
+        self.handler.get_statuses.return_value = []
+
+        review_processor.process_review(
+            self.handler, review_event(), "config-filename", prefetch_authorization=True
+        )
+
+        self.handler.is_authorized.assert_not_called()
+
+    @patch("github_approval_checker.api.review_processor.finish_review")
+    def test_requests_made(self, finish_review):
+        """
+        Test review_processor.process_review counts the GitHub calls of the review alone, even while
+        the shared handler makes calls for other reviews, and logs the reuse of its connections
+        """
+        def get_statuses(*_args):
+            api_metrics.record(MagicMock(), "https://api.github.com/repos/o/r/commits/sha/status", 200, 0, 0)
+            self.handler.request_count += 5
+            return [FAILED_STATUS]
+
+        self.handler.request_count = 0
+        self.handler.get_statuses.side_effect = get_statuses
+
+        review_processor.process_review(self.handler, review_event(), "config-filename")
+
+        self.assertEqual(finish_review.call_args[0][2], 1)
+        self.assertIs(finish_review.call_args[0][5], self.handler.connection_stats.return_value)
+
+    def test_process_reviews_coalesced(self):
+        """
+        Test review_processor.process_reviews authorizes reviewers in turn and overwrites each status once
+        """
+        self.handler.is_authorized.side_effect = [False, True]
+        events = [
+            review_processor.ReviewEvent(
+                "repo-name", "repo-owner", "repo-full-name", reviewer, "approved", "sha"
+            )
+            for reviewer in ("reviewer-1", "reviewer-1", "reviewer-2", "reviewer-3")
+        ]
+
+        response = review_processor.process_reviews(self.handler, events, "config-filename")
+
+        self.handler.get_statuses.assert_called_once_with("repo-full-name", "sha")
+        self.assertEqual(
+            [call[0][0] for call in self.handler.is_authorized.call_args_list], ["reviewer-1", "reviewer-2"]
+        )
+        self.handler.post_statuses.assert_called_once_with(
+            "repo-full-name", "sha", [FAILED_STATUS], "reviewer-2"
+        )
+        self.assertEqual(response, ({'status': 'OK', 'overwritten_contexts': ['context1']}, 200))
+
+    @patch("github_approval_checker.api.review_processor._SINGLE_FLIGHT")
+    def test_coalesce_window(self, single_flight):
+        """
+        Test review_processor.process_review with a coalesce_window processes reviews of a commit together
+        """
+        single_flight.run.side_effect = lambda key, event, process, window: process([event, event])
+
+        response = review_processor.process_review(
+            self.handler, review_event(), "config-filename", coalesce_window=0.5
+        )
+
+        self.assertEqual(single_flight.run.call_args[0][0], ("repo-full-name", "review-commit-id"))
+        self.assertEqual(single_flight.run.call_args[1], {"window": 0.5})
+        self.handler.is_authorized.assert_called_once_with(
+            "review-user-login", "repo-owner", "repo-name", {"users": ["review-user-login"]}
+        )
+        self.assertEqual(response, ({'status': 'OK', 'overwritten_contexts': ['context1']}, 200))
+
+    def test_already_overwritten_skipped(self):
+        """
+        Test review_processor.process_review does not write contexts it already overwrote
+        """
+        self.handler.get_statuses.return_value = [{
+            "state": "success",
+            "context": "context1",
+            "target_url": "fake://status_target_1",
+            "description": "Overwritten based on approval from: someone Message: Status Check 1"
+        }]
+
+        response = review_processor.process_review(self.handler, review_event(), "config-filename")
+
+        self.handler.is_authorized.assert_not_called()
+        self.handler.post_statuses.assert_not_called()
+        self.assertEqual(response, util.STATUS_OK)
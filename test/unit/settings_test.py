@@ -0,0 +1,71 @@
+"""
+Unit tests for settings.py
+"""
+
+import unittest
+from mock import patch
+from github_approval_checker.api import settings
+from github_approval_checker.utils.github_handler import GithubHandler
+from github_approval_checker.utils.graphql_handler import GraphQLGithubHandler
+
+
+class SettingsUnitTests(unittest.TestCase):
+    """
+    Test settings.py
+    """
+
+    def test_handler_class(self):
+        """
+        Test settings.handler_class imports the class chosen by github_data_provider
+        """
+        with patch.dict("os.environ", {}, clear=True):
+            self.assertIs(settings.handler_class(), GithubHandler)
+        with patch.dict("os.environ", {"github_data_provider": "graphql"}):
+            self.assertIs(settings.handler_class(), GraphQLGithubHandler)
+
+    def test_handler_options(self):
+        """
+        Test settings.handler_options only sets the options present in the environment
+        """
+        with patch.dict("os.environ", {"github_pool_size": "4", "config_cache_ttl": "60"}, clear=True):
+            self.assertEqual(settings.handler_options(), {"pool_size": 4, "config_ttl": 60})
+
+    def test_prefetch_authorization(self):
+        """
+        Test settings.prefetch_authorization defaults to off
+        """
+        with patch.dict("os.environ", {}, clear=True):
+            self.assertFalse(settings.prefetch_authorization())
+        with patch.dict("os.environ", {"prefetch_authorization": "True"}):
+            self.assertTrue(settings.prefetch_authorization())
+
+    def test_trace_sink(self):
+        """
+        Test settings.trace_sink only traces when trace_path is set
+        """
+        with patch.dict("os.environ", {}, clear=True):
+            self.assertIsNone(settings.trace_sink())
+        with patch.dict("os.environ", {"trace_path": "/tmp/traces.jsonl"}):
+            self.assertEqual(settings.trace_sink().path, "/tmp/traces.jsonl")
+
+    def test_profile_sample_rate(self):
+        """
+        Test settings.profile_sample_rate accepts booleans and fractions
+        """
+        with patch.dict("os.environ", {}, clear=True):
+            self.assertEqual(settings.profile_sample_rate(), 0.0)
+        with patch.dict("os.environ", {"profile_requests": "True"}):
+            self.assertEqual(settings.profile_sample_rate(), 1.0)
+        with patch.dict("os.environ", {"profile_requests": "0.05"}):
+            self.assertEqual(settings.profile_sample_rate(), 0.05)
+
+    def test_shared_cache(self):
+        """
+        Test settings.shared_cache only shares the handler caches when cache_backend is set
+        """
+        with patch.dict("os.environ", {}, clear=True):
+            self.assertIsNone(settings.shared_cache())
+        with patch.dict("os.environ", {"cache_backend": "memory", "cache_max_bytes": "1024"}):
+            self.assertEqual(settings.shared_cache().max_bytes, 1024)
+        with patch.dict("os.environ", {"cache_backend": "memcached"}):
+            self.assertRaises(ValueError, settings.shared_cache)
@@ -0,0 +1,144 @@
+"""
+Unit tests for shared_cache.py
+"""
+
+import socket
+import unittest
+from github_approval_checker.utils import shared_cache
+from github_approval_checker.utils.shared_cache import MemoryBackend, RedisBackend, SQLiteBackend
+from test.helpers import FakeRedisServer
+
+
+class FakeClock(object):
+    """
+    A clock that only moves when told to.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class SharedCacheUnitTests(unittest.TestCase):
+    """
+    Test the shared cache format and backends
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def check_backend(self, backend):
+        """
+        Checks that a backend stores values until they expire or are deleted.
+        """
+        self.assertIsNone(backend.get("config:a"))
+        backend.set("config:a", b"value-a", 60)
+        backend.set("config:b", b"value-b", 60)
+        self.assertEqual(backend.get("config:a"), b"value-a")
+        self.assertTrue(backend.delete("config:a"))
+        self.assertFalse(backend.delete("config:a"))
+        self.assertIsNone(backend.get("config:a"))
+        self.assertEqual(backend.get("config:b"), b"value-b")
+        self.assertEqual(backend.delete_many(["config:a", "config:b", "config:c"]), 1)
+
+        stats = backend.snapshot()
+        self.assertEqual((stats["hits"], stats["misses"], stats["sets"]), (2, 2, 2))
+
+    def test_encode(self):
+        """
+        Test shared_cache.encode and decode round trip built-in values with their expiry and ETag
+        """
+        value = {"teams": ["team-name"], "admins": True, "members": frozenset(["a", "b"])}
+        data = shared_cache.encode(value, 1060.5, '"etag"')
+
+        self.assertEqual(shared_cache.decode(data), (value, 1060.5, '"etag"'))
+        self.assertEqual(shared_cache.decode(shared_cache.encode([], 1000)), ([], 1000, None))
+        self.assertIsNone(shared_cache.encode(object(), 1000))
+        self.assertIsNone(shared_cache.decode(b"\x02" + data[1:]))
+        self.assertIsNone(shared_cache.decode(b"short"))
+
+    def test_cache_key(self):
+        """
+        Test shared_cache.cache_key namespaces tuple keys
+        """
+        self.assertEqual(shared_cache.cache_key("config", ("owner/repo", "config.yml")),
+                         'config:["owner/repo","config.yml"]')
+
+    def test_memory_backend(self):
+        """
+        Test MemoryBackend expires values and evicts the least recently used beyond its budget
+        """
+        self.check_backend(MemoryBackend(clock=self.clock))
+
+        backend = MemoryBackend(max_bytes=10, clock=self.clock)
+        backend.set("a", b"12345", 60)
+        backend.set("b", b"12345", 10)
+        backend.get("a")
+        backend.set("c", b"12345", 60)
+        backend.set("too-large", b"12345678901", 60)
+
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual(backend.get("a"), b"12345")
+        self.clock.now += 61
+        self.assertIsNone(backend.get("c"))
+        self.assertEqual(backend.snapshot()["evictions"], 1)
+
+    def test_sqlite_backend(self):
+        """
+        Test SQLiteBackend expires values and evicts those expiring soonest beyond its budget
+        """
+        self.check_backend(SQLiteBackend(":memory:", clock=self.clock))
+
+        backend = SQLiteBackend(":memory:", max_bytes=10, clock=self.clock)
+        backend.set("a", b"12345", 60)
+        backend.set("b", b"12345", 10)
+        backend.set("c", b"12345", 60)
+
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual(backend.get("a"), b"12345")
+        self.clock.now += 61
+        self.assertIsNone(backend.get("c"))
+        self.assertEqual(backend.snapshot()["evictions"], 1)
+        self.assertEqual(backend.snapshot()["bytes"], 10)
+
+    def test_redis_backend(self):
+        """
+        Test RedisBackend stores values in a Redis-protocol server with their time to live
+        """
+        server = FakeRedisServer()
+        self.addCleanup(server.close)
+        backend = RedisBackend(server.url)
+        self.addCleanup(backend.close)
+
+        self.check_backend(backend)
+
+        self.assertEqual(server.commands[0], [b"SELECT", b"1"])
+        self.assertIn([b"SET", b"config:a", b"value-a", b"PX", b"60000"], server.commands)
+
+    def test_redis_unavailable(self):
+        """
+        Test RedisBackend treats an unreachable server as a miss, and backs off from it
+        """
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        port = listener.getsockname()[1]
+        listener.close()
+        clock = FakeClock()
+        backend = RedisBackend("redis://127.0.0.1:{}".format(port), timeout=0.1, clock=clock)
+
+        self.assertIsNone(backend.get("config:a"))
+        backend.set("config:a", b"value", 60)
+        self.assertFalse(backend.available())
+        self.assertEqual((backend.snapshot()["errors"], backend.snapshot()["skipped"]), (1, 1))
+
+        clock.now += shared_cache.ERROR_BACKOFF
+        self.assertIsNone(backend.get("config:a"))
+        self.assertEqual((backend.snapshot()["errors"], backend.snapshot()["skipped"]), (2, 1))
+
+    def test_get_shared_backend(self):
+        """
+        Test shared_cache.get_shared_backend returns one backend per configuration
+        """
+        self.assertIs(shared_cache.get_shared_backend("memory"), shared_cache.get_shared_backend("memory"))
+        self.assertRaises(ValueError, shared_cache.get_shared_backend, "memcached")
@@ -0,0 +1,129 @@
+"""
+Unit tests for signature.py
+"""
+
+import hashlib
+import hmac
+import io
+import json
+import unittest
+from mock import MagicMock
+from github_approval_checker.utils.exceptions import SignatureError
+from github_approval_checker.utils.signature import SignatureVerifier, SignatureMiddleware, get_verifier
+
+SECRET = "123456!"
+BODY = b'{"action": "submitted"}'
+
+
+def sign(body, digest=hashlib.sha256):
+    """
+    Computes the hex signature of a body with SECRET.
+    """
+    return hmac.new(SECRET.encode("utf-8"), body, digest).hexdigest()
+
+
+class SignatureVerifierUnitTests(unittest.TestCase):
+    """
+    Test signature.SignatureVerifier
+    """
+
+    def test_verify_request_prefers_sha256(self):
+        """
+        Test signature.SignatureVerifier.verify_request checks X-Hub-Signature-256 over X-Hub-Signature
+        """
+        headers = {
+            "X-Hub-Signature-256": "sha256=" + sign(BODY),
+            "X-Hub-Signature": "sha1=bad-hash"
+        }
+
+        SignatureVerifier(SECRET).verify_request(headers.get, BODY)
+
+    def test_verify_request_sha1(self):
+        """
+        Test signature.SignatureVerifier.verify_request falls back to X-Hub-Signature
+        """
+        headers = {"X-Hub-Signature": "sha1=" + sign(BODY, hashlib.sha1)}
+
+        SignatureVerifier(SECRET).verify_request(headers.get, memoryview(BODY))
+
+    def test_verify_request_bad(self):
+        """
+        Test signature.SignatureVerifier.verify_request rejects forged and unsigned requests
+        """
+        verifier = SignatureVerifier(SECRET)
+
+        forged = {"X-Hub-Signature-256": "sha256=" + sign(b"{}")}
+        self.assertRaises(SignatureError, verifier.verify_request, forged.get, BODY)
+        self.assertRaises(SignatureError, verifier.verify_request, {}.get, BODY)
+
+    def test_verify_reuses_keyed_mac(self):
+        """
+        Test signature.SignatureVerifier.verify leaves its keyed HMACs unchanged between requests
+        """
+        verifier = SignatureVerifier(SECRET)
+
+        verifier.verify("sha256", sign(BODY), BODY)
+        verifier.verify("sha256", sign(b"{}"), b"{}")
+
+    def test_no_secret(self):
+        """
+        Test signature.SignatureVerifier rejects every request without a secret
+        """
+        self.assertRaises(SignatureError, SignatureVerifier(None).verify, "sha256", sign(BODY), BODY)
+
+    def test_get_verifier(self):
+        """
+        Test signature.get_verifier shares one verifier per secret
+        """
+        self.assertIs(get_verifier(SECRET), get_verifier(SECRET))
+
+
+class SignatureMiddlewareUnitTests(unittest.TestCase):
+    """
+    Test signature.SignatureMiddleware
+    """
+
+    def setUp(self):
+        self.app = MagicMock(return_value=[b"routed"])
+        self.middleware = SignatureMiddleware(self.app, SignatureVerifier(SECRET))
+        self.start_response = MagicMock()
+
+    def environ(self, signature, method="POST"):
+        """
+        Builds the WSGI environ of a webhook delivery.
+        """
+        return {
+            "REQUEST_METHOD": method,
+            "CONTENT_LENGTH": str(len(BODY)),
+            "HTTP_X_HUB_SIGNATURE_256": signature,
+            "wsgi.input": io.BytesIO(BODY)
+        }
+
+    def test_signed(self):
+        """
+        Test signature.SignatureMiddleware passes signed requests on with their body intact
+        """
+        environ = self.environ("sha256=" + sign(BODY))
+
+        self.assertEqual(self.middleware(environ, self.start_response), [b"routed"])
+
+        self.app.assert_called_once_with(environ, self.start_response)
+        self.assertEqual(environ["wsgi.input"].read(), BODY)
+
+    def test_forged(self):
+        """
+        Test signature.SignatureMiddleware answers forged requests without routing them
+        """
+        response = self.middleware(self.environ("sha256=bad-hash"), self.start_response)
+
+        self.app.assert_not_called()
+        self.assertEqual(self.start_response.call_args[0][0], "400 Bad Request")
+        self.assertEqual(json.loads(response[0].decode("utf-8"))["status"], "Signature Validation Error")
+
+    def test_not_post(self):
+        """
+        Test signature.SignatureMiddleware does not check requests other than POSTs
+        """
+        self.middleware(self.environ("", method="GET"), self.start_response)
+
+        self.app.assert_called_once()
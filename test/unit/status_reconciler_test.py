@@ -0,0 +1,55 @@
+"""
+Unit tests for status_reconciler.py
+"""
+
+import unittest
+from github_approval_checker.utils import status_reconciler
+
+
+def status(context, state, description="desc"):
+    """
+    Builds a status as returned by get_statuses.
+    """
+    return {"context": context, "state": state, "description": description, "target_url": "fake://url"}
+
+
+class StatusReconcilerUnitTests(unittest.TestCase):
+    """
+    Test status_reconciler.py
+    """
+
+    def test_override_description(self):
+        """
+        Test status_reconciler.override_description quotes the original description only once
+        """
+        description = status_reconciler.override_description("reviewer-1", "Tests failed")
+        description = status_reconciler.override_description("reviewer-2", description)
+
+        self.assertEqual(
+            description, "Overwritten based on approval from: reviewer-2 Message: Tests failed"
+        )
+        self.assertEqual(
+            status_reconciler.override_description("reviewer-1", None),
+            "Overwritten based on approval from: reviewer-1 Message: "
+        )
+
+    def test_reconcile(self):
+        """
+        Test status_reconciler.reconcile only writes the failed contexts not already overwritten
+        """
+        overridden = status(
+            "context2", "success", status_reconciler.override_description("reviewer", "Lint failed")
+        )
+        statuses = [
+            status("context1", "failure"),
+            overridden,
+            status("context2", "failure"),
+            status("context3", "error"),
+            status("context4", "pending"),
+            status("context5", "success")
+        ]
+
+        plan = status_reconciler.reconcile(statuses)
+
+        self.assertEqual(plan.writes, [statuses[0], statuses[3]])
+        self.assertEqual(plan.skipped, [overridden])
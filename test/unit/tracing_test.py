@@ -0,0 +1,141 @@
+"""
+Unit tests for tracing.py
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from mock import MagicMock
+from github_approval_checker.utils import tracing
+from github_approval_checker.utils.concurrency import WorkerPool
+
+
+class FakeClock(object):
+    """
+    A clock that only moves when told to.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TracingUnitTests(unittest.TestCase):
+    """
+    Test tracing.py
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "traces.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_traces(self):
+        """
+        @return traces: The traces written to the trace file.
+        """
+        with open(self.path) as trace_file:
+            return [json.loads(line) for line in trace_file]
+
+    def test_span(self):
+        """
+        Test tracing.span times stages relative to the start of the trace
+        """
+        clock = FakeClock()
+        with tracing.start_trace("delivery-1", tracing.FileTraceSink(self.path), clock) as trace:
+            clock.now += 0.5
+            with tracing.span("get_config", bytes=12) as attributes:
+                clock.now += 0.25
+                attributes["cached"] = True
+
+        span = trace.to_dict()["spans"][0]
+        self.assertEqual(span["name"], "get_config")
+        self.assertEqual(span["start_ms"], 500.0)
+        self.assertEqual(span["duration_ms"], 250.0)
+        self.assertEqual(span["bytes"], 12)
+        self.assertTrue(span["cached"])
+        self.assertEqual(trace.to_dict()["duration_ms"], 750.0)
+
+    def test_start_trace(self):
+        """
+        Test tracing.start_trace exports one line per trace, including the spans of worker threads
+        """
+        sink = tracing.FileTraceSink(self.path)
+        pool = WorkerPool(2)
+        with tracing.start_trace("delivery-1", sink) as trace:
+            with tracing.span("triage"):
+                pass
+            started = trace.started
+            pool.submit(lambda: tracing.add_span("github", started, 0.01, endpoint="get_statuses")).get()
+        self.assertIsNone(tracing.current_trace())
+        with tracing.start_trace("delivery-2", sink):
+            pass
+
+        traces = self.read_traces()
+        self.assertEqual([trace["trace_id"] for trace in traces], ["delivery-1", "delivery-2"])
+        self.assertEqual(sorted(span["name"] for span in traces[0]["spans"]), ["github", "triage"])
+        self.assertEqual(traces[1]["spans"], [])
+
+    def test_untraced(self):
+        """
+        Test tracing records nothing when the context is not traced
+        """
+        with tracing.start_trace("delivery-1", None) as trace:
+            self.assertIsNone(trace)
+            with tracing.span("triage") as attributes:
+                attributes["dropped"] = False
+            tracing.add_span("github", 0, 0.01)
+        self.assertIsNone(tracing.current_trace())
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_sink_error(self):
+        """
+        Test FileTraceSink logs rather than raises when the file cannot be written
+        """
+        sink = tracing.FileTraceSink(os.path.join(self.directory, "missing", "traces.jsonl"))
+        sink.export(tracing.Trace("delivery-1"))
+
+    def test_get_shared_sink(self):
+        """
+        Test tracing.get_shared_sink returns one sink per path
+        """
+        self.assertIs(tracing.get_shared_sink(self.path), tracing.get_shared_sink(self.path))
+
+    def test_should_profile(self):
+        """
+        Test tracing.should_profile samples the fraction of deliveries asked for
+        """
+        self.assertFalse(tracing.should_profile(0, rng=lambda: 0.0))
+        self.assertTrue(tracing.should_profile(1, rng=lambda: 0.99))
+        self.assertTrue(tracing.should_profile(0.1, rng=lambda: 0.05))
+        self.assertFalse(tracing.should_profile(0.1, rng=lambda: 0.5))
+
+    def test_profiled(self):
+        """
+        Test tracing.profiled writes the cProfile stats of the block
+        """
+        with tracing.profiled("delivery/1", self.directory) as path:
+            sorted(range(1000))
+        self.assertEqual(os.path.dirname(path), self.directory)
+        self.assertTrue(os.path.basename(path).endswith("-delivery1.prof"))
+        self.assertTrue(os.path.getsize(path) > 0)
+
+    def test_middleware(self):
+        """
+        Test TracingMiddleware observes POST requests by their delivery header
+        """
+        app = MagicMock(return_value=iter([b"body"]))
+        observe = MagicMock()
+        middleware = tracing.TracingMiddleware(app, observe)
+
+        environ = {"REQUEST_METHOD": "POST", "HTTP_X_GITHUB_DELIVERY": "1"}
+        self.assertEqual(middleware(environ, None), [b"body"])
+        observe.assert_called_once_with("1")
+
+        middleware({"REQUEST_METHOD": "GET"}, None)
+        self.assertEqual(observe.call_count, 1)
@@ -0,0 +1,52 @@
+"""
+Unit tests for triage.py
+"""
+
+import unittest
+from github_approval_checker.utils import triage
+
+
+def review_event(action="submitted", state="approved", pr_state="open", head_sha="commit-id"):
+    """
+    Builds a minimal PullRequestReview payload.
+    """
+    return {
+        "action": action,
+        "pull_request": {
+            "state": pr_state,
+            "head": {"sha": head_sha}
+        },
+        "review": {
+            "state": state,
+            "commit_id": "commit-id"
+        }
+    }
+
+
+class TriageUnitTests(unittest.TestCase):
+    """
+    Test triage.triage
+    """
+
+    def test_keeps_approvals(self):
+        """
+        Test triage.triage keeps a submitted approval of the head commit of an open pull request
+        """
+        self.assertIsNone(triage.triage(review_event()))
+        self.assertIsNone(triage.triage({"review": {"state": "approved", "commit_id": "commit-id"}}))
+
+    def test_drop_reasons(self):
+        """
+        Test triage.triage drops events that cannot lead to an overwrite and counts them by reason
+        """
+        before = triage.dropped_counts()
+
+        self.assertEqual(triage.triage(review_event(action="dismissed")), "action")
+        self.assertEqual(triage.triage(review_event(action="edited")), "action")
+        self.assertEqual(triage.triage(review_event(state="commented")), "state")
+        self.assertEqual(triage.triage(review_event(pr_state="closed")), "closed")
+        self.assertEqual(triage.triage(review_event(head_sha="newer-commit")), "stale_commit")
+
+        after = triage.dropped_counts()
+        self.assertEqual(after["action"] - before.get("action", 0), 2)
+        self.assertEqual(after["stale_commit"] - before.get("stale_commit", 0), 1)
@@ -58,9 +58,9 @@ class UtilUnitTests(unittest.TestCase):
         """
         self.assertRaisesRegexp(  # pylint: disable=deprecated-method
             SignatureError,
-            'Unsupported signature hash algorithm. Expected ' + util.SUPPORTED_HASH,
+            'Unsupported signature hash algorithm. Expected one of sha1, sha256',
             util.parse_signature,
-            'sha256=fake_signature'
+            'md5=fake_signature'
         )
 
     def test_parse_signature_valid(self):
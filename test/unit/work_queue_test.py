@@ -0,0 +1,96 @@
+"""
+Unit tests for work_queue.py
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from github_approval_checker.utils.work_queue import WorkQueue
+
+
+class FakeClock(object):
+    """
+    A clock that only moves when told to.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class WorkQueueUnitTests(unittest.TestCase):
+    """
+    Test work_queue.WorkQueue
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.queue = WorkQueue(':memory:', max_attempts=2, visibility_timeout=30, clock=self.clock)
+
+    def test_put_claim_ack(self):
+        """
+        Test work_queue.WorkQueue hands out items in order until they are acknowledged
+        """
+        self.queue.put({"review": 1})
+        self.queue.put({"review": 2})
+
+        item = self.queue.claim()
+        self.assertEqual((item.payload, item.attempts), ({"review": 1}, 1))
+        self.assertEqual(self.queue.claim().payload, {"review": 2})
+        self.assertIsNone(self.queue.claim())
+
+        self.queue.ack(item)
+        self.assertEqual(self.queue.stats()["depth"], 1)
+
+    def test_lease_expires(self):
+        """
+        Test work_queue.WorkQueue hands an unacknowledged item out again once its lease runs out
+        """
+        self.queue.put({"review": 1})
+        self.queue.claim()
+
+        self.clock.now += 31
+        item = self.queue.claim()
+
+        self.assertEqual(item.attempts, 2)
+
+    def test_retry(self):
+        """
+        Test work_queue.WorkQueue.retry delays an item and marks it dead after its last attempt
+        """
+        self.queue.put({"review": 1})
+
+        self.assertTrue(self.queue.retry(self.queue.claim(), 10))
+        self.assertIsNone(self.queue.claim())
+        self.clock.now += 10
+        self.assertFalse(self.queue.retry(self.queue.claim(), 10))
+
+        self.clock.now += 10
+        self.assertIsNone(self.queue.claim())
+        self.assertEqual(self.queue.stats()["dead"], 1)
+
+    def test_stats(self):
+        """
+        Test work_queue.WorkQueue.stats reports the depth and the age of the oldest item
+        """
+        self.queue.put({"review": 1})
+        self.clock.now += 5
+        self.queue.put({"review": 2})
+        self.queue.claim()
+
+        self.assertEqual(self.queue.stats(), {'depth': 2, 'available': 1, 'dead': 0, 'oldest_age': 5})
+
+    def test_durable(self):
+        """
+        Test work_queue.WorkQueue keeps items in its database file
+        """
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "queue.db")
+            WorkQueue(path).put({"review": 1})
+
+            self.assertEqual(WorkQueue(path).claim().payload, {"review": 1})
+        finally:
+            shutil.rmtree(directory)